@@ -0,0 +1,222 @@
+"""
+Non-blocking counterparts of the code store, Twilio Verify and WhatsApp
+backends used by the ASGI service. SDKs without an asyncio client (BigQuery)
+and the local stand-ins run in a bounded thread pool instead.
+"""
+
+from abc import ABC, abstractmethod
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+from datetime import datetime, timezone
+import functools
+from typing import Any, Callable, Iterable
+
+from google.api_core import exceptions as google_exceptions
+from google.cloud import firestore
+
+from backends import (
+    VerificationCodeStore,
+    VerificationResult,
+    VerificationSender,
+    WhatsAppSender,
+    is_live_code,
+)
+from twilio_gateway import AsyncTwilioVerifyClient
+from whatsapp_client import AsyncWhatsAppClient, template_message
+
+
+async def run_blocking(
+    executor: ThreadPoolExecutor, function: Callable, *args, **kwargs
+) -> Any:
+    loop = asyncio.get_running_loop()
+    # Runs in a copy of the caller's context, like asyncio.to_thread, so the
+    # call is part of the request trace
+    return await loop.run_in_executor(
+        executor,
+        functools.partial(contextvars.copy_context().run, function, *args, **kwargs),
+    )
+
+
+class AsyncVerificationCodeStore(ABC):
+    """Asyncio interface of the `VerificationCodeStore` calls on the request path."""
+
+    @abstractmethod
+    async def set(self, phone_number: str, document: dict) -> None: ...
+
+    @abstractmethod
+    async def get_many(self, phone_numbers: list[str]) -> dict[str, dict | None]: ...
+
+    @abstractmethod
+    async def delete_many(
+        self, phone_numbers: list[str], must_exist: Iterable[str] = ()
+    ) -> bool: ...
+
+
+class AsyncFirestoreVerificationCodeStore(AsyncVerificationCodeStore):
+    def __init__(self, client: firestore.AsyncClient, collection: str):
+        self.client = client
+        self.collection = collection
+
+    async def set(self, phone_number: str, document: dict) -> None:
+        await self.client.collection(self.collection).document(phone_number).set(
+            document
+        )
+
+    async def get_many(self, phone_numbers: list[str]) -> dict[str, dict | None]:
+        doc_refs = [
+            self.client.collection(self.collection).document(phone_number)
+            for phone_number in phone_numbers
+        ]
+        now = datetime.now(timezone.utc)
+        documents = dict.fromkeys(phone_numbers)
+        # Snapshots come back in no particular order
+        async for snapshot in self.client.get_all(doc_refs):
+            document = snapshot.to_dict() if snapshot.exists else None
+            if is_live_code(document, now):
+                documents[snapshot.id] = document
+        return documents
+
+    async def delete_many(
+        self, phone_numbers: list[str], must_exist: Iterable[str] = ()
+    ) -> bool:
+        must_exist = set(must_exist)
+        batch = self.client.batch()
+        for phone_number in phone_numbers:
+            batch.delete(
+                self.client.collection(self.collection).document(phone_number),
+                option=(
+                    self.client.write_option(exists=True)
+                    if phone_number in must_exist
+                    else None
+                ),
+            )
+
+        try:
+            await batch.commit()
+        except (google_exceptions.NotFound, google_exceptions.FailedPrecondition):
+            return False
+        return True
+
+
+class ExecutorVerificationCodeStore(AsyncVerificationCodeStore):
+    """Runs a synchronous `VerificationCodeStore` in the blocking executor."""
+
+    def __init__(self, code_store: VerificationCodeStore, executor: ThreadPoolExecutor):
+        self.code_store = code_store
+        self.executor = executor
+
+    async def set(self, phone_number: str, document: dict) -> None:
+        await run_blocking(self.executor, self.code_store.set, phone_number, document)
+
+    async def get_many(self, phone_numbers: list[str]) -> dict[str, dict | None]:
+        return await run_blocking(
+            self.executor, self.code_store.get_many, phone_numbers
+        )
+
+    async def delete_many(
+        self, phone_numbers: list[str], must_exist: Iterable[str] = ()
+    ) -> bool:
+        return await run_blocking(
+            self.executor, self.code_store.delete_many, phone_numbers, must_exist
+        )
+
+
+class AsyncVerificationSender(ABC):
+    @abstractmethod
+    async def send_code(self, phone_number: str) -> VerificationResult: ...
+
+    @abstractmethod
+    async def verify_code(self, phone_number: str, code: str) -> VerificationResult: ...
+
+    def stats(self) -> dict | None:
+        return None
+
+    async def close(self) -> None:
+        pass
+
+
+class AsyncTwilioVerificationSender(AsyncVerificationSender):
+    def __init__(self, client: AsyncTwilioVerifyClient):
+        self.client = client
+
+    async def send_code(self, phone_number: str) -> VerificationResult:
+        payload = await self.client.send_code(phone_number)
+        return VerificationResult(status=payload["status"])
+
+    async def verify_code(self, phone_number: str, code: str) -> VerificationResult:
+        payload = await self.client.verify_code(phone_number, code)
+        return VerificationResult(status=payload["status"])
+
+    def stats(self) -> dict:
+        return self.client.stats()
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+class ExecutorVerificationSender(AsyncVerificationSender):
+    """Runs a synchronous `VerificationSender` in the blocking executor."""
+
+    def __init__(
+        self, verification_sender: VerificationSender, executor: ThreadPoolExecutor
+    ):
+        self.verification_sender = verification_sender
+        self.executor = executor
+
+    async def send_code(self, phone_number: str) -> VerificationResult:
+        return await run_blocking(
+            self.executor, self.verification_sender.send_code, phone_number
+        )
+
+    async def verify_code(self, phone_number: str, code: str) -> VerificationResult:
+        return await run_blocking(
+            self.executor, self.verification_sender.verify_code, phone_number, code
+        )
+
+    def stats(self) -> dict | None:
+        return self.verification_sender.stats()
+
+
+class AsyncWhatsAppSender(ABC):
+    @abstractmethod
+    async def send_template(
+        self, phone_number: str, template_name: str, code: int
+    ) -> tuple[bool, dict]: ...
+
+    async def close(self) -> None:
+        pass
+
+
+class AsyncGraphWhatsAppSender(AsyncWhatsAppSender):
+    def __init__(self, client: AsyncWhatsAppClient):
+        self.client = client
+
+    async def send_template(
+        self, phone_number: str, template_name: str, code: int
+    ) -> tuple[bool, dict]:
+        return await self.client.send_message(
+            phone_number, template_message(template_name, code)
+        )
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+class ExecutorWhatsAppSender(AsyncWhatsAppSender):
+    """Runs a synchronous `WhatsAppSender` in the blocking executor."""
+
+    def __init__(self, whatsapp_sender: WhatsAppSender, executor: ThreadPoolExecutor):
+        self.whatsapp_sender = whatsapp_sender
+        self.executor = executor
+
+    async def send_template(
+        self, phone_number: str, template_name: str, code: int
+    ) -> tuple[bool, dict]:
+        return await run_blocking(
+            self.executor,
+            self.whatsapp_sender.send_template,
+            phone_number,
+            template_name,
+            code,
+        )
@@ -0,0 +1,506 @@
+"""
+ASGI variant of the service with the same routes and responses as `main`.
+Run it with `uvicorn async_main:app` or through gunicorn.conf.py with
+APP_MODULE=async_main:app.
+"""
+
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+import itertools
+import logging
+import os
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from circuit_breaker import CircuitOpen
+from logger import setup_logging
+from rate_limiter import RateLimitExceeded
+import resources
+import async_resources
+import telemetry
+
+ENV = os.getenv("ENV", "local")
+
+if ENV == "local":
+    from dotenv import load_dotenv
+
+    load_dotenv("../../.env")
+
+setup_logging()
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_ORIGIN = "https://connecta.questionpro.com"  # Replace with the allowed origin
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async_resources.start()
+    yield
+    await async_resources.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Configure CORS to allow only specific origin
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=[ALLOWED_ORIGIN],
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# Latency histograms, error counts and in-flight gauges per route, and a
+# request id in the logs of each request
+telemetry.instrument_asgi(app)
+
+
+def respond(content: dict, status_code: int) -> JSONResponse:
+    return JSONResponse(content=content, status_code=status_code)
+
+
+@app.get("/check_health")
+async def check_health():
+    """
+    Check the health of the service.
+    """
+    return respond({"message": "Service is healthy."}, 200)
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Request and backend call metrics in the Prometheus text format.
+    """
+    return Response(telemetry.render(), media_type=telemetry.PROMETHEUS_CONTENT_TYPE)
+
+
+@app.get("/respondent_index/stats")
+async def respondent_index_stats():
+    """
+    Rebuild metrics and sizes of the known-respondent index.
+    """
+    return respond(resources.respondent_index.stats(), 200)
+
+
+@app.get("/respondent_writer/stats")
+async def respondent_writer_stats():
+    """
+    Queue and flush metrics of the buffered respondent writer.
+    """
+    if resources.respondent_writer is None:
+        return respond({"message": "Respondent writes are not buffered."}, 404)
+    return respond(resources.respondent_writer.stats(), 200)
+
+
+@app.get("/supervisor_directory/stats")
+async def supervisor_directory_stats():
+    """
+    Load metrics and size of the active supervisor snapshot.
+    """
+    return respond(resources.supervisor_directory.stats(), 200)
+
+
+@app.get("/client_registry/stats")
+async def client_registry_stats():
+    """
+    Backend clients created so far and their creation times.
+    """
+    return respond(resources.client_registry.stats(), 200)
+
+
+@app.get("/single_flight/stats")
+async def single_flight_stats():
+    """
+    Coalescing metrics of the eligibility lookups and code verifications.
+    """
+    return respond(
+        {
+            "eligibility": resources.eligibility_lookups.stats(),
+            "wp_code_verification": async_resources.wp_code_verifications.stats(),
+        },
+        200,
+    )
+
+
+@app.get("/verification_sender/stats")
+async def verification_sender_stats():
+    """
+    Call, retry and circuit breaker metrics of the Twilio Verify client.
+    """
+    stats = async_resources.verification_sender.stats()
+    if stats is None:
+        return respond({"message": "The verification sender keeps no metrics."}, 404)
+    return respond(stats, 200)
+
+
+@app.get("/rate_limiter/stats")
+async def rate_limiter_stats():
+    """
+    Allowed and rejected WhatsApp code sends of this instance.
+    """
+    return respond(resources.rate_limiter.stats(), 200)
+
+
+@app.get("/verification_codes/stats")
+async def verification_codes_stats():
+    """
+    Live and expired WhatsApp codes in the store, and sweeper metrics.
+    """
+    # Counting queries the code store
+    stats = await async_resources.run_blocking(
+        async_resources.executor, resources.verification_code_sweeper.stats
+    )
+    return respond(stats, 200)
+
+
+@app.get("/check_respondent_qualified/{country}/{phone_number}/{project_type:path}")
+async def check_respondent_qualified(
+    country: str, phone_number: str, project_type: str
+):
+    """
+    Check if the respondent is qualified to take the survey.
+    """
+    if not phone_number:
+        message = "Phone number is required."
+        logger.error(message)
+        return respond({"message": message}, 400)
+
+    try:
+        transformed_phone_number = int(
+            resources.transform_phone_number(country, phone_number)
+        )
+        project_type = project_type.strip().lower()
+        # Check if the respondent is qualified
+        is_qualified = await async_resources.is_respondent_qualified(
+            transformed_phone_number, project_type
+        )
+
+        if is_qualified:
+            message = (
+                f"Respondent is qualified. Phone number "
+                f"{transformed_phone_number} and project type {project_type}."
+            )
+        else:
+            message = (
+                f"Respondent is not qualified. Phone number "
+                f"{transformed_phone_number} and project type {project_type}."
+            )
+
+        logger.info(message)
+        return respond(
+            {
+                "message": message,
+                "is_qualified": is_qualified,
+            },
+            200 if is_qualified else 403,
+        )
+
+    except ValueError as e:
+        # Unknown country or a number without digits
+        message = f"Invalid phone number: {str(e)}"
+        logger.error(message)
+        return respond({"message": message}, 400)
+
+    except Exception as e:
+        message = f"Failed to check respondent qualification: {str(e)}"
+        logger.error(message)
+        return respond({"message": message}, 500)
+
+
+@app.post("/check_respondents_qualified")
+async def check_respondents_qualified(request: Request):
+    """
+    Check which respondents of a list are qualified to take the survey.
+    Expects {"project_type": ..., "respondents": [{"country": ...,
+    "phone_number": ...}, ...]}.
+    """
+    body = await request.json()
+    respondents = body.get("respondents") or []
+    if not respondents or not body.get("project_type"):
+        message = "Respondents and project type are required."
+        logger.error(message)
+        return respond({"message": message}, 400)
+
+    if len(respondents) > resources.BULK_ELIGIBILITY_MAX_RESPONDENTS:
+        message = (
+            f"At most {resources.BULK_ELIGIBILITY_MAX_RESPONDENTS} respondents "
+            "can be checked per request."
+        )
+        logger.error(message)
+        return respond({"message": message}, 413)
+
+    project_type = body.get("project_type").strip().lower()
+    try:
+        results = resources.check_respondents_qualified(respondents, project_type)
+        # Runs the query, so its errors are reported before any streaming
+        first_result = await async_resources.run_blocking(
+            async_resources.executor, next, results
+        )
+
+    except ValueError as e:
+        message = f"Invalid respondents: {str(e)}"
+        logger.error(message)
+        return respond({"message": message}, 400)
+
+    except Exception as e:
+        message = f"Failed to check respondents qualification: {str(e)}"
+        logger.error(message)
+        return respond({"message": message}, 500)
+
+    logger.info(
+        f"Checking qualification of {len(respondents)} respondents for "
+        f"project type {project_type}."
+    )
+    results = itertools.chain([first_result], results)
+    if len(respondents) <= resources.BULK_ELIGIBILITY_STREAM_THRESHOLD:
+        results = await async_resources.run_blocking(
+            async_resources.executor, list, results
+        )
+        return respond({"project_type": project_type, "results": results}, 200)
+
+    # Starlette iterates synchronous bodies in its thread pool
+    return StreamingResponse(
+        resources.iter_json_results(project_type, results),
+        media_type="application/json",
+    )
+
+
+@app.get("/send_code/{country}/{phone_number:path}")
+async def send_code(country: str, phone_number: str):
+    """
+    Send an SMS verification code to the given phone number.
+    """
+    if not phone_number:
+        message = "Phone number is required."
+        logger.error(message)
+        return respond({"message": message}, 400)
+
+    try:
+        # Sanitize the phone number
+        phone_number = f"+{resources.transform_phone_number(country, phone_number)}"
+        # Use Twilio to send the verification SMS
+        verification = await async_resources.send_code(phone_number)
+        _status = verification.status
+        message = f"Verification code sent with status '{_status}'."
+        logger.info(message)
+        return respond({"message": message, "status": _status}, 200)
+
+    except CircuitOpen as e:
+        message = f"Failed to send code: {str(e)}"
+        logger.error(message)
+        return respond({"message": message}, 503)
+
+    except Exception as e:
+        message = f"Failed to send code: {str(e)}"
+        logger.error(message)
+        return respond({"message": message}, 500)
+
+
+@app.get("/verify/{country}/{phone_number}/{code:path}")
+async def verify(country: str, phone_number: str, code: str):
+    """
+    Verify the code sent to the phone number.
+    """
+    if not phone_number or not code:
+        message = "Phone number and code are required."
+        logger.error(message)
+        return respond({"message": message}, 400)
+
+    try:
+        # Sanitize the phone number
+        phone_number = f"+{resources.transform_phone_number(country, phone_number)}"
+        # Sanitize the code
+        code = code.replace(" ", "")
+        # Verify the code using Twilio; the Twilio client retries transient
+        # failures within its deadline, and a wrong code is a final answer
+        verification_check = await async_resources.verify_code(phone_number, code)
+        _status = verification_check.status
+        if _status != "approved":
+            logger.warning(
+                f"Verification code failed with status '{_status}'. Most likely the"
+                " code is incorrect and do not match the one sent by Twilio."
+            )
+
+        message = f"Verification code made with status '{_status}'."
+        logger.info(message)
+        return respond(
+            {
+                "message": message,
+                "status": _status,
+            },
+            200 if _status == "approved" else 400,
+        )
+
+    except CircuitOpen as e:
+        message = f"Verification failed: {str(e)}"
+        logger.error(message)
+        return respond({"message": message}, 503)
+
+    except Exception as e:
+        message = f"Verification failed: {str(e)}"
+        logger.error(message)
+        return respond({"message": message}, 500)
+
+
+@app.post("/write_respondent")
+async def write_respondent(request: Request):
+    """
+    Write respondent data to BigQuery.
+    """
+    body = await request.json()
+    country = body.get("country").strip()
+    phone_number = int(
+        resources.transform_phone_number(country, body.get("phone_number"))
+    )
+
+    data = {
+        "country": country,
+        "phone_number": phone_number,
+        "name": body.get("name").strip().lower(),
+        "age": int(body.get("age").strip()) if body.get("age") else None,
+        "gender": body.get("gender").strip().lower(),
+        "project_type": body.get("project_type").strip().lower(),
+        "response_datetime": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        "study_id": int(body.get("study_id").strip()),
+    }
+    logger.info(f"Data dictionary builded: {data}")
+
+    try:
+        # Writes to BQ
+        await async_resources.write_to_bq(data)
+        message = "Respondent data saved successfully."
+        logger.info(message)
+        return respond({"message": message}, 200)
+
+    except Exception as e:
+        message = f"Error writing respondent data to BQ: {str(e)}"
+        logger.error(message)
+        return respond({"message": message}, 500)
+
+
+@app.get("/send_wp_code/{country}/{phone_number:path}")
+async def send_wp_code(country: str, phone_number: str, supervisor: str = "false"):
+    """
+    Send a WhatsApp verification code to the given phone number.
+    """
+    if not phone_number:
+        message = "Phone number is required."
+        logger.error(message)
+        return respond({"message": message}, 400)
+
+    try:
+        is_supervisor = supervisor.lower() == "true"
+        if is_supervisor and not await async_resources.is_active_supervisor(
+            country, phone_number
+        ):
+            message = "Phone number is not an active supervisor."
+            logger.warning(message)
+            return respond({"message": message}, 403)
+
+        # Use WhatsApp to send the verification code
+        response = await async_resources.send_wp_code(country, phone_number)
+        message = f"WhatsApp code sent with response '{response}'."
+        logger.info(message)
+        return respond({"message": response}, 200)
+
+    except RateLimitExceeded as e:
+        message = f"Failed to send WhatsApp code: {str(e)}"
+        logger.warning(message)
+        return respond({"message": message}, 429)
+
+    except Exception as e:
+        message = f"Failed to send WhatsApp code: {str(e)}"
+        logger.error(message)
+        return respond({"message": message}, 500)
+
+
+@app.get("/start_verification/{country}/{phone_number}/{project_type:path}")
+async def start_verification(
+    country: str,
+    phone_number: str,
+    project_type: str,
+    channel: str = "whatsapp",
+    supervisor: str = "false",
+):
+    """
+    Check that the respondent qualifies and send a verification code in one
+    request, running the checks concurrently.
+    """
+    if not phone_number:
+        message = "Phone number is required."
+        logger.error(message)
+        return respond({"message": message}, 400)
+
+    channel = channel.lower()
+    if channel not in ("whatsapp", "sms"):
+        message = f"Unknown channel '{channel}'."
+        logger.error(message)
+        return respond({"message": message}, 400)
+
+    try:
+        result = await async_resources.start_verification(
+            country,
+            phone_number,
+            project_type,
+            channel=channel,
+            supervisor=supervisor.lower() == "true",
+        )
+        content = {
+            "status": result.status,
+            "is_qualified": result.is_qualified,
+            "is_supervisor": result.is_supervisor,
+            "message": result.response,
+            "timings_ms": result.timings_ms,
+        }
+        logger.info(
+            f"Verification start for {phone_number}: {result.status} "
+            f"in {result.timings_ms['total']} ms."
+        )
+        return respond(content, resources.START_VERIFICATION_STATUS_CODES[result.status])
+
+    except CircuitOpen as e:
+        message = f"Failed to start verification: {str(e)}"
+        logger.error(message)
+        return respond({"message": message}, 503)
+
+    except Exception as e:
+        message = f"Failed to start verification: {str(e)}"
+        logger.error(message)
+        return respond({"message": message}, 500)
+
+
+@app.get("/verify_wp_code/{country}/{phone_number}/{code:path}")
+async def verify_wp_code(country: str, phone_number: str, code: str):
+    if not phone_number or not code:
+        message = "Phone number and code are required."
+        logger.error(message)
+        return respond({"message": message}, 400)
+
+    try:
+        # Sanitize the code
+        code = code.replace(" ", "")
+        verification_check = await async_resources.verify_wp_code(
+            country, phone_number, code
+        )
+        if verification_check.verified:
+            message = (
+                f"WhatsApp code verified with status '{verification_check.status}'."
+            )
+            logger.info(message)
+            return respond({"message": message}, 200)
+        else:
+            message = (
+                f"Verification code failed with status '{verification_check.status}'. "
+                "Most likely the code is incorrect and do not match the one "
+                "sent by WhatsApp."
+            )
+            logger.warning(message)
+            return respond({"message": message}, 400)
+
+    except Exception as e:
+        message = f"Verification failed: {str(e)}"
+        logger.error(message)
+        return respond({"message": message}, 500)
@@ -0,0 +1,296 @@
+"""
+Asyncio versions of the `resources` functions used by the ASGI service. The
+caches, indexes and respondent backend are shared with `resources`; only the
+calls that would block the event loop differ.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import os
+import random
+import time
+
+from google.cloud import firestore
+
+import resources
+from async_backends import (
+    AsyncFirestoreVerificationCodeStore,
+    AsyncGraphWhatsAppSender,
+    AsyncTwilioVerificationSender,
+    AsyncVerificationCodeStore,
+    AsyncVerificationSender,
+    AsyncWhatsAppSender,
+    ExecutorVerificationCodeStore,
+    ExecutorVerificationSender,
+    ExecutorWhatsAppSender,
+    run_blocking,
+)
+from phone_numbers import normalize_phone
+from single_flight import AsyncSingleFlight
+from telemetry import traced
+from twilio_gateway import AsyncTwilioVerifyClient, client_settings_from_env
+from whatsapp_client import AsyncWhatsAppClient
+
+# Threads for BigQuery and the local stand-ins; calls beyond this wait
+# in the executor queue instead of spawning threads
+BLOCKING_EXECUTOR_WORKERS = int(os.getenv("BLOCKING_EXECUTOR_WORKERS", "32"))
+
+executor = ThreadPoolExecutor(
+    max_workers=BLOCKING_EXECUTOR_WORKERS, thread_name_prefix="blocking"
+)
+
+wp_code_verifications = AsyncSingleFlight()
+
+# Created on startup, inside the event loop the clients will be bound to
+code_store: AsyncVerificationCodeStore | None = None
+verification_sender: AsyncVerificationSender | None = None
+whatsapp_sender: AsyncWhatsAppSender | None = None
+
+
+def start():
+    global code_store, verification_sender, whatsapp_sender
+
+    resources.start_supervisor_directory()
+
+    if resources.IDENTITY_BACKEND == "local":
+        code_store = ExecutorVerificationCodeStore(resources.code_store, executor)
+        verification_sender = ExecutorVerificationSender(
+            resources.verification_sender, executor
+        )
+        whatsapp_sender = ExecutorWhatsAppSender(resources.whatsapp_sender, executor)
+
+    else:
+        # Shares the credentials discovered for the synchronous clients
+        credentials, project = resources.client_registry.get("google_credentials")
+        code_store = AsyncFirestoreVerificationCodeStore(
+            firestore.AsyncClient(project=project, credentials=credentials),
+            resources.FIRESTORE_PHONE_VERIFICATION_COLLECTION,
+        )
+        verification_sender = AsyncTwilioVerificationSender(
+            AsyncTwilioVerifyClient(
+                **client_settings_from_env(),
+                pool_size=int(os.getenv("BACKEND_HTTP_POOL_SIZE", "10")),
+            )
+        )
+        whatsapp_sender = AsyncGraphWhatsAppSender(
+            AsyncWhatsAppClient(
+                os.getenv("WHATSAPP_PHONE_NUMBER_ID"),
+                os.getenv("WHATSAPP_ACCESS_TOKEN"),
+                pool_size=int(os.getenv("WHATSAPP_POOL_SIZE", "10")),
+                max_attempts=int(os.getenv("WHATSAPP_MAX_ATTEMPTS", "3")),
+                on_send=resources.log_whatsapp_send,
+            )
+        )
+
+
+async def stop():
+    await verification_sender.close()
+    await whatsapp_sender.close()
+    executor.shutdown(wait=False)
+
+
+async def is_respondent_qualified(phone_number: int, project_type: str) -> bool:
+    return await run_blocking(
+        executor, resources.is_respondent_qualified, phone_number, project_type
+    )
+
+
+async def is_active_supervisor(country: str, phone_number: str) -> bool:
+    if resources.supervisor_directory.numbers is None:
+        # First check before the snapshot loaded reads the document
+        return await run_blocking(
+            executor, resources.is_active_supervisor, country, phone_number
+        )
+    return resources.is_active_supervisor(country, phone_number)
+
+
+@traced("twilio")
+async def send_code(phone_number: str):
+    return await verification_sender.send_code(phone_number)
+
+
+@traced("twilio")
+async def verify_code(phone_number: str, code: str):
+    return await verification_sender.verify_code(phone_number, code)
+
+
+async def write_to_bq(data: dict):
+    await run_blocking(executor, resources.write_to_bq, data)
+
+
+@traced("documents")
+async def store_wp_code(phone_number: str, code: int):
+    await code_store.set(
+        phone_number, resources.wp_code_document(code, datetime.now(timezone.utc))
+    )
+
+
+async def acquire_send_slot(key: str):
+    if resources.rate_limiter.shared_backend is not None:
+        # The shared backend is a network round trip
+        await run_blocking(executor, resources.rate_limiter.acquire, key)
+    else:
+        resources.rate_limiter.acquire(key)
+
+
+async def try_acquire_send_slot(key: str) -> bool:
+    if resources.rate_limiter.shared_backend is not None:
+        return await run_blocking(executor, resources.rate_limiter.try_acquire, key)
+    return resources.rate_limiter.try_acquire(key)
+
+
+async def release_send_slot(key: str):
+    await run_blocking(executor, resources.rate_limiter.release, key)
+
+
+async def send_wp_code(country: str, phone_number: str) -> dict:
+    key = resources.transform_phone_number(country, phone_number)
+    await acquire_send_slot(key)
+    try:
+        return await deliver_wp_code(
+            resources.get_wp_phone_variants(country, phone_number)
+        )
+    except Exception:
+        # Only delivered codes count against the limit
+        await release_send_slot(key)
+        raise
+
+
+@traced("whatsapp")
+async def deliver_wp_code(phone_variants: list[str]) -> dict:
+    random_code = random.randint(1000, 9999)
+    last_error = None
+
+    for candidate_number in phone_variants:
+        sent, response_payload = await whatsapp_sender.send_template(
+            candidate_number, resources.WHATSAPP_TEMPLATE_NAME, random_code
+        )
+        if sent:
+            await store_wp_code(candidate_number, random_code)
+            return {
+                "response": response_payload,
+                "sent_to": candidate_number,
+                "attempted_numbers": phone_variants,
+            }
+
+        last_error = response_payload
+
+    raise ValueError(
+        "Failed to send WhatsApp code for all phone variants. "
+        f"Attempted numbers: {phone_variants}. Last error: {last_error}"
+    )
+
+
+async def timed(timings_ms: dict[str, float], step: str, awaitable):
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings_ms[step] = round((time.perf_counter() - start) * 1000, 1)
+
+
+async def resolved(value):
+    return value
+
+
+async def start_verification(
+    country: str,
+    phone_number: str,
+    project_type: str,
+    channel: str = "whatsapp",
+    supervisor: bool = False,
+) -> resources.VerificationStart:
+    start = time.perf_counter()
+    timings_ms = {}
+    # Same normalization as /check_respondent_qualified, which the
+    # eligibility cache and index keys rely on
+    project_type = project_type.strip().lower()
+    international = normalize_phone(country, phone_number).international
+
+    # Every check runs to completion, so a slot taken is known even when
+    # another check raises
+    results = await asyncio.gather(
+        timed(
+            timings_ms,
+            "qualification",
+            is_respondent_qualified(int(international), project_type),
+        ),
+        timed(
+            timings_ms,
+            "supervisor_check",
+            is_active_supervisor(country, phone_number),
+        )
+        if supervisor
+        else resolved(None),
+        timed(timings_ms, "rate_limit", try_acquire_send_slot(international))
+        if channel == "whatsapp"
+        else resolved(True),
+        return_exceptions=True,
+    )
+    is_qualified, is_supervisor, send_allowed = results
+    # The slot taken concurrently is given back unless a code is delivered:
+    # when a check fails or raises, or the delivery fails
+    slot_taken = channel == "whatsapp" and send_allowed is True
+    try:
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+        status = resources.verification_start_status(
+            is_qualified, is_supervisor, send_allowed
+        )
+
+        response = None
+        if status == "sent" and channel == "whatsapp":
+            response = await timed(
+                timings_ms,
+                "send",
+                deliver_wp_code(
+                    resources.get_wp_phone_variants(country, phone_number)
+                ),
+            )
+            slot_taken = False
+        elif status == "sent":
+            verification = await timed(
+                timings_ms, "send", send_code(f"+{international}")
+            )
+            response = {"status": verification.status}
+    finally:
+        if slot_taken:
+            await release_send_slot(international)
+
+    timings_ms["total"] = round((time.perf_counter() - start) * 1000, 1)
+    return resources.VerificationStart(
+        status=status,
+        is_qualified=is_qualified,
+        is_supervisor=is_supervisor,
+        response=response,
+        timings_ms=timings_ms,
+    )
+
+
+async def verify_wp_code(
+    country: str, phone_number: str, code: str
+) -> resources.WPCodeVerification:
+    phone_variants = resources.get_wp_phone_variants(country, phone_number)
+    return await wp_code_verifications.do(
+        (phone_variants[0], code),
+        lambda: check_wp_code(phone_variants, code),
+        resources.WP_CODE_VERIFICATION_TIMEOUT_SECONDS,
+    )
+
+
+@traced("documents")
+async def check_wp_code(
+    phone_variants: list[str], code: str
+) -> resources.WPCodeVerification:
+    documents = await code_store.get_many(phone_variants)
+    matched_number = resources.match_wp_code(phone_variants, documents, code)
+
+    if matched_number and await code_store.delete_many(
+        phone_variants, must_exist=[matched_number]
+    ):
+        return resources.WPCodeVerification(verified=True, status="success")
+
+    return resources.WPCodeVerification(verified=False, status="invalid_code")
@@ -0,0 +1,285 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Iterable, Iterator
+
+# Staged rows older than this are dropped by partition expiration; merges and
+# lookups only read this window
+STAGED_ROWS_LOOKBACK_HOURS = 24
+
+# Field holding the expiry of verification codes, and of the Firestore TTL
+# policy of their collection
+VERIFICATION_CODE_TTL_FIELD = "expires_at"
+
+# Rows older than the lookback window read by windowed respondent lookups: one
+# tells a single old response apart from none, the second flags duplicates
+LOOKBACK_SENTINEL_ROWS = 2
+
+
+def lookback_window_start(lookback_days: int) -> datetime:
+    # response_datetime is a naive UTC DATETIME
+    return (datetime.now(timezone.utc) - timedelta(days=lookback_days)).replace(
+        tzinfo=None
+    )
+
+
+@dataclass
+class RespondentRecord:
+    response_datetime: datetime
+
+
+@dataclass
+class VerificationResult:
+    status: str
+
+
+class RespondentBackend(ABC):
+    """Storage of respondent survey history (BigQuery in production)."""
+
+    @abstractmethod
+    def get_respondent_data(
+        self,
+        phone_number: int,
+        project_type: str,
+        include_staged: bool = False,
+        lookback_days: int | None = None,
+    ) -> list[RespondentRecord]:
+        """
+        With `include_staged`, staged rows that are not yet reflected in the
+        respondent table are returned as well. With `lookback_days`, only the
+        responses of the last `lookback_days` days are read, plus the latest
+        LOOKBACK_SENTINEL_ROWS older ones, so a table partitioned on
+        response_datetime is pruned to the window.
+        """
+
+    @abstractmethod
+    def iter_qualifications(
+        self,
+        phone_numbers: list[int],
+        project_type: str,
+        cooldown_days: int,
+        include_staged: bool = False,
+    ) -> Iterator[tuple[int, bool]]:
+        """
+        Yields (phone_number, is_qualified) for each distinct number, resolved
+        in one query: qualified without previous responses, or with a single
+        response at least `cooldown_days` old.
+        """
+
+    @abstractmethod
+    def insert_respondent(self, data: dict) -> None: ...
+
+    @abstractmethod
+    def update_response_datetime(
+        self, phone_number: int, project_type: str, response_datetime: datetime
+    ) -> None: ...
+
+    @abstractmethod
+    def upsert_respondent(self, data: dict) -> None:
+        """
+        Inserts the respondent, or updates the response_datetime when a row for
+        (phone_number, project_type) exists, in one atomic statement.
+        """
+
+    @abstractmethod
+    def deduplicate_respondents(self) -> int:
+        """
+        Keeps only the latest row of each duplicated (phone_number,
+        project_type). Returns the removed rows.
+        """
+
+    @abstractmethod
+    def iter_phone_numbers(
+        self, since: datetime | None = None
+    ) -> Iterator[tuple[str, int]]:
+        """
+        Yields (project_type, phone_number) for every respondent row, or only
+        rows answered at or after `since`.
+        """
+
+    @abstractmethod
+    def create_staging_table(self) -> None: ...
+
+    @abstractmethod
+    def insert_staged_rows(self, rows: list[dict], row_ids: list[str]) -> None:
+        """
+        Appends rows to the staging table. `row_ids` deduplicate retried
+        inserts of the same rows.
+        """
+
+    @abstractmethod
+    def merge_staged_rows(self) -> int:
+        """
+        Upserts the latest staged row of each (phone_number, project_type)
+        into the respondent table. Idempotent; returns the affected rows.
+        """
+
+
+class DocumentBackend(ABC):
+    """Document storage (Firestore in production)."""
+
+    @abstractmethod
+    def get(self, collection: str, document_id: str) -> dict | None: ...
+
+    @abstractmethod
+    def set(
+        self, collection: str, document_id: str, data: dict, merge: bool = False
+    ) -> None: ...
+
+    @abstractmethod
+    def delete(self, collection: str, document_id: str) -> None: ...
+
+    @abstractmethod
+    def get_many(
+        self, collection: str, document_ids: list[str]
+    ) -> dict[str, dict | None]:
+        """Reads the documents in one batch; missing documents map to None."""
+
+    @abstractmethod
+    def delete_many(
+        self,
+        collection: str,
+        document_ids: list[str],
+        must_exist: Iterable[str] = (),
+    ) -> bool:
+        """
+        Deletes the documents in one atomic batch. Returns False, deleting
+        nothing, when a document in `must_exist` is already gone.
+        """
+
+    @abstractmethod
+    def transact(
+        self,
+        collection: str,
+        document_id: str,
+        operation: Callable[[dict | None], dict | None],
+    ) -> None:
+        """
+        Atomically reads a document, passes its data (or None if it does not
+        exist) to `operation` and merges the returned data into it; None
+        leaves the document as it is. The operation may be retried, so it
+        must not have side effects.
+        """
+
+    @abstractmethod
+    def watch(
+        self,
+        collection: str,
+        document_id: str,
+        callback: Callable[[dict | None], None],
+    ) -> Callable[[], None]:
+        """
+        Calls `callback` with the document data (or None if it does not exist)
+        now and after every change. Returns a function that stops watching.
+        """
+
+
+def is_live_code(document: dict | None, now: datetime) -> bool:
+    return document is not None and document[VERIFICATION_CODE_TTL_FIELD] > now
+
+
+class VerificationCodeStore(ABC):
+    """
+    WhatsApp verification codes by phone number (Firestore in production).
+    Codes expire at their VERIFICATION_CODE_TTL_FIELD: reads never return
+    expired codes, and `delete_expired` removes them in batches.
+    """
+
+    @abstractmethod
+    def set(self, phone_number: str, document: dict) -> None: ...
+
+    @abstractmethod
+    def get_many(self, phone_numbers: list[str]) -> dict[str, dict | None]:
+        """Reads the codes in one batch; missing and expired codes map to None."""
+
+    @abstractmethod
+    def delete_many(
+        self, phone_numbers: list[str], must_exist: Iterable[str] = ()
+    ) -> bool:
+        """
+        Deletes the codes in one atomic batch. Returns False, deleting
+        nothing, when a code in `must_exist` is already gone.
+        """
+
+    @abstractmethod
+    def delete_expired(self, now: datetime, limit: int) -> int:
+        """
+        Deletes up to `limit` codes expired at `now` in one batch and returns
+        how many were deleted.
+        """
+
+    @abstractmethod
+    def count(self, now: datetime) -> tuple[int, int]:
+        """Returns the (live, expired) number of stored codes."""
+
+
+class VerificationSender(ABC):
+    """SMS verification codes (Twilio Verify in production)."""
+
+    @abstractmethod
+    def send_code(self, phone_number: str) -> Any: ...
+
+    @abstractmethod
+    def verify_code(self, phone_number: str, code: str) -> Any: ...
+
+    def stats(self) -> dict | None:
+        """Client metrics, for senders that keep them."""
+        return None
+
+
+class WhatsAppSender(ABC):
+    """WhatsApp template messages (Graph API in production)."""
+
+    @abstractmethod
+    def send_template(
+        self, phone_number: str, template_name: str, code: int
+    ) -> tuple[bool, dict]: ...
+
+
+def register_gcp_backends(
+    registry,
+    dataset: str,
+    table: str,
+    code_collection: str,
+    on_whatsapp_send: Callable | None = None,
+) -> None:
+    """
+    Registers the production clients and backends in a `ClientRegistry`.
+    """
+
+    def gcp():
+        # Importing the Google Cloud SDKs takes most of a cold start, so
+        # gcp_backends is only imported by the first client built
+        import gcp_backends
+
+        return gcp_backends
+
+    registry.register("google_credentials", lambda: gcp().default_credentials())
+    registry.register(
+        "bigquery_client",
+        lambda: gcp().create_bigquery_client(registry.get("google_credentials")),
+    )
+    registry.register(
+        "firestore_client",
+        lambda: gcp().create_firestore_client(registry.get("google_credentials")),
+    )
+    registry.register(
+        "respondent_backend",
+        lambda: gcp().BigQueryRespondentBackend(
+            registry.get("bigquery_client"), dataset, table
+        ),
+    )
+    registry.register(
+        "document_backend",
+        lambda: gcp().FirestoreDocumentBackend(registry.get("firestore_client")),
+    )
+    registry.register(
+        "code_store",
+        lambda: gcp().FirestoreVerificationCodeStore(
+            registry.get("firestore_client"), code_collection
+        ),
+    )
+    registry.register("verification_sender", lambda: gcp().create_twilio_sender())
+    registry.register(
+        "whatsapp_sender", lambda: gcp().create_whatsapp_sender(on_whatsapp_send)
+    )
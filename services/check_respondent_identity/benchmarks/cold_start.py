@@ -0,0 +1,109 @@
+"""
+Cold-start benchmark: starts the service with gunicorn.conf.py in a fresh
+process and reports the time until the first /check_health answers and until
+the first real response (a qualification check), with and without the
+background prewarm of the backend clients.
+
+Run from the service folder against the local stand-ins:
+
+    python -m benchmarks.cold_start --runs 5
+
+or with the production backends, given credentials for a scratch project:
+
+    python -m benchmarks.cold_start --backend gcp --runs 3
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import requests
+
+REAL_REQUEST_PATH = "/check_respondent_qualified/CO/3001112233/concept test"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url: str, deadline: float) -> requests.Response:
+    while True:
+        try:
+            return requests.get(url, timeout=30)
+        except requests.ConnectionError:
+            if time.perf_counter() > deadline:
+                raise
+            time.sleep(0.005)
+
+
+def cold_start(backend: str, prewarm: bool, app_module: str, real_request_delay: float):
+    port = free_port()
+    env = {
+        **os.environ,
+        "ENV": "prod",
+        "PORT": str(port),
+        "APP_MODULE": app_module,
+        "IDENTITY_BACKEND": backend,
+        "BACKEND_PREWARM": "true" if prewarm else "false",
+    }
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        wait_for(f"{base_url}/check_health", start + 60)
+        first_health = time.perf_counter() - start
+
+        # Gives the prewarm the head start a real first request would have
+        time.sleep(real_request_delay)
+        request_start = time.perf_counter()
+        requests.get(f"{base_url}{REAL_REQUEST_PATH}", timeout=60)
+        first_real = time.perf_counter() - request_start
+    finally:
+        process.terminate()
+        process.wait()
+
+    return first_health, first_real
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backend", choices=["local", "gcp"], default="local")
+    parser.add_argument("--app-module", default="main:app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--real-request-delay",
+        type=float,
+        default=0.5,
+        help="Seconds between the first health check and the first real request",
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'prewarm':<10}{'first /check_health ms':>24}"
+        f"{'first real response ms':>24}"
+    )
+    for prewarm in (False, True):
+        results = [
+            cold_start(
+                args.backend, prewarm, args.app_module, args.real_request_delay
+            )
+            for _ in range(args.runs)
+        ]
+        health = statistics.median(first_health for first_health, _ in results)
+        real = statistics.median(first_real for _, first_real in results)
+        print(f"{str(prewarm):<10}{health * 1000:>24.0f}{real * 1000:>24.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Asyncio load test for the respondent identity service. Reports request count,
+error count, p50 and p99 latency per Flask route.
+
+Start the service against the in-process stand-ins, then run the test
+(requires `httpx`):
+
+    IDENTITY_BACKEND=local FAKE_SENDER_LATENCY_MS=150 python main.py
+    python benchmarks/load_test.py --base-url http://127.0.0.1:8080 \\
+        --concurrency 50 --requests 2000
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from collections import defaultdict
+
+import httpx
+
+PROJECT_TYPE = "concept test"
+APPROVED_SMS_CODE = "123456"
+
+
+def random_phone_number(pool_size: int) -> str:
+    return f"300{random.randrange(pool_size):07d}"
+
+
+def build_scenarios(pool_size: int):
+    """
+    Each scenario returns (route template, method, path, json body).
+    """
+
+    def qualified():
+        phone = random_phone_number(pool_size)
+        return (
+            "/check_respondent_qualified",
+            "GET",
+            f"/check_respondent_qualified/CO/{phone}/{PROJECT_TYPE}",
+            None,
+        )
+
+    def send_wp_code():
+        phone = random_phone_number(pool_size)
+        return "/send_wp_code", "GET", f"/send_wp_code/CO/{phone}", None
+
+    def verify_wp_code():
+        phone = random_phone_number(pool_size)
+        code = random.randint(1000, 9999)
+        return "/verify_wp_code", "GET", f"/verify_wp_code/CO/{phone}/{code}", None
+
+    def send_code():
+        phone = random_phone_number(pool_size)
+        return "/send_code", "GET", f"/send_code/CO/{phone}", None
+
+    def verify():
+        phone = random_phone_number(pool_size)
+        return "/verify", "GET", f"/verify/CO/{phone}/{APPROVED_SMS_CODE}", None
+
+    def write_respondent():
+        phone = random_phone_number(pool_size)
+        return (
+            "/write_respondent",
+            "POST",
+            "/write_respondent",
+            {
+                "country": "CO",
+                "phone_number": phone,
+                "name": "load test",
+                "age": "30",
+                "gender": "femenino",
+                "project_type": PROJECT_TYPE,
+                "study_id": "1",
+            },
+        )
+
+    def health():
+        return "/check_health", "GET", "/check_health", None
+
+    # Weighted towards the survey entry path
+    return [qualified] * 4 + [send_wp_code, verify_wp_code] * 2 + [
+        send_code,
+        verify,
+        write_respondent,
+        health,
+    ]
+
+
+async def worker(
+    client: httpx.AsyncClient,
+    scenarios: list,
+    remaining: list[int],
+    latencies: dict[str, list[float]],
+    errors: dict[str, int],
+):
+    while remaining[0] > 0:
+        remaining[0] -= 1
+        route, method, path, body = random.choice(scenarios)()
+
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=body)
+            if response.status_code >= 500:
+                errors[route] += 1
+        except httpx.HTTPError:
+            errors[route] += 1
+        latencies[route].append((time.perf_counter() - start) * 1000)
+
+
+def percentile(values: list[float], q: int) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+async def run(base_url: str, concurrency: int, total_requests: int, pool_size: int):
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    remaining = [total_requests]
+    scenarios = build_scenarios(pool_size)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=30
+    ) as client:
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                worker(client, scenarios, remaining, latencies, errors)
+                for _ in range(concurrency)
+            )
+        )
+        elapsed = time.perf_counter() - start
+
+    print(
+        f"{total_requests} requests in {elapsed:.2f}s "
+        f"({total_requests / elapsed:.1f} req/s, concurrency {concurrency})"
+    )
+    print(f"{'route':<30}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for route in sorted(latencies):
+        values = latencies[route]
+        print(
+            f"{route:<30}{len(values):>8}{errors[route]:>8}"
+            f"{percentile(values, 50):>10.1f}{percentile(values, 99):>10.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8080")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument(
+        "--phone-pool", type=int, default=500, help="Distinct phone numbers to use"
+    )
+    args = parser.parse_args()
+
+    asyncio.run(run(args.base_url, args.concurrency, args.requests, args.phone_pool))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Microbenchmark of phone normalization: the former per-call regex functions
+against `phone_numbers.normalize_phone` (uncached and memoized) and the
+vectorized `normalize_phone_column`. One request normalizes the same number
+three times (route, WhatsApp variants, supervisor check), which the legacy
+path repeats in full.
+
+Run from the service folder (requires pandas):
+
+    python -m benchmarks.phone_normalization --numbers 100000
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+from pathlib import Path
+
+import pandas as pd
+
+import phone_numbers
+
+with open(
+    Path(__file__).parent.parent.joinpath("countries_phone_codes.json"), "r"
+) as file:
+    countries_phone_codes = json.load(file)
+
+
+def legacy_transform_phone_number(country: str, phone_number: str):
+    phone_number = re.sub(r"\D", "", phone_number)
+    country_phone_code = countries_phone_codes.get(country)
+    if country_phone_code in phone_number[: len(country_phone_code)]:
+        country_phone_code = ""
+    return f"{country_phone_code}{phone_number}"
+
+
+def legacy_get_wp_phone_variants(country: str, phone_number: str) -> list[str]:
+    digits_only_phone = re.sub(r"\D", "", phone_number)
+    transformed_phone = legacy_transform_phone_number(country, phone_number)
+
+    if country.strip().upper() != "MX":
+        return [transformed_phone]
+
+    if re.fullmatch(r"521\d{10}", digits_only_phone):
+        return [digits_only_phone]
+
+    if re.fullmatch(r"52\d{10}", digits_only_phone):
+        return [digits_only_phone]
+
+    if transformed_phone.startswith("521"):
+        local_number = transformed_phone[3:]
+    elif transformed_phone.startswith("52"):
+        local_number = transformed_phone[2:]
+    else:
+        return [transformed_phone]
+
+    return [f"521{local_number}", f"52{local_number}"]
+
+
+def legacy_request(country: str, phone_number: str):
+    legacy_transform_phone_number(country, phone_number)
+    legacy_get_wp_phone_variants(country, phone_number)
+    legacy_get_wp_phone_variants(country, phone_number)
+
+
+def normalized_request(country: str, phone_number: str):
+    for _ in range(3):
+        phone_numbers.normalize_phone(country, phone_number)
+
+
+def uncached_request(country: str, phone_number: str):
+    phone_numbers.normalize_phone.__wrapped__(country, phone_number)
+
+
+def sample_numbers(count: int) -> list[tuple[str, str]]:
+    random.seed(0)
+    samples = []
+    for _ in range(count):
+        country = random.choice(["CO", "MX", "PE", "EC", "AR", "US"])
+        prefix = random.choice(["", "+52 1 ", "57", "(300) "])
+        samples.append((country, f"{prefix}{random.randrange(10**9, 10**10)}"))
+    return samples
+
+
+def time_calls(function, samples) -> float:
+    start = time.perf_counter()
+    for country, phone_number in samples:
+        function(country, phone_number)
+    return (time.perf_counter() - start) / len(samples) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--numbers", type=int, default=100_000)
+    args = parser.parse_args()
+
+    samples = sample_numbers(args.numbers)
+
+    print(f"{'path':<34}{'us/request':>12}")
+    print(f"{'legacy regex functions':<34}{time_calls(legacy_request, samples):>12.2f}")
+    print(f"{'normalize_phone, uncached':<34}{time_calls(uncached_request, samples):>12.2f}")
+    phone_numbers.normalize_phone.cache_clear()
+    print(
+        f"{'normalize_phone, first request':<34}"
+        f"{time_calls(normalized_request, samples):>12.2f}"
+    )
+    print(
+        f"{'normalize_phone, repeat request':<34}"
+        f"{time_calls(normalized_request, samples):>12.2f}"
+    )
+
+    countries = pd.Series([country for country, _ in samples])
+    numbers = pd.Series([phone_number for _, phone_number in samples])
+    start = time.perf_counter()
+    phone_numbers.normalize_phone_column(countries, numbers)
+    elapsed = time.perf_counter() - start
+    print(f"{'normalize_phone_column':<34}{elapsed / len(samples) * 1e6:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Contention benchmark of WhatsApp code storage: the former Firestore
+transaction that counted requests in the code document against the sharded
+in-process rate limiter followed by a blind write. Many sends for the same few
+numbers run at once, as happens when a respondent keeps pressing "resend".
+
+Firestore server SDKs lock the documents read in a transaction until it
+commits, so the stand-in holds a per-document lock across the read and commit
+round trips of `transact`; a plain write is one round trip without locks.
+
+Run from the service folder:
+
+    python -m benchmarks.rate_limit_contention --numbers 20 --sends 50
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import statistics
+import threading
+import time
+
+from google.cloud import firestore
+
+from local_backends import InMemoryDocumentBackend
+from rate_limiter import RateLimiter
+
+COLLECTION = "phone_verification"
+# Same values as in resources
+CODE_EXPIRY_MINUTES = 5
+MAX_REQUESTS_PER_HOUR = 3
+
+
+class ContendedDocumentBackend(InMemoryDocumentBackend):
+    def __init__(self, round_trip_ms: float):
+        super().__init__()
+        self.round_trip_seconds = round_trip_ms / 1000
+        self.document_locks: dict[tuple[str, str], threading.Lock] = {}
+        self.document_locks_lock = threading.Lock()
+
+    def transact(self, collection, document_id, operation):
+        with self.document_locks_lock:
+            document_lock = self.document_locks.setdefault(
+                (collection, document_id), threading.Lock()
+            )
+        with document_lock:
+            time.sleep(self.round_trip_seconds)  # Read
+            super().transact(collection, document_id, operation)
+            time.sleep(self.round_trip_seconds)  # Commit
+
+    def set(self, collection, document_id, data, merge=False):
+        time.sleep(self.round_trip_seconds)
+        super().set(collection, document_id, data, merge=merge)
+
+
+def legacy_transaction_operation(code: int, now: datetime):
+    expires_at = now + timedelta(minutes=CODE_EXPIRY_MINUTES)
+
+    def transaction_operation(data):
+        if data is None:
+            return {
+                "code": code,
+                "created_at": firestore.SERVER_TIMESTAMP,
+                "last_request": firestore.SERVER_TIMESTAMP,
+                "expires_at": expires_at,
+                "request_count": 1,
+            }
+
+        last_request = data.get("last_request")
+        request_count = data.get("request_count", 0)
+        if last_request and (now - last_request).total_seconds() > 3600:
+            request_count = 0
+        if request_count >= MAX_REQUESTS_PER_HOUR:
+            raise Exception("Rate limit exceeded")
+
+        return {
+            "code": code,
+            "expires_at": expires_at,
+            "last_request": firestore.SERVER_TIMESTAMP,
+            "request_count": request_count + 1,
+        }
+
+    return transaction_operation
+
+
+def legacy_send(document_backend, rate_limiter, phone_number: str) -> bool:
+    try:
+        document_backend.transact(
+            COLLECTION,
+            phone_number,
+            legacy_transaction_operation(1234, datetime.now(timezone.utc)),
+        )
+    except Exception:
+        return False
+    return True
+
+
+def limiter_send(document_backend, rate_limiter, phone_number: str) -> bool:
+    if not rate_limiter.try_acquire(phone_number):
+        return False
+    now = datetime.now(timezone.utc)
+    document_backend.set(
+        COLLECTION,
+        phone_number,
+        {
+            "code": 1234,
+            "created_at": firestore.SERVER_TIMESTAMP,
+            "expires_at": now + timedelta(minutes=CODE_EXPIRY_MINUTES),
+        },
+    )
+    return True
+
+
+SEND_PATHS = {"transaction": legacy_send, "rate_limiter": limiter_send}
+
+
+def run(send_path, numbers: int, sends: int, round_trip_ms: float, workers: int):
+    document_backend = ContendedDocumentBackend(round_trip_ms)
+    rate_limiter = RateLimiter(MAX_REQUESTS_PER_HOUR, 3600)
+    phone_numbers = [f"57300{number:07d}" for number in range(numbers)]
+
+    def timed_send(phone_number: str) -> tuple[bool, float]:
+        start = time.perf_counter()
+        sent = send_path(document_backend, rate_limiter, phone_number)
+        return sent, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(
+            executor.map(
+                timed_send,
+                [phone_number for _ in range(sends) for phone_number in phone_numbers],
+            )
+        )
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for _, latency in results)
+    return {
+        "sends/s": len(results) / elapsed,
+        "p50 ms": statistics.median(latencies),
+        "p99 ms": latencies[int(len(latencies) * 0.99) - 1],
+        "stored": sum(sent for sent, _ in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--numbers", type=int, default=20)
+    parser.add_argument("--sends", type=int, default=50, help="Sends per number")
+    parser.add_argument("--round-trip-ms", type=float, default=20)
+    parser.add_argument("--workers", type=int, default=64)
+    args = parser.parse_args()
+
+    print(
+        f"{args.numbers} numbers x {args.sends} concurrent sends, "
+        f"{args.round_trip_ms:.0f} ms round trips, "
+        f"{MAX_REQUESTS_PER_HOUR} allowed per number"
+    )
+    print(f"{'path':<14}{'sends/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'stored':>8}")
+    for name, send_path in SEND_PATHS.items():
+        result = run(
+            send_path, args.numbers, args.sends, args.round_trip_ms, args.workers
+        )
+        print(
+            f"{name:<14}{result['sends/s']:>10.0f}{result['p50 ms']:>10.1f}"
+            f"{result['p99 ms']:>10.1f}{result['stored']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
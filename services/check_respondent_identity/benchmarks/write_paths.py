@@ -0,0 +1,192 @@
+"""
+Compares the former read-then-write respondent save (a lookup job followed by
+an insert or update job) with the single MERGE upsert. Reports p50/p99 latency
+of sequential saves and the duplicate rows left by concurrent submissions of
+the same new respondents. Then checks the buffered path: rows inserted into
+the staging table must be seen by eligibility reads before the merge and be
+in the respondent table after it.
+
+Run from the service folder against the local stand-ins, where
+LOCAL_STORAGE_LATENCY_MS plays the part of a BigQuery job round trip:
+
+    python -m benchmarks.write_paths --latency-ms 800 --saves 50
+
+or against a scratch BigQuery table (never the production one):
+
+    python -m benchmarks.write_paths --backend gcp --dataset scratch \\
+        --table respondent_benchmark --saves 20
+
+The staging table queries only differ from the stand-ins' on BigQuery, so run
+the gcp variant after changing them.
+"""
+
+import argparse
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from backends import RespondentBackend
+
+PROJECT_TYPE = "write benchmark"
+
+
+def respondent_row(phone_number: int) -> dict:
+    return {
+        "country": "CO",
+        "phone_number": phone_number,
+        "name": "write benchmark",
+        "age": 30,
+        "gender": "femenino",
+        "project_type": PROJECT_TYPE,
+        "response_datetime": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        "study_id": 1,
+    }
+
+
+def read_then_write(respondent_backend: RespondentBackend, data: dict):
+    results = respondent_backend.get_respondent_data(
+        data["phone_number"], data["project_type"]
+    )
+    if len(results) == 0:
+        respondent_backend.insert_respondent(data)
+    elif len(results) == 1:
+        respondent_backend.update_response_datetime(
+            data["phone_number"], data["project_type"], datetime.now(timezone.utc)
+        )
+    else:
+        raise ValueError(
+            "Multiple records found for the given phone number and project type"
+        )
+
+
+def merge_upsert(respondent_backend: RespondentBackend, data: dict):
+    respondent_backend.upsert_respondent(data)
+
+
+WRITE_PATHS = {"read_then_write": read_then_write, "merge": merge_upsert}
+
+
+def time_saves(respondent_backend, write_path, phone_numbers: list[int]):
+    latencies = []
+    for phone_number in phone_numbers:
+        start = time.perf_counter()
+        write_path(respondent_backend, respondent_row(phone_number))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def race_saves(respondent_backend, write_path, phone_numbers: list[int], racers: int):
+    """Submits each new respondent `racers` times at once."""
+    barrier = threading.Barrier(racers)
+    failures = 0
+
+    def submit(phone_number: int):
+        nonlocal failures
+        barrier.wait()
+        try:
+            write_path(respondent_backend, respondent_row(phone_number))
+        except Exception:
+            failures += 1
+
+    with ThreadPoolExecutor(racers) as executor:
+        for phone_number in phone_numbers:
+            list(executor.map(submit, [phone_number] * racers))
+
+    duplicates = sum(
+        max(len(respondent_backend.get_respondent_data(phone, PROJECT_TYPE)) - 1, 0)
+        for phone in phone_numbers
+    )
+    return duplicates, failures
+
+
+def check_staged_rows(respondent_backend, phone_numbers: list[int]):
+    """Returns the staged rows seen before the merge and found after it."""
+    respondent_backend.create_staging_table()
+    rows = [respondent_row(phone_number) for phone_number in phone_numbers]
+    respondent_backend.insert_staged_rows(
+        rows, [str(uuid.uuid4()) for _ in rows]
+    )
+
+    def found(include_staged: bool) -> int:
+        return sum(
+            bool(
+                respondent_backend.get_respondent_data(
+                    phone_number, PROJECT_TYPE, include_staged=include_staged
+                )
+            )
+            for phone_number in phone_numbers
+        )
+
+    staged = found(include_staged=True)
+    respondent_backend.merge_staged_rows()
+    merged = found(include_staged=False)
+    return staged, merged
+
+
+def percentile(values: list[float], q: int) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def create_backend(args) -> RespondentBackend:
+    if args.backend == "local":
+        from local_backends import SQLRespondentBackend, connect_respondent_database
+
+        return SQLRespondentBackend(
+            connect_respondent_database(), latency_ms=args.latency_ms
+        )
+
+    from google.cloud import bigquery
+
+    from gcp_backends import BigQueryRespondentBackend
+
+    return BigQueryRespondentBackend(bigquery.Client(), args.dataset, args.table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backend", choices=["local", "gcp"], default="local")
+    parser.add_argument("--dataset", default="scratch")
+    parser.add_argument("--table", default="respondent_benchmark")
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--saves", type=int, default=50)
+    parser.add_argument("--racers", type=int, default=2)
+    args = parser.parse_args()
+
+    respondent_backend = create_backend(args)
+    base_phone_number = 570000000000 + int(time.time()) % 1_000_000 * 1000
+
+    print(f"{'path':<18}{'saves':>7}{'p50 ms':>10}{'p99 ms':>10}{'dupes':>7}{'fails':>7}")
+    for offset, (name, write_path) in enumerate(WRITE_PATHS.items()):
+        first_phone_number = base_phone_number + offset * 10 * args.saves
+        new_numbers = list(range(first_phone_number, first_phone_number + args.saves))
+        # Half the saves update respondents written by the first half
+        latencies = time_saves(respondent_backend, write_path, new_numbers)
+        latencies += time_saves(respondent_backend, write_path, new_numbers)
+
+        race_numbers = [phone + 5 * args.saves for phone in new_numbers]
+        duplicates, failures = race_saves(
+            respondent_backend, write_path, race_numbers, args.racers
+        )
+        print(
+            f"{name:<18}{len(latencies):>7}{percentile(latencies, 50):>10.1f}"
+            f"{percentile(latencies, 99):>10.1f}{duplicates:>7}{failures:>7}"
+        )
+
+    first_phone_number = base_phone_number + len(WRITE_PATHS) * 10 * args.saves
+    staged_numbers = list(range(first_phone_number, first_phone_number + args.saves))
+    staged, merged = check_staged_rows(respondent_backend, staged_numbers)
+    print(
+        f"staged rows seen before the merge: {staged}/{args.saves}, "
+        f"merged: {merged}/{args.saves}"
+    )
+    if staged != args.saves or merged != args.saves:
+        raise SystemExit("Staged rows were lost on the buffered write path")
+
+
+if __name__ == "__main__":
+    main()
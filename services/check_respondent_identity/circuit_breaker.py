@@ -0,0 +1,86 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Fails calls fast while a dependency is degraded. After
+    `failure_threshold` consecutive failures the circuit opens and calls are
+    rejected for `reset_seconds`; then a single trial call is let through,
+    which closes the circuit when it succeeds and reopens it when it fails.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.lock = threading.Lock()
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.metrics = {"opened": 0, "rejected": 0, "failures": 0}
+
+    def before_call(self) -> None:
+        """Raises CircuitOpen when the call must not reach the dependency."""
+        with self.lock:
+            if self.state == "closed":
+                return
+            if (
+                self.state == "open"
+                and time.monotonic() - self.opened_at >= self.reset_seconds
+            ):
+                self.state = "half_open"
+            if self.state == "half_open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return
+            self.metrics["rejected"] += 1
+        raise CircuitOpen(f"{self.name} is unavailable, retry later")
+
+    def record_success(self) -> None:
+        with self.lock:
+            if self.state != "closed":
+                logger.info(f"Circuit of {self.name} closed.")
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.metrics["failures"] += 1
+            self.consecutive_failures += 1
+            if self.state == "half_open" or (
+                self.state == "closed"
+                and self.consecutive_failures >= self.failure_threshold
+            ):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self.trial_in_flight = False
+                self.metrics["opened"] += 1
+                logger.warning(
+                    f"Circuit of {self.name} opened after "
+                    f"{self.consecutive_failures} consecutive failures."
+                )
+
+    def release_trial(self) -> None:
+        """
+        Lets another trial call through after one ended without an outcome,
+        e.g. cancelled, so the circuit does not stay half open for good.
+        """
+        with self.lock:
+            self.trial_in_flight = False
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                **self.metrics,
+            }
@@ -0,0 +1,90 @@
+"""
+Registry of the service's backend clients. Each one is built by its factory
+on first use and shared afterwards, so a cold start only pays for the SDK
+imports, credential discovery and channels of the routes actually called.
+Everything can also be built ahead of time in a background thread.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+
+class ClientRegistry:
+    def __init__(self):
+        self.factories: dict[str, Callable[[], Any]] = {}
+        self.instances: dict[str, Any] = {}
+        self.locks: dict[str, threading.Lock] = {}
+        self.init_seconds: dict[str, float] = {}
+        self.prewarm_seconds: float | None = None
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        self.factories[name] = factory
+        self.locks[name] = threading.Lock()
+
+    def get(self, name: str) -> Any:
+        instance = self.instances.get(name)
+        if instance is not None:
+            return instance
+
+        # One lock per client, so a slow client does not hold up the others
+        with self.locks[name]:
+            instance = self.instances.get(name)
+            if instance is None:
+                start = time.perf_counter()
+                instance = self.factories[name]()
+                self.init_seconds[name] = round(time.perf_counter() - start, 3)
+                logger.info(
+                    f"Created {name} in {self.init_seconds[name] * 1000:.0f} ms."
+                )
+                self.instances[name] = instance
+        return instance
+
+    def lazy(self, name: str) -> "LazyClient":
+        return LazyClient(self, name)
+
+    def prewarm(self, names: Iterable[str] | None = None) -> threading.Thread:
+        """
+        Builds `names` (default all registered clients) in a daemon thread.
+        Failures are logged; the client is built again on first use.
+        """
+        names = list(names if names is not None else self.factories)
+
+        def prewarm_clients():
+            start = time.perf_counter()
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    logger.warning(f"Failed to prewarm {name}: {str(e)}")
+            self.prewarm_seconds = round(time.perf_counter() - start, 3)
+
+        thread = threading.Thread(
+            target=prewarm_clients, name="client-prewarm", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def stats(self) -> dict:
+        return {
+            "registered": sorted(self.factories),
+            "created": dict(self.init_seconds),
+            "prewarm_seconds": self.prewarm_seconds,
+        }
+
+
+class LazyClient:
+    """Stands in for a registry client and builds it on first attribute access."""
+
+    def __init__(self, registry: ClientRegistry, name: str):
+        self._registry = registry
+        self._name = name
+
+    def __getattr__(self, attribute: str) -> Any:
+        return getattr(self._registry.get(self._name), attribute)
+
+    def __repr__(self) -> str:
+        return f"LazyClient({self._name!r})"
@@ -0,0 +1,67 @@
+"""
+Background deletion of expired verification codes. Codes are otherwise only
+deleted when verified, so abandoned sends would pile up in the store.
+"""
+
+from datetime import datetime, timezone
+import logging
+import threading
+import time
+
+from backends import VerificationCodeStore
+
+logger = logging.getLogger(__name__)
+
+
+class VerificationCodeSweeper:
+    def __init__(self, code_store: VerificationCodeStore, batch_size: int = 500):
+        self.code_store = code_store
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.metrics = {
+            "sweeps": 0,
+            "deleted": 0,
+            "errors": 0,
+            "last_deleted": 0,
+            "last_sweep_seconds": None,
+        }
+
+    def sweep(self) -> int:
+        """Deletes the codes expired so far in batches; returns how many."""
+        start = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        deleted = 0
+        while True:
+            batch_deleted = self.code_store.delete_expired(now, self.batch_size)
+            deleted += batch_deleted
+            if batch_deleted < self.batch_size:
+                break
+
+        with self.lock:
+            self.metrics["sweeps"] += 1
+            self.metrics["deleted"] += deleted
+            self.metrics["last_deleted"] = deleted
+            self.metrics["last_sweep_seconds"] = round(time.perf_counter() - start, 3)
+        if deleted:
+            logger.info(f"Deleted {deleted} expired verification codes.")
+        return deleted
+
+    def stats(self) -> dict:
+        live, expired = self.code_store.count(datetime.now(timezone.utc))
+        with self.lock:
+            return {"live": live, "expired": expired, **self.metrics}
+
+    def start(self, interval_seconds: float):
+        """Sweeps every `interval_seconds` in a daemon thread."""
+
+        def run():
+            while True:
+                time.sleep(interval_seconds)
+                try:
+                    self.sweep()
+                except Exception as e:
+                    logger.error(f"Verification code sweep failed: {str(e)}")
+                    with self.lock:
+                        self.metrics["errors"] += 1
+
+        threading.Thread(target=run, name="code-sweeper", daemon=True).start()
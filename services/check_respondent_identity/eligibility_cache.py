@@ -0,0 +1,331 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone, timedelta
+import json
+import logging
+import threading
+import time
+
+from backends import DocumentBackend
+
+logger = logging.getLogger(__name__)
+
+EligibilityKey = tuple[int, str]
+# Response datetimes stored for a (phone_number, project_type); empty when the
+# respondent never answered that project type
+ResponseDatetimes = tuple[datetime, ...]
+
+# Instances compare their clocks through the shared tier's invalidation
+# times; a value loaded up to this long before an invalidation is dropped too
+INVALIDATION_CLOCK_SKEW_SECONDS = 1
+
+
+@dataclass(frozen=True)
+class LoadToken:
+    """Taken before loading a value, to tell whether it may predate a write."""
+
+    generation: int
+    started_at: datetime
+
+
+def serialize_key(key: EligibilityKey) -> str:
+    phone_number, project_type = key
+    # Document ids cannot contain "/"
+    return f"{phone_number}_{project_type}".replace("/", "_")
+
+
+class SharedCacheTier(ABC):
+    """Cache tier shared by all instances of the service."""
+
+    @abstractmethod
+    def get(self, key: EligibilityKey) -> ResponseDatetimes | None: ...
+
+    @abstractmethod
+    def set(
+        self,
+        key: EligibilityKey,
+        value: ResponseDatetimes,
+        ttl_seconds: float,
+        loaded_after: datetime | None = None,
+    ) -> None:
+        """
+        Stores the value, unless the key was invalidated at or after
+        `loaded_after`, when the value may predate the write that
+        invalidated it.
+        """
+
+    @abstractmethod
+    def invalidate(self, key: EligibilityKey, ttl_seconds: float) -> None:
+        """
+        Removes the value and remembers the invalidation time for
+        `ttl_seconds`, the longest a lookup racing it can take to be cached.
+        """
+
+
+class DocumentCacheTier(SharedCacheTier):
+    """
+    Stores entries as documents through a `DocumentBackend` (Firestore in
+    production). Expired documents are ignored on read.
+    """
+
+    def __init__(self, document_backend: DocumentBackend, collection: str):
+        self.document_backend = document_backend
+        self.collection = collection
+
+    def get(self, key: EligibilityKey) -> ResponseDatetimes | None:
+        document = self.document_backend.get(self.collection, serialize_key(key))
+        if (
+            not document
+            or "response_datetimes" not in document
+            or document["expires_at"] < datetime.now(timezone.utc)
+        ):
+            return None
+        return tuple(
+            datetime.fromisoformat(value) for value in document["response_datetimes"]
+        )
+
+    def set(
+        self,
+        key: EligibilityKey,
+        value: ResponseDatetimes,
+        ttl_seconds: float,
+        loaded_after: datetime | None = None,
+    ) -> None:
+        data = {
+            "response_datetimes": [item.isoformat() for item in value],
+            "expires_at": datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds),
+        }
+        if loaded_after is None:
+            self.document_backend.set(self.collection, serialize_key(key), data)
+            return
+
+        def operation(document: dict | None) -> dict | None:
+            invalidated_at = (document or {}).get("invalidated_at")
+            if invalidated_at is not None and invalidated_at >= loaded_after:
+                return None
+            return data
+
+        self.document_backend.transact(
+            self.collection, serialize_key(key), operation
+        )
+
+    def invalidate(self, key: EligibilityKey, ttl_seconds: float) -> None:
+        now = datetime.now(timezone.utc)
+        # Replaces the whole document, dropping the cached datetimes
+        self.document_backend.set(
+            self.collection,
+            serialize_key(key),
+            {
+                "invalidated_at": now,
+                "expires_at": now + timedelta(seconds=ttl_seconds),
+            },
+        )
+
+
+# Sets the value unless the key was invalidated at or after ARGV[3]
+CONDITIONAL_SET_SCRIPT = """
+local invalidated_at = redis.call("GET", KEYS[2])
+if invalidated_at and tonumber(invalidated_at) >= tonumber(ARGV[3]) then
+    return 0
+end
+redis.call("SET", KEYS[1], ARGV[1], "EX", ARGV[2])
+return 1
+"""
+
+# Deletes the value and records the invalidation time
+INVALIDATE_SCRIPT = """
+redis.call("DEL", KEYS[1])
+redis.call("SET", KEYS[2], ARGV[1], "EX", ARGV[2])
+return 1
+"""
+
+
+class RedisCacheTier(SharedCacheTier):
+    """
+    Works with any Redis-compatible client exposing `get` and
+    `register_script` (Memorystore, Valkey, ...). The value and invalidation
+    time of a key share a hash tag, so they stay in one cluster slot.
+    """
+
+    def __init__(self, client, prefix: str = "eligibility:"):
+        self.client = client
+        self.prefix = prefix
+        self.conditional_set = client.register_script(CONDITIONAL_SET_SCRIPT)
+        self.invalidate_script = client.register_script(INVALIDATE_SCRIPT)
+
+    def _keys(self, key: EligibilityKey) -> list[str]:
+        tag = f"{{{serialize_key(key)}}}"
+        return [f"{self.prefix}{tag}", f"{self.prefix}{tag}:invalidated_at"]
+
+    def get(self, key: EligibilityKey) -> ResponseDatetimes | None:
+        value = self.client.get(self._keys(key)[0])
+        if value is None:
+            return None
+        return tuple(datetime.fromisoformat(item) for item in json.loads(value))
+
+    def set(
+        self,
+        key: EligibilityKey,
+        value: ResponseDatetimes,
+        ttl_seconds: float,
+        loaded_after: datetime | None = None,
+    ) -> None:
+        self.conditional_set(
+            keys=self._keys(key),
+            args=[
+                json.dumps([item.isoformat() for item in value]),
+                max(int(ttl_seconds), 1),
+                loaded_after.timestamp() if loaded_after is not None else "-inf",
+            ],
+        )
+
+    def invalidate(self, key: EligibilityKey, ttl_seconds: float) -> None:
+        self.invalidate_script(
+            keys=self._keys(key), args=[time.time(), max(int(ttl_seconds), 1)]
+        )
+
+
+class EligibilityCache:
+    """
+    Size-bounded LRU with TTL in front of the respondent table, optionally
+    backed by a shared tier. Shared tier failures are logged and treated as
+    misses so they never fail a request.
+
+    A value loaded before an invalidation of its key may predate the write,
+    so `set` drops it when passed the `begin_load()` token taken before
+    loading: locally when a later invalidation bumped the generation, and in
+    the shared tier when any instance invalidated the key since the token
+    was taken.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float,
+        max_entries: int,
+        shared_tier: SharedCacheTier | None = None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.shared_tier = shared_tier
+        self.entries: OrderedDict[EligibilityKey, tuple[float, ResponseDatetimes]] = (
+            OrderedDict()
+        )
+        # Generation of the latest invalidation of each key, for the last
+        # `max_entries` keys invalidated; older ones are known only to be at
+        # most `forgotten_generation`
+        self.invalidated_at: OrderedDict[EligibilityKey, int] = OrderedDict()
+        self.current_generation = 0
+        self.forgotten_generation = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.stale_sets = 0
+
+    def begin_load(self) -> LoadToken:
+        with self.lock:
+            return LoadToken(self.current_generation, datetime.now(timezone.utc))
+
+    def _is_stale(self, key: EligibilityKey, token: LoadToken | None) -> bool:
+        if token is None:
+            return False
+        return (
+            self.invalidated_at.get(key, self.forgotten_generation)
+            > token.generation
+        )
+
+    def _set_local(
+        self,
+        key: EligibilityKey,
+        value: ResponseDatetimes,
+        token: LoadToken | None = None,
+    ) -> bool:
+        with self.lock:
+            if self._is_stale(key, token):
+                self.stale_sets += 1
+                return False
+            self.entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return True
+
+    def get(self, key: EligibilityKey) -> ResponseDatetimes | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+
+        if self.shared_tier is not None:
+            try:
+                value = self.shared_tier.get(key)
+            except Exception as e:
+                logger.warning(f"Shared eligibility cache read failed: {str(e)}")
+                value = None
+
+            if value is not None:
+                self._set_local(key, value)
+                with self.lock:
+                    self.shared_hits += 1
+                return value
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def set(
+        self,
+        key: EligibilityKey,
+        value: ResponseDatetimes,
+        token: LoadToken | None = None,
+    ) -> None:
+        if not self._set_local(key, value, token):
+            return
+
+        if self.shared_tier is not None:
+            try:
+                self.shared_tier.set(
+                    key,
+                    value,
+                    self.ttl_seconds,
+                    loaded_after=(
+                        token.started_at
+                        - timedelta(seconds=INVALIDATION_CLOCK_SKEW_SECONDS)
+                        if token is not None
+                        else None
+                    ),
+                )
+            except Exception as e:
+                logger.warning(f"Shared eligibility cache write failed: {str(e)}")
+
+    def invalidate(self, key: EligibilityKey) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+            self.current_generation += 1
+            self.invalidated_at[key] = self.current_generation
+            self.invalidated_at.move_to_end(key)
+            while len(self.invalidated_at) > self.max_entries:
+                _, forgotten = self.invalidated_at.popitem(last=False)
+                self.forgotten_generation = max(self.forgotten_generation, forgotten)
+
+        if self.shared_tier is not None:
+            try:
+                self.shared_tier.invalidate(key, self.ttl_seconds)
+            except Exception as e:
+                logger.warning(f"Shared eligibility cache invalidation failed: {str(e)}")
+
+    def stats(self) -> dict[str, int]:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "stale_sets": self.stale_sets,
+            }
@@ -0,0 +1,715 @@
+"""
+Production backends on BigQuery, Firestore, Twilio Verify and the WhatsApp
+Cloud API, with factories for their clients. Imported lazily through
+`backends.register_gcp_backends`.
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Callable, Iterable, Iterator
+import os
+
+import google.auth
+from google.auth.transport.requests import AuthorizedSession
+from requests.adapters import HTTPAdapter
+
+from google.api_core import exceptions as google_exceptions
+from google.cloud import bigquery
+from google.cloud import firestore
+from google.cloud.firestore_v1 import FieldFilter
+
+from backends import (
+    LOOKBACK_SENTINEL_ROWS,
+    STAGED_ROWS_LOOKBACK_HOURS,
+    VERIFICATION_CODE_TTL_FIELD,
+    DocumentBackend,
+    RespondentBackend,
+    RespondentRecord,
+    VerificationCodeStore,
+    VerificationResult,
+    VerificationSender,
+    WhatsAppSender,
+    is_live_code,
+    lookback_window_start,
+)
+from twilio_gateway import TwilioVerifyClient, client_settings_from_env
+from whatsapp_client import SendMetrics, WhatsAppClient, template_message
+
+# Connections kept per HTTP client (BigQuery, Twilio); size it to the request
+# threads of a worker
+BACKEND_HTTP_POOL_SIZE = int(os.getenv("BACKEND_HTTP_POOL_SIZE", "10"))
+
+
+class BigQueryRespondentBackend(RespondentBackend):
+    def __init__(self, client: bigquery.Client, dataset: str, table: str):
+        self.client = client
+        self.dataset = dataset
+        self.table = table
+
+    @property
+    def table_id(self) -> str:
+        return f"{os.getenv('GCP_PROJECT_ID')}.{self.dataset}.{self.table}"
+
+    @property
+    def staging_table_id(self) -> str:
+        return f"{self.table_id}_staging"
+
+    def get_respondent_data(
+        self,
+        phone_number: int,
+        project_type: str,
+        include_staged: bool = False,
+        lookback_days: int | None = None,
+    ) -> list[RespondentRecord]:
+        query, job_config = self.respondent_data_query(
+            phone_number, project_type, include_staged, lookback_days
+        )
+        query_job = self.client.query(query, job_config=job_config)
+
+        return [
+            RespondentRecord(response_datetime=row.response_datetime)
+            for row in query_job.result()
+        ]
+
+    def respondent_data_query(
+        self,
+        phone_number: int,
+        project_type: str,
+        include_staged: bool = False,
+        lookback_days: int | None = None,
+    ) -> tuple[str, bigquery.QueryJobConfig]:
+        query = f"""
+            SELECT
+                response_datetime
+            FROM `{self.table_id}`
+            WHERE phone_number = @phone_number
+                AND project_type = @project_type
+        """
+        query_parameters = [
+            bigquery.ScalarQueryParameter("phone_number", "INT64", phone_number),
+            bigquery.ScalarQueryParameter("project_type", "STRING", project_type),
+        ]
+        if lookback_days is not None:
+            # A constant bound prunes the partitions outside the window; the
+            # older range is only read for its latest rows, through the
+            # (project_type, phone_number) clustering
+            query += f"""
+                AND response_datetime >= @window_start
+            UNION ALL
+            SELECT
+                response_datetime
+            FROM (
+                SELECT
+                    response_datetime
+                FROM `{self.table_id}`
+                WHERE phone_number = @phone_number
+                    AND project_type = @project_type
+                    AND response_datetime < @window_start
+                ORDER BY response_datetime DESC
+                LIMIT {LOOKBACK_SENTINEL_ROWS}
+            )
+            """
+            query_parameters.append(
+                bigquery.ScalarQueryParameter(
+                    "window_start", "DATETIME", lookback_window_start(lookback_days)
+                )
+            )
+        if include_staged:
+            query += f"""
+            UNION ALL
+            SELECT
+                staged.response_datetime
+            FROM `{self.staging_table_id}` AS staged
+            WHERE staged.inserted_at >= TIMESTAMP_SUB(
+                    CURRENT_TIMESTAMP(), INTERVAL {STAGED_ROWS_LOOKBACK_HOURS} HOUR
+                )
+                AND staged.phone_number = @phone_number
+                AND staged.project_type = @project_type
+                AND NOT EXISTS (
+                    SELECT 1
+                    FROM `{self.table_id}` AS respondent
+                    WHERE respondent.phone_number = staged.phone_number
+                        AND respondent.project_type = staged.project_type
+                        AND respondent.response_datetime >= staged.response_datetime
+                )
+            """
+        return query, bigquery.QueryJobConfig(query_parameters=query_parameters)
+
+    def iter_qualifications(
+        self,
+        phone_numbers: list[int],
+        project_type: str,
+        cooldown_days: int,
+        include_staged: bool = False,
+    ) -> Iterator[tuple[int, bool]]:
+        responses_query = f"""
+                SELECT
+                    phone_number,
+                    response_datetime
+                FROM `{self.table_id}`
+                WHERE project_type = @project_type
+                    AND phone_number IN UNNEST(@phone_numbers)
+        """
+        if include_staged:
+            responses_query += f"""
+                UNION ALL
+                SELECT
+                    staged.phone_number,
+                    staged.response_datetime
+                FROM `{self.staging_table_id}` AS staged
+                WHERE staged.inserted_at >= TIMESTAMP_SUB(
+                        CURRENT_TIMESTAMP(), INTERVAL {STAGED_ROWS_LOOKBACK_HOURS} HOUR
+                    )
+                    AND staged.project_type = @project_type
+                    AND staged.phone_number IN UNNEST(@phone_numbers)
+                    AND NOT EXISTS (
+                        SELECT 1
+                        FROM `{self.table_id}` AS respondent
+                        WHERE respondent.phone_number = staged.phone_number
+                            AND respondent.project_type = staged.project_type
+                            AND respondent.response_datetime >= staged.response_datetime
+                    )
+            """
+        query = f"""
+            WITH requested AS (
+                SELECT DISTINCT phone_number
+                FROM UNNEST(@phone_numbers) AS phone_number
+            ),
+            responses AS ({responses_query})
+            SELECT
+                requested.phone_number,
+                COUNT(responses.phone_number) = 0
+                    OR (
+                        COUNT(responses.phone_number) = 1
+                        AND MAX(responses.response_datetime) <= DATETIME_SUB(
+                            CURRENT_DATETIME(), INTERVAL @cooldown_days DAY
+                        )
+                    ) AS is_qualified
+            FROM requested
+            LEFT JOIN responses
+                ON responses.phone_number = requested.phone_number
+            GROUP BY requested.phone_number
+        """
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ArrayQueryParameter("phone_numbers", "INT64", phone_numbers),
+                bigquery.ScalarQueryParameter("project_type", "STRING", project_type),
+                bigquery.ScalarQueryParameter("cooldown_days", "INT64", cooldown_days),
+            ]
+        )
+        for row in self.client.query(query, job_config=job_config).result(
+            page_size=10_000
+        ):
+            yield row.phone_number, row.is_qualified
+
+    def insert_respondent(self, data: dict) -> None:
+        job = self.client.load_table_from_json([data], self.table_id)
+        job.result()  # Wait for the job to complete
+
+    def update_response_datetime(
+        self, phone_number: int, project_type: str, response_datetime: datetime
+    ) -> None:
+        update_query = f"""
+            UPDATE `{self.table_id}`
+            SET response_datetime = @response_datetime
+            WHERE phone_number = @phone_number
+                AND project_type = @project_type
+        """
+        update_job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ScalarQueryParameter(
+                    "response_datetime", "DATETIME", response_datetime
+                ),
+                bigquery.ScalarQueryParameter("phone_number", "INT64", phone_number),
+                bigquery.ScalarQueryParameter("project_type", "STRING", project_type),
+            ]
+        )
+        update_query_job = self.client.query(update_query, job_config=update_job_config)
+        update_query_job.result()  # Wait for the job to complete
+
+    def upsert_respondent(self, data: dict) -> None:
+        # BigQuery retries or fails conflicting concurrent DML on the table
+        # instead of applying both, so two submissions of a new respondent
+        # cannot both insert
+        merge_query = f"""
+            MERGE `{self.table_id}` AS respondent
+            USING (
+                SELECT
+                    @country AS country,
+                    @phone_number AS phone_number,
+                    @name AS name,
+                    @age AS age,
+                    @gender AS gender,
+                    @project_type AS project_type,
+                    @response_datetime AS response_datetime,
+                    @study_id AS study_id
+            ) AS submitted
+            ON respondent.phone_number = submitted.phone_number
+                AND respondent.project_type = submitted.project_type
+            WHEN MATCHED THEN
+                UPDATE SET response_datetime = submitted.response_datetime
+            WHEN NOT MATCHED THEN
+                INSERT (
+                    country,
+                    phone_number,
+                    name,
+                    age,
+                    gender,
+                    project_type,
+                    response_datetime,
+                    study_id
+                )
+                VALUES (
+                    submitted.country,
+                    submitted.phone_number,
+                    submitted.name,
+                    submitted.age,
+                    submitted.gender,
+                    submitted.project_type,
+                    submitted.response_datetime,
+                    submitted.study_id
+                )
+        """
+        merge_job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ScalarQueryParameter("country", "STRING", data["country"]),
+                bigquery.ScalarQueryParameter(
+                    "phone_number", "INT64", data["phone_number"]
+                ),
+                bigquery.ScalarQueryParameter("name", "STRING", data["name"]),
+                bigquery.ScalarQueryParameter("age", "INT64", data["age"]),
+                bigquery.ScalarQueryParameter("gender", "STRING", data["gender"]),
+                bigquery.ScalarQueryParameter(
+                    "project_type", "STRING", data["project_type"]
+                ),
+                bigquery.ScalarQueryParameter(
+                    "response_datetime",
+                    "DATETIME",
+                    datetime.strptime(data["response_datetime"], "%Y-%m-%d %H:%M:%S"),
+                ),
+                bigquery.ScalarQueryParameter("study_id", "INT64", data["study_id"]),
+            ]
+        )
+        merge_job = self.client.query(merge_query, job_config=merge_job_config)
+        merge_job.result()  # Wait for the job to complete
+
+    def deduplicate_respondents(self) -> int:
+        deduplicate_script = f"""
+            DECLARE removed_rows INT64;
+
+            BEGIN TRANSACTION;
+
+            CREATE TEMP TABLE latest_duplicates AS
+            SELECT * EXCEPT (row_number, row_count)
+            FROM (
+                SELECT
+                    *,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY phone_number, project_type
+                        ORDER BY response_datetime DESC
+                    ) AS row_number,
+                    COUNT(*) OVER (
+                        PARTITION BY phone_number, project_type
+                    ) AS row_count
+                FROM `{self.table_id}`
+            )
+            WHERE row_count > 1 AND row_number = 1;
+
+            DELETE FROM `{self.table_id}` AS respondent
+            WHERE EXISTS (
+                SELECT 1
+                FROM latest_duplicates
+                WHERE latest_duplicates.phone_number = respondent.phone_number
+                    AND latest_duplicates.project_type = respondent.project_type
+            );
+            SET removed_rows = @@row_count;
+
+            INSERT INTO `{self.table_id}`
+            SELECT * FROM latest_duplicates;
+            SET removed_rows = removed_rows - @@row_count;
+
+            COMMIT TRANSACTION;
+
+            SELECT removed_rows;
+        """
+        # A script's result is the one of its last statement
+        rows = self.client.query(deduplicate_script).result()
+        return next(iter(rows)).removed_rows
+
+    def iter_phone_numbers(
+        self, since: datetime | None = None
+    ) -> Iterator[tuple[str, int]]:
+        query = f"""
+            SELECT DISTINCT
+                project_type,
+                phone_number
+            FROM `{self.table_id}`
+            WHERE @since IS NULL OR response_datetime >= @since
+        """
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ScalarQueryParameter(
+                    "since", "DATETIME", since.replace(tzinfo=None) if since else None
+                ),
+            ]
+        )
+        # Rows are paged in lazily, never materialized all at once
+        for row in self.client.query(query, job_config=job_config).result(
+            page_size=100_000
+        ):
+            yield row.project_type, row.phone_number
+
+    def create_staging_table(self) -> None:
+        table = bigquery.Table(
+            self.staging_table_id,
+            schema=[
+                bigquery.SchemaField("country", "STRING"),
+                bigquery.SchemaField("phone_number", "INT64"),
+                bigquery.SchemaField("name", "STRING"),
+                bigquery.SchemaField("age", "INT64"),
+                bigquery.SchemaField("gender", "STRING"),
+                bigquery.SchemaField("project_type", "STRING"),
+                bigquery.SchemaField("response_datetime", "DATETIME"),
+                bigquery.SchemaField("study_id", "INT64"),
+                bigquery.SchemaField("inserted_at", "TIMESTAMP"),
+            ],
+        )
+        table.time_partitioning = bigquery.TimePartitioning(
+            type_=bigquery.TimePartitioningType.HOUR,
+            field="inserted_at",
+            expiration_ms=STAGED_ROWS_LOOKBACK_HOURS * 2 * 3600 * 1000,
+        )
+        table.clustering_fields = ["project_type", "phone_number"]
+        self.client.create_table(table, exists_ok=True)
+
+    def insert_staged_rows(self, rows: list[dict], row_ids: list[str]) -> None:
+        # The table is partitioned on inserted_at and every read of it filters
+        # on it, so rows without it would never be seen or merged
+        inserted_at = datetime.now(timezone.utc).isoformat()
+        errors = self.client.insert_rows_json(
+            self.staging_table_id,
+            [{**row, "inserted_at": inserted_at} for row in rows],
+            row_ids=row_ids,
+        )
+        if errors:
+            raise RuntimeError(f"Streaming insert into staging table failed: {errors}")
+
+    def merge_staged_rows(self) -> int:
+        merge_query = f"""
+            MERGE `{self.table_id}` AS respondent
+            USING (
+                SELECT * EXCEPT (row_number)
+                FROM (
+                    SELECT
+                        * EXCEPT (inserted_at),
+                        ROW_NUMBER() OVER (
+                            PARTITION BY phone_number, project_type
+                            ORDER BY response_datetime DESC
+                        ) AS row_number
+                    FROM `{self.staging_table_id}`
+                    WHERE inserted_at >= TIMESTAMP_SUB(
+                        CURRENT_TIMESTAMP(), INTERVAL {STAGED_ROWS_LOOKBACK_HOURS} HOUR
+                    )
+                )
+                WHERE row_number = 1
+            ) AS staged
+            ON respondent.phone_number = staged.phone_number
+                AND respondent.project_type = staged.project_type
+            WHEN MATCHED AND staged.response_datetime > respondent.response_datetime
+                THEN UPDATE SET response_datetime = staged.response_datetime
+            WHEN NOT MATCHED THEN
+                INSERT (
+                    country,
+                    phone_number,
+                    name,
+                    age,
+                    gender,
+                    project_type,
+                    response_datetime,
+                    study_id
+                )
+                VALUES (
+                    staged.country,
+                    staged.phone_number,
+                    staged.name,
+                    staged.age,
+                    staged.gender,
+                    staged.project_type,
+                    staged.response_datetime,
+                    staged.study_id
+                )
+        """
+        merge_job = self.client.query(merge_query)
+        merge_job.result()  # Wait for the job to complete
+        return merge_job.num_dml_affected_rows or 0
+
+
+class FirestoreDocumentBackend(DocumentBackend):
+    def __init__(self, client: firestore.Client):
+        self.client = client
+
+    def get(self, collection: str, document_id: str) -> dict | None:
+        doc = self.client.collection(collection).document(document_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    def set(
+        self, collection: str, document_id: str, data: dict, merge: bool = False
+    ) -> None:
+        self.client.collection(collection).document(document_id).set(
+            data, merge=merge
+        )
+
+    def delete(self, collection: str, document_id: str) -> None:
+        self.client.collection(collection).document(document_id).delete()
+
+    def get_many(
+        self, collection: str, document_ids: list[str]
+    ) -> dict[str, dict | None]:
+        doc_refs = [
+            self.client.collection(collection).document(document_id)
+            for document_id in document_ids
+        ]
+        documents = dict.fromkeys(document_ids)
+        # Snapshots come back in no particular order
+        for snapshot in self.client.get_all(doc_refs):
+            if snapshot.exists:
+                documents[snapshot.id] = snapshot.to_dict()
+        return documents
+
+    def delete_many(
+        self,
+        collection: str,
+        document_ids: list[str],
+        must_exist: Iterable[str] = (),
+    ) -> bool:
+        must_exist = set(must_exist)
+        batch = self.client.batch()
+        for document_id in document_ids:
+            batch.delete(
+                self.client.collection(collection).document(document_id),
+                option=(
+                    self.client.write_option(exists=True)
+                    if document_id in must_exist
+                    else None
+                ),
+            )
+
+        try:
+            batch.commit()
+        except (google_exceptions.NotFound, google_exceptions.FailedPrecondition):
+            return False
+        return True
+
+    def transact(
+        self,
+        collection: str,
+        document_id: str,
+        operation: Callable[[dict | None], dict | None],
+    ) -> None:
+        doc_ref = self.client.collection(collection).document(document_id)
+
+        @firestore.transactional
+        def transaction_operation(transaction, doc_ref):
+            snapshot = doc_ref.get(transaction=transaction)
+            data = operation(snapshot.to_dict() if snapshot.exists else None)
+            if data is not None:
+                transaction.set(doc_ref, data, merge=True)
+
+        transaction_operation(self.client.transaction(), doc_ref)
+
+    def watch(
+        self,
+        collection: str,
+        document_id: str,
+        callback: Callable[[dict | None], None],
+    ) -> Callable[[], None]:
+        def on_snapshot(snapshots, changes, read_time):
+            snapshot = snapshots[0] if snapshots else None
+            callback(snapshot.to_dict() if snapshot and snapshot.exists else None)
+
+        doc_ref = self.client.collection(collection).document(document_id)
+        return doc_ref.on_snapshot(on_snapshot).unsubscribe
+
+
+class FirestoreVerificationCodeStore(VerificationCodeStore):
+    """
+    Codes as documents of `collection`. With the TTL policy on
+    VERIFICATION_CODE_TTL_FIELD (`enable_ttl_policy`) Firestore deletes
+    expired codes by itself, usually within a day; until then they are
+    filtered out of reads and swept by `delete_expired`.
+    """
+
+    def __init__(self, client: firestore.Client, collection: str):
+        self.client = client
+        self.collection = collection
+        self.documents = FirestoreDocumentBackend(client)
+
+    def set(self, phone_number: str, document: dict) -> None:
+        self.documents.set(self.collection, phone_number, document)
+
+    def get_many(self, phone_numbers: list[str]) -> dict[str, dict | None]:
+        now = datetime.now(timezone.utc)
+        return {
+            phone_number: document if is_live_code(document, now) else None
+            for phone_number, document in self.documents.get_many(
+                self.collection, phone_numbers
+            ).items()
+        }
+
+    def delete_many(
+        self, phone_numbers: list[str], must_exist: Iterable[str] = ()
+    ) -> bool:
+        return self.documents.delete_many(self.collection, phone_numbers, must_exist)
+
+    def _expired(self, now: datetime):
+        return self.client.collection(self.collection).where(
+            filter=FieldFilter(VERIFICATION_CODE_TTL_FIELD, "<=", now)
+        )
+
+    def delete_expired(self, now: datetime, limit: int) -> int:
+        # Only document names are read; a batch takes at most 500 writes
+        snapshots = list(
+            self._expired(now).select([]).limit(min(limit, 500)).stream()
+        )
+        if not snapshots:
+            return 0
+
+        def delete(snapshots):
+            # A code sent again since the query is left alone
+            batch = self.client.batch()
+            for snapshot in snapshots:
+                batch.delete(
+                    snapshot.reference,
+                    option=self.client.write_option(
+                        last_update_time=snapshot.update_time
+                    ),
+                )
+            batch.commit()
+
+        try:
+            delete(snapshots)
+        except google_exceptions.FailedPrecondition:
+            # The batch is atomic, so one resent code fails it: retry one by one
+            deleted = 0
+            for snapshot in snapshots:
+                try:
+                    delete([snapshot])
+                    deleted += 1
+                except google_exceptions.FailedPrecondition:
+                    pass
+            return deleted
+        return len(snapshots)
+
+    def count(self, now: datetime) -> tuple[int, int]:
+        # Aggregation queries read index entries, not the documents
+        total = self.client.collection(self.collection).count().get()[0][0].value
+        expired = self._expired(now).count().get()[0][0].value
+        return total - expired, expired
+
+    def enable_ttl_policy(self, timeout_seconds: float = 300):
+        return enable_ttl_policy(
+            self.client, self.collection, VERIFICATION_CODE_TTL_FIELD, timeout_seconds
+        )
+
+
+class TwilioVerificationSender(VerificationSender):
+    def __init__(self, client: TwilioVerifyClient):
+        self.client = client
+
+    def send_code(self, phone_number: str) -> VerificationResult:
+        payload = self.client.send_code(phone_number)
+        return VerificationResult(status=payload["status"])
+
+    def verify_code(self, phone_number: str, code: str) -> VerificationResult:
+        payload = self.client.verify_code(phone_number, code)
+        return VerificationResult(status=payload["status"])
+
+    def stats(self) -> dict:
+        return self.client.stats()
+
+
+class GraphWhatsAppSender(WhatsAppSender):
+    def __init__(self, client: WhatsAppClient):
+        self.client = client
+
+    def send_template(
+        self, phone_number: str, template_name: str, code: int
+    ) -> tuple[bool, dict]:
+        return self.client.send_message(
+            phone_number, template_message(template_name, code)
+        )
+
+
+def pooled_adapter() -> HTTPAdapter:
+    return HTTPAdapter(
+        pool_connections=BACKEND_HTTP_POOL_SIZE, pool_maxsize=BACKEND_HTTP_POOL_SIZE
+    )
+
+
+def default_credentials() -> tuple[Any, str]:
+    # Discovered once and shared by every Google Cloud client
+    return google.auth.default(
+        scopes=["https://www.googleapis.com/auth/cloud-platform"]
+    )
+
+
+def create_bigquery_client(google_credentials: tuple[Any, str]) -> bigquery.Client:
+    credentials, project = google_credentials
+    session = AuthorizedSession(credentials)
+    session.mount("https://", pooled_adapter())
+    return bigquery.Client(project=project, credentials=credentials, _http=session)
+
+
+def enable_ttl_policy(
+    client: firestore.Client,
+    collection: str,
+    field: str,
+    timeout_seconds: float = 300,
+):
+    """
+    Has Firestore delete the documents of `collection` once the timestamp in
+    `field` has passed, usually within a day.
+    """
+    from google.cloud import firestore_admin_v1
+
+    admin_client = firestore_admin_v1.FirestoreAdminClient(
+        credentials=client._credentials
+    )
+    operation = admin_client.update_field(
+        field=firestore_admin_v1.Field(
+            name=(
+                f"{client._database_string}/collectionGroups/"
+                f"{collection}/fields/{field}"
+            ),
+            ttl_config=firestore_admin_v1.Field.TtlConfig(),
+        ),
+        update_mask={"paths": ["ttl_config"]},
+    )
+    return operation.result(timeout=timeout_seconds)
+
+
+def create_firestore_client(google_credentials: tuple[Any, str]) -> firestore.Client:
+    # A single gRPC channel multiplexes every request of the process
+    credentials, project = google_credentials
+    return firestore.Client(project=project, credentials=credentials)
+
+
+def create_twilio_sender() -> TwilioVerificationSender:
+    return TwilioVerificationSender(
+        TwilioVerifyClient(
+            **client_settings_from_env(), pool_size=BACKEND_HTTP_POOL_SIZE
+        )
+    )
+
+
+def create_whatsapp_sender(
+    on_whatsapp_send: Callable[[SendMetrics], None] | None = None,
+) -> GraphWhatsAppSender:
+    return GraphWhatsAppSender(
+        WhatsAppClient(
+            os.getenv("WHATSAPP_PHONE_NUMBER_ID"),
+            os.getenv("WHATSAPP_ACCESS_TOKEN"),
+            pool_size=int(os.getenv("WHATSAPP_POOL_SIZE", "10")),
+            max_attempts=int(os.getenv("WHATSAPP_MAX_ATTEMPTS", "3")),
+            on_send=on_whatsapp_send,
+        )
+    )
@@ -0,0 +1,26 @@
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+# "main:app" serves the Flask app; "async_main:app" the ASGI variant
+wsgi_app = os.getenv("APP_MODULE", "main:app")
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+if wsgi_app.startswith("async_main"):
+    worker_class = "uvicorn.workers.UvicornWorker"
+else:
+    worker_class = "gthread"
+    threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+# The app is not preloaded: the respondent index, writer and supervisor
+# snapshot start background threads, which do not survive a fork
+preload_app = False
+
+
+def post_worker_init(worker):
+    # The port is bound by now, so the backend clients are built in the
+    # background instead of delaying the first /check_health
+    import resources
+
+    resources.start_supervisor_directory()
+    resources.prewarm()
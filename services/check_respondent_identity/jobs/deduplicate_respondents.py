@@ -0,0 +1,54 @@
+"""
+Repairs respondent rows duplicated by the former read-then-write path: keeps
+the latest row of each (phone_number, project_type) and deletes the rest in
+one transaction. Safe to run repeatedly.
+
+Run from the service folder:
+
+    python -m jobs.deduplicate_respondents
+    python -m jobs.deduplicate_respondents --backend local \\
+        --database respondents.duckdb
+"""
+
+import argparse
+import logging
+
+from logger import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backend", choices=["gcp", "local"], default="gcp")
+    parser.add_argument("--dataset", default="survey_history")
+    parser.add_argument("--table", default="respondent")
+    parser.add_argument(
+        "--database", default=":memory:", help="DuckDB/SQLite file for --backend local"
+    )
+    args = parser.parse_args()
+
+    setup_logging()
+
+    if args.backend == "local":
+        from local_backends import SQLRespondentBackend, connect_respondent_database
+
+        respondent_backend = SQLRespondentBackend(
+            connect_respondent_database(args.database)
+        )
+
+    else:
+        from google.cloud import bigquery
+
+        from gcp_backends import BigQueryRespondentBackend
+
+        respondent_backend = BigQueryRespondentBackend(
+            bigquery.Client(), args.dataset, args.table
+        )
+
+    removed_rows = respondent_backend.deduplicate_respondents()
+    logger.info(f"Removed {removed_rows} duplicated respondent rows.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Turns on the Firestore TTL policy of the send rate limit collection on the
+expires_at field, so Firestore deletes the documents of numbers without sends
+in the last window, usually within a day. Needed once per project when
+RATE_LIMIT_SHARED_BACKEND is "firestore"; without it the collection keeps a
+document for every number ever sent a code.
+
+Run from the service folder:
+
+    python -m jobs.enable_rate_limit_ttl
+"""
+
+import argparse
+import logging
+
+from logger import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--collection", default="phone_verification_rate_limit")
+    args = parser.parse_args()
+
+    setup_logging()
+
+    from google.cloud import firestore
+
+    from gcp_backends import enable_ttl_policy
+
+    enable_ttl_policy(firestore.Client(), args.collection, "expires_at")
+    logger.info(f"Enabled the TTL policy of the {args.collection} collection.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+"""
+Moves the respondent table to the layout the lookups are written for:
+partitioned by month on response_datetime and clustered by (project_type,
+phone_number). Lookups then read the partitions of the qualification cooldown
+plus the latest older rows of the respondent, instead of the whole history.
+
+On BigQuery the new table is created next to the current one as
+`<table>_clustered`, and a sample of lookups is run against both tables to
+compare the bytes processed. `--swap` then renames the tables, keeping the
+former one as `<table>_unpartitioned`:
+
+    python -m jobs.migrate_respondent_layout --samples 20
+    python -m jobs.migrate_respondent_layout --swap
+
+With `--backend local` the same layout is built from a DuckDB respondent table
+as Parquet files, one folder per month sorted by (project_type, phone_number),
+next to a single unsorted file standing in for the current table. The lookups
+of SQLRespondentBackend run against both and the query plans, rows and bytes
+scanned are compared. An empty database is filled with synthetic history:
+
+    python -m jobs.migrate_respondent_layout --backend local \\
+        --database respondents.duckdb --output respondent_layout \\
+        --synthetic-rows 2000000 --show-plans
+"""
+
+import argparse
+from datetime import datetime, timedelta, timezone
+import logging
+from pathlib import Path
+import statistics
+import time
+
+from logger import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# Same value as in resources
+QUALIFICATION_COOLDOWN_DAYS = 180
+
+PROJECT_TYPES = ["concept test", "ad test", "usage and attitudes", "pricing", "other"]
+
+# Columns a lookup reads, which is what BigQuery bills and Parquet fetches
+LOOKUP_COLUMNS = ("phone_number", "project_type", "response_datetime")
+
+
+def build_bigquery_layout(client, table_id: str, clustered_table_id: str):
+    client.query(
+        f"""
+        CREATE TABLE `{clustered_table_id}`
+        PARTITION BY DATETIME_TRUNC(response_datetime, MONTH)
+        CLUSTER BY project_type, phone_number
+        AS SELECT * FROM `{table_id}`
+        """
+    ).result()
+    logger.info(f"Created {clustered_table_id} from {table_id}.")
+
+
+def compare_bigquery_lookups(client, current_backend, clustered_backend, samples: int):
+    lookups = [
+        (row.phone_number, row.project_type)
+        for row in client.query(
+            f"""
+            SELECT phone_number, project_type
+            FROM `{current_backend.table_id}`
+            ORDER BY RAND()
+            LIMIT {samples}
+            """
+        ).result()
+    ]
+
+    variants = {
+        "full history, current table": (current_backend, None),
+        "full history, clustered table": (clustered_backend, None),
+        "cooldown window, clustered table": (
+            clustered_backend,
+            QUALIFICATION_COOLDOWN_DAYS,
+        ),
+    }
+    print(f"{'lookup':<36}{'MB processed':>14}{'slot ms':>10}")
+    for name, (backend, lookback_days) in variants.items():
+        bytes_processed = []
+        slot_millis = []
+        for phone_number, project_type in lookups:
+            query, job_config = backend.respondent_data_query(
+                phone_number, project_type, lookback_days=lookback_days
+            )
+            job_config.use_query_cache = False
+            query_job = client.query(query, job_config=job_config)
+            query_job.result()
+            bytes_processed.append(query_job.total_bytes_processed)
+            slot_millis.append(query_job.slot_millis or 0)
+        print(
+            f"{name:<36}{statistics.median(bytes_processed) / 1e6:>14.2f}"
+            f"{statistics.median(slot_millis):>10.0f}"
+        )
+
+
+def swap_bigquery_tables(client, table_id: str, clustered_table_id: str):
+    table = table_id.rsplit(".", 1)[1]
+    client.query(
+        f"""
+        ALTER TABLE `{table_id}` RENAME TO `{table}_unpartitioned`;
+        ALTER TABLE `{clustered_table_id}` RENAME TO `{table}`;
+        """
+    ).result()
+    logger.info(f"{table_id} now has the partitioned and clustered layout.")
+
+
+def fill_synthetic_history(connection, rows: int, years: int):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    connection.execute(
+        """
+        INSERT INTO respondent
+        SELECT
+            'CO',
+            573000000000 + (random() * ? / 2)::BIGINT,
+            'synthetic',
+            18 + (random() * 50)::BIGINT,
+            'femenino',
+            list_element(?, 1 + floor(random() * ?)::BIGINT),
+            ?::TIMESTAMP - to_seconds((random() * ?)::BIGINT),
+            1
+        FROM range(?)
+        """,
+        [rows, PROJECT_TYPES, len(PROJECT_TYPES), now, years * 365 * 86400, rows],
+    )
+    logger.info(f"Filled the respondent table with {rows} synthetic rows.")
+
+
+def build_parquet_layouts(connection, output: Path, row_group_size: int):
+    current = output / "unpartitioned" / "respondent.parquet"
+    current.parent.mkdir(parents=True, exist_ok=True)
+    connection.execute(
+        f"""
+        COPY respondent TO '{current}' (
+            FORMAT PARQUET, ROW_GROUP_SIZE {row_group_size}
+        )
+        """
+    )
+
+    # One folder per month stands in for the partitions, and sorting each one
+    # stands in for the clustering: row group statistics then bound both keys
+    clustered = output / "clustered"
+    connection.execute(
+        f"""
+        COPY (
+            SELECT *, strftime(response_datetime, '%Y-%m') AS response_month
+            FROM respondent
+            ORDER BY response_month, project_type, phone_number, response_datetime
+        ) TO '{clustered}' (
+            FORMAT PARQUET,
+            PARTITION_BY (response_month),
+            ROW_GROUP_SIZE {row_group_size},
+            OVERWRITE_OR_IGNORE
+        )
+        """
+    )
+    return current, clustered / "*" / "*.parquet"
+
+
+def connect_layout(path):
+    """SQLRespondentBackend on DuckDB, with `respondent` reading the given layout."""
+    import duckdb
+
+    from local_backends import SQLRespondentBackend
+
+    connection = duckdb.connect()
+    connection.execute(
+        f"CREATE VIEW respondent AS SELECT * FROM read_parquet('{path}')"
+    )
+    return SQLRespondentBackend(connection)
+
+
+def row_group_statistics(connection, path) -> list[dict]:
+    rows = connection.execute(
+        f"""
+        SELECT
+            file_name,
+            row_group_id,
+            SUM(total_compressed_size) FILTER (
+                WHERE path_in_schema IN {LOOKUP_COLUMNS}
+            ),
+            MIN(stats_min_value) FILTER (WHERE path_in_schema = 'phone_number'),
+            MAX(stats_max_value) FILTER (WHERE path_in_schema = 'phone_number'),
+            MIN(stats_min_value) FILTER (WHERE path_in_schema = 'project_type'),
+            MAX(stats_max_value) FILTER (WHERE path_in_schema = 'project_type'),
+            MIN(stats_min_value) FILTER (WHERE path_in_schema = 'response_datetime'),
+            MAX(stats_max_value) FILTER (WHERE path_in_schema = 'response_datetime')
+        FROM parquet_metadata('{path}')
+        GROUP BY ALL
+        """
+    ).fetchall()
+    return [
+        {
+            "bytes": row[2],
+            "phone_number": statistics_bounds(row[3], row[4], int),
+            "project_type": statistics_bounds(row[5], row[6], str),
+            "response_datetime": statistics_bounds(
+                row[7], row[8], datetime.fromisoformat
+            ),
+        }
+        for row in rows
+    ]
+
+
+def statistics_bounds(low: str | None, high: str | None, parse) -> tuple | None:
+    # Row groups with only nulls in the column have no statistics
+    if low is None or high is None:
+        return None
+    return parse(low), parse(high)
+
+
+def blocks_scanned(
+    row_groups: list[dict],
+    phone_number: int,
+    project_type: str,
+    window_start: datetime | None,
+) -> tuple[int, int]:
+    """
+    Row groups and compressed bytes of the lookup columns whose statistics can
+    match the lookup, like BigQuery counts the blocks left after pruning. A
+    windowed lookup reads the window and the older range separately.
+    """
+
+    def matching(row_group: dict) -> bool:
+        if None in (
+            row_group["phone_number"],
+            row_group["project_type"],
+            row_group["response_datetime"],
+        ):
+            return False
+        low, high = row_group["phone_number"]
+        first_type, last_type = row_group["project_type"]
+        return low <= phone_number <= high and first_type <= project_type <= last_type
+
+    scanned = [row_group for row_group in row_groups if matching(row_group)]
+    if window_start is not None:
+        scanned = [
+            row_group
+            for row_group in scanned
+            if row_group["response_datetime"][1] >= window_start
+        ] + [
+            row_group
+            for row_group in scanned
+            if row_group["response_datetime"][0] < window_start
+        ]
+    return len(scanned), sum(row_group["bytes"] for row_group in scanned)
+
+
+def compare_parquet_lookups(
+    connection, current, clustered, samples: int, show_plans: bool
+):
+    lookups = connection.execute(
+        f"""
+        SELECT phone_number, project_type
+        FROM respondent
+        USING SAMPLE {samples} ROWS
+        """
+    ).fetchall()
+    window_start = (
+        datetime.now(timezone.utc) - timedelta(days=QUALIFICATION_COOLDOWN_DAYS)
+    ).replace(tzinfo=None)
+
+    variants = {
+        "full history, current table": (current, None),
+        "full history, clustered table": (clustered, None),
+        "cooldown window, clustered table": (clustered, QUALIFICATION_COOLDOWN_DAYS),
+    }
+    print(f"{'lookup':<36}{'row groups':>12}{'of':>6}{'KB scanned':>12}{'ms':>8}")
+    for name, (path, lookback_days) in variants.items():
+        backend = connect_layout(path)
+        row_groups = row_group_statistics(backend.connection, path)
+
+        scanned_row_groups, scanned_bytes, latencies = [], [], []
+        for phone_number, project_type in lookups:
+            start = time.perf_counter()
+            backend.get_respondent_data(
+                phone_number, project_type, lookback_days=lookback_days
+            )
+            latencies.append((time.perf_counter() - start) * 1000)
+
+            count, size = blocks_scanned(
+                row_groups,
+                phone_number,
+                project_type,
+                window_start if lookback_days is not None else None,
+            )
+            scanned_row_groups.append(count)
+            scanned_bytes.append(size)
+
+        print(
+            f"{name:<36}{statistics.median(scanned_row_groups):>12.0f}"
+            f"{len(row_groups):>6}{statistics.median(scanned_bytes) / 1e3:>12.1f}"
+            f"{statistics.median(latencies):>8.2f}"
+        )
+
+        if show_plans:
+            phone_number, project_type = lookups[0]
+            query, parameters = backend.respondent_data_query(
+                phone_number, project_type, lookback_days=lookback_days
+            )
+            plan = backend.connection.execute(
+                f"EXPLAIN ANALYZE {query}", parameters
+            ).fetchall()
+            print(plan[0][1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backend", choices=["gcp", "local"], default="gcp")
+    parser.add_argument("--dataset", default="survey_history")
+    parser.add_argument("--table", default="respondent")
+    parser.add_argument("--samples", type=int, default=20, help="Lookups compared")
+    parser.add_argument(
+        "--swap",
+        action="store_true",
+        help="Rename the clustered table to --table once it has been checked",
+    )
+    parser.add_argument(
+        "--database", default=":memory:", help="DuckDB file for --backend local"
+    )
+    parser.add_argument(
+        "--output",
+        default="respondent_layout",
+        help="Folder of the Parquet layouts for --backend local",
+    )
+    parser.add_argument(
+        "--synthetic-rows",
+        type=int,
+        default=1_000_000,
+        help="Rows generated when the local respondent table is empty",
+    )
+    parser.add_argument("--synthetic-years", type=int, default=5)
+    parser.add_argument(
+        "--row-group-size",
+        type=int,
+        default=8192,
+        help="Rows per Parquet row group, the stand-in for BigQuery storage blocks",
+    )
+    parser.add_argument(
+        "--show-plans", action="store_true", help="Print the local query plans"
+    )
+    args = parser.parse_args()
+
+    setup_logging()
+
+    if args.backend == "local":
+        import duckdb
+
+        from local_backends import RESPONDENT_TABLE_DDL
+
+        connection = duckdb.connect(args.database)
+        connection.execute(RESPONDENT_TABLE_DDL)
+        if connection.execute("SELECT COUNT(*) FROM respondent").fetchone()[0] == 0:
+            fill_synthetic_history(
+                connection, args.synthetic_rows, args.synthetic_years
+            )
+
+        current, clustered = build_parquet_layouts(
+            connection, Path(args.output), args.row_group_size
+        )
+        compare_parquet_lookups(
+            connection, current, clustered, args.samples, args.show_plans
+        )
+        return
+
+    from google.cloud import bigquery
+
+    from gcp_backends import BigQueryRespondentBackend
+
+    client = bigquery.Client()
+    current_backend = BigQueryRespondentBackend(client, args.dataset, args.table)
+    clustered_backend = BigQueryRespondentBackend(
+        client, args.dataset, f"{args.table}_clustered"
+    )
+
+    if args.swap:
+        swap_bigquery_tables(
+            client, current_backend.table_id, clustered_backend.table_id
+        )
+        return
+
+    build_bigquery_layout(client, current_backend.table_id, clustered_backend.table_id)
+    compare_bigquery_lookups(client, current_backend, clustered_backend, args.samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Deletes the expired WhatsApp verification codes left in Firestore and reports
+how many live and expired codes remain. `--enable-ttl` first turns on the
+Firestore TTL policy of the collection on the expires_at field, after which
+Firestore deletes expired codes by itself, usually within a day of expiring;
+running this job on a schedule keeps cleaning up in between.
+
+Run from the service folder:
+
+    python -m jobs.sweep_verification_codes --enable-ttl
+    python -m jobs.sweep_verification_codes --batch-size 200
+"""
+
+import argparse
+from datetime import datetime, timezone
+import logging
+
+from logger import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--collection", default="phone_verification")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument(
+        "--enable-ttl",
+        action="store_true",
+        help="Enable the Firestore TTL policy on the expires_at field",
+    )
+    args = parser.parse_args()
+
+    setup_logging()
+
+    from google.cloud import firestore
+
+    from code_sweeper import VerificationCodeSweeper
+    from gcp_backends import FirestoreVerificationCodeStore
+
+    code_store = FirestoreVerificationCodeStore(firestore.Client(), args.collection)
+
+    if args.enable_ttl:
+        code_store.enable_ttl_policy()
+        logger.info(f"Enabled the TTL policy of the {args.collection} collection.")
+
+    sweeper = VerificationCodeSweeper(code_store, batch_size=args.batch_size)
+    deleted = sweeper.sweep()
+    live, expired = code_store.count(datetime.now(timezone.utc))
+    logger.info(
+        f"Deleted {deleted} expired codes; {live} live and {expired} expired remain."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,740 @@
+"""
+In-process stand-ins for the production backends, used when the service runs
+with `IDENTITY_BACKEND=local` (local development and load tests).
+"""
+
+from collections import defaultdict
+from copy import deepcopy
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import heapq
+from typing import Callable, Iterable, Iterator
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from google.cloud import firestore
+
+from backends import (
+    LOOKBACK_SENTINEL_ROWS,
+    VERIFICATION_CODE_TTL_FIELD,
+    DocumentBackend,
+    RespondentBackend,
+    RespondentRecord,
+    VerificationCodeStore,
+    VerificationResult,
+    VerificationSender,
+    WhatsAppSender,
+    is_live_code,
+    lookback_window_start,
+)
+
+logger = logging.getLogger(__name__)
+
+FIXTURES_FOLDER = Path(__file__).parent / "fixtures"
+
+RESPONDENT_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS respondent (
+        country VARCHAR,
+        phone_number BIGINT,
+        name VARCHAR,
+        age BIGINT,
+        gender VARCHAR,
+        project_type VARCHAR,
+        response_datetime TIMESTAMP,
+        study_id BIGINT
+    )
+"""
+STAGING_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS respondent_staging (
+        country VARCHAR,
+        phone_number BIGINT,
+        name VARCHAR,
+        age BIGINT,
+        gender VARCHAR,
+        project_type VARCHAR,
+        response_datetime TIMESTAMP,
+        study_id BIGINT,
+        inserted_at TIMESTAMP,
+        row_id VARCHAR
+    )
+"""
+RESPONDENT_COLUMNS = (
+    "country",
+    "phone_number",
+    "name",
+    "age",
+    "gender",
+    "project_type",
+    "response_datetime",
+    "study_id",
+)
+
+
+def affected_rows(cursor) -> int:
+    # DuckDB reports -1 and returns the count as a result row instead
+    if cursor.rowcount >= 0:
+        return cursor.rowcount
+    return cursor.fetchone()[0]
+
+
+def simulate_latency(latency_ms: float):
+    if latency_ms > 0:
+        time.sleep(latency_ms / 1000)
+
+
+def connect_respondent_database(database: str = ":memory:"):
+    """
+    Opens the local respondent table in DuckDB when it is installed, falling
+    back to SQLite. Both accept `?` placeholders.
+    """
+    try:
+        import duckdb
+    except ImportError:
+        return sqlite3.connect(database, check_same_thread=False)
+
+    return duckdb.connect(database)
+
+
+class SQLRespondentBackend(RespondentBackend):
+    def __init__(self, connection, latency_ms: float = 0):
+        self.connection = connection
+        self.latency_ms = latency_ms
+        # DB-API connections are not safe to share between request threads
+        self.lock = threading.Lock()
+        with self.lock:
+            self.connection.execute(RESPONDENT_TABLE_DDL)
+
+    def _execute(self, query: str, parameters: tuple = ()) -> list[tuple]:
+        simulate_latency(self.latency_ms)
+        with self.lock:
+            cursor = self.connection.execute(query, parameters)
+            rows = cursor.fetchall() if cursor.description else []
+            self.connection.commit()
+        return rows
+
+    def get_respondent_data(
+        self,
+        phone_number: int,
+        project_type: str,
+        include_staged: bool = False,
+        lookback_days: int | None = None,
+    ) -> list[RespondentRecord]:
+        rows = self._execute(
+            *self.respondent_data_query(
+                phone_number, project_type, include_staged, lookback_days
+            )
+        )
+        return [
+            RespondentRecord(
+                # SQLite hands timestamps back as text
+                response_datetime=(
+                    datetime.fromisoformat(value) if isinstance(value, str) else value
+                )
+            )
+            for (value,) in rows
+        ]
+
+    def respondent_data_query(
+        self,
+        phone_number: int,
+        project_type: str,
+        include_staged: bool = False,
+        lookback_days: int | None = None,
+    ) -> tuple[str, tuple]:
+        query = """
+            SELECT response_datetime
+            FROM respondent
+            WHERE phone_number = ? AND project_type = ?
+        """
+        parameters = (phone_number, project_type)
+        if lookback_days is not None:
+            query += f"""
+                AND response_datetime >= ?
+            UNION ALL
+            SELECT response_datetime
+            FROM (
+                SELECT response_datetime
+                FROM respondent
+                WHERE phone_number = ? AND project_type = ?
+                    AND response_datetime < ?
+                ORDER BY response_datetime DESC
+                LIMIT {LOOKBACK_SENTINEL_ROWS}
+            )
+            """
+            window_start = lookback_window_start(lookback_days).strftime(
+                "%Y-%m-%d %H:%M:%S"
+            )
+            parameters += (window_start, phone_number, project_type, window_start)
+        if include_staged:
+            query += """
+            UNION ALL
+            SELECT staged.response_datetime
+            FROM respondent_staging AS staged
+            WHERE staged.phone_number = ? AND staged.project_type = ?
+                AND NOT EXISTS (
+                    SELECT 1
+                    FROM respondent
+                    WHERE respondent.phone_number = staged.phone_number
+                        AND respondent.project_type = staged.project_type
+                        AND respondent.response_datetime >= staged.response_datetime
+                )
+            """
+            parameters += (phone_number, project_type)
+
+        return query, parameters
+
+    def iter_qualifications(
+        self,
+        phone_numbers: list[int],
+        project_type: str,
+        cooldown_days: int,
+        include_staged: bool = False,
+    ) -> Iterator[tuple[int, bool]]:
+        # The whole list is bound as a single parameter, like UNNEST(@phones)
+        if isinstance(self.connection, sqlite3.Connection):
+            requested = "SELECT DISTINCT value AS phone_number FROM json_each(?)"
+            phone_numbers_parameter = json.dumps(phone_numbers)
+        else:
+            requested = """
+                SELECT DISTINCT phone_number
+                FROM UNNEST(?::BIGINT[]) AS requested(phone_number)
+            """
+            phone_numbers_parameter = phone_numbers
+
+        responses = """
+            SELECT phone_number, response_datetime
+            FROM respondent
+            WHERE project_type = ?
+        """
+        parameters = (phone_numbers_parameter, project_type)
+        if include_staged:
+            responses += """
+            UNION ALL
+            SELECT staged.phone_number, staged.response_datetime
+            FROM respondent_staging AS staged
+            WHERE staged.project_type = ?
+                AND NOT EXISTS (
+                    SELECT 1
+                    FROM respondent
+                    WHERE respondent.phone_number = staged.phone_number
+                        AND respondent.project_type = staged.project_type
+                        AND respondent.response_datetime >= staged.response_datetime
+                )
+            """
+            parameters += (project_type,)
+
+        cutoff = datetime.now(timezone.utc) - timedelta(days=cooldown_days)
+        rows = self._execute(
+            f"""
+            WITH requested AS ({requested}),
+            responses AS ({responses})
+            SELECT
+                requested.phone_number,
+                COUNT(responses.phone_number) = 0
+                    OR (
+                        COUNT(responses.phone_number) = 1
+                        AND MAX(responses.response_datetime) <= ?
+                    )
+            FROM requested
+            LEFT JOIN responses
+                ON responses.phone_number = requested.phone_number
+            GROUP BY requested.phone_number
+            """,
+            parameters + (cutoff.strftime("%Y-%m-%d %H:%M:%S"),),
+        )
+        for phone_number, is_qualified in rows:
+            yield phone_number, bool(is_qualified)
+
+    def insert_respondent(self, data: dict) -> None:
+        self._execute(
+            f"""
+            INSERT INTO respondent ({", ".join(RESPONDENT_COLUMNS)})
+            VALUES ({", ".join("?" for _ in RESPONDENT_COLUMNS)})
+            """,
+            tuple(data.get(column) for column in RESPONDENT_COLUMNS),
+        )
+
+    def update_response_datetime(
+        self, phone_number: int, project_type: str, response_datetime: datetime
+    ) -> None:
+        self._execute(
+            """
+            UPDATE respondent
+            SET response_datetime = ?
+            WHERE phone_number = ? AND project_type = ?
+            """,
+            (
+                response_datetime.strftime("%Y-%m-%d %H:%M:%S"),
+                phone_number,
+                project_type,
+            ),
+        )
+
+    def upsert_respondent(self, data: dict) -> None:
+        simulate_latency(self.latency_ms)
+        # Both statements run under the lock, so the upsert is atomic for
+        # the request threads sharing this connection
+        with self.lock:
+            update_cursor = self.connection.execute(
+                """
+                UPDATE respondent
+                SET response_datetime = ?
+                WHERE phone_number = ? AND project_type = ?
+                """,
+                (data["response_datetime"], data["phone_number"], data["project_type"]),
+            )
+            if not affected_rows(update_cursor):
+                self.connection.execute(
+                    f"""
+                    INSERT INTO respondent ({", ".join(RESPONDENT_COLUMNS)})
+                    VALUES ({", ".join("?" for _ in RESPONDENT_COLUMNS)})
+                    """,
+                    tuple(data.get(column) for column in RESPONDENT_COLUMNS),
+                )
+            self.connection.commit()
+
+    def deduplicate_respondents(self) -> int:
+        with self.lock:
+            self.connection.execute(
+                f"""
+                CREATE TEMP TABLE latest_duplicates AS
+                SELECT {", ".join(RESPONDENT_COLUMNS)}
+                FROM (
+                    SELECT
+                        *,
+                        ROW_NUMBER() OVER (
+                            PARTITION BY phone_number, project_type
+                            ORDER BY response_datetime DESC
+                        ) AS row_number,
+                        COUNT(*) OVER (
+                            PARTITION BY phone_number, project_type
+                        ) AS row_count
+                    FROM respondent
+                ) AS ranked
+                WHERE row_count > 1 AND row_number = 1
+                """
+            )
+            self.connection.execute("BEGIN TRANSACTION")
+            try:
+                deleted = affected_rows(
+                    self.connection.execute(
+                        """
+                        DELETE FROM respondent
+                        WHERE EXISTS (
+                            SELECT 1
+                            FROM latest_duplicates
+                            WHERE latest_duplicates.phone_number
+                                    = respondent.phone_number
+                                AND latest_duplicates.project_type
+                                    = respondent.project_type
+                        )
+                        """
+                    )
+                )
+                inserted = affected_rows(
+                    self.connection.execute(
+                        f"""
+                        INSERT INTO respondent ({", ".join(RESPONDENT_COLUMNS)})
+                        SELECT {", ".join(RESPONDENT_COLUMNS)}
+                        FROM latest_duplicates
+                        """
+                    )
+                )
+                self.connection.commit()
+            except Exception:
+                self.connection.rollback()
+                raise
+            finally:
+                self.connection.execute("DROP TABLE latest_duplicates")
+
+        return deleted - inserted
+
+    def iter_phone_numbers(
+        self, since: datetime | None = None
+    ) -> Iterator[tuple[str, int]]:
+        if since is None:
+            rows = self._execute(
+                "SELECT DISTINCT project_type, phone_number FROM respondent"
+            )
+        else:
+            rows = self._execute(
+                """
+                SELECT DISTINCT project_type, phone_number
+                FROM respondent
+                WHERE response_datetime >= ?
+                """,
+                (since.strftime("%Y-%m-%d %H:%M:%S"),),
+            )
+        yield from rows
+
+    def create_staging_table(self) -> None:
+        self._execute(STAGING_TABLE_DDL)
+
+    def insert_staged_rows(self, rows: list[dict], row_ids: list[str]) -> None:
+        inserted_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        for row, row_id in zip(rows, row_ids):
+            self._execute(
+                f"""
+                INSERT INTO respondent_staging
+                    ({", ".join(RESPONDENT_COLUMNS)}, inserted_at, row_id)
+                SELECT {", ".join("?" for _ in RESPONDENT_COLUMNS)}, ?, ?
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM respondent_staging WHERE row_id = ?
+                )
+                """,
+                tuple(row.get(column) for column in RESPONDENT_COLUMNS)
+                + (inserted_at, row_id, row_id),
+            )
+
+    def merge_staged_rows(self) -> int:
+        latest_staged = """
+            SELECT *
+            FROM (
+                SELECT
+                    *,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY phone_number, project_type
+                        ORDER BY response_datetime DESC
+                    ) AS row_number
+                FROM respondent_staging
+            ) AS ranked
+            WHERE row_number = 1
+        """
+        with self.lock:
+            update_cursor = self.connection.execute(
+                f"""
+                UPDATE respondent
+                SET response_datetime = staged.response_datetime
+                FROM ({latest_staged}) AS staged
+                WHERE respondent.phone_number = staged.phone_number
+                    AND respondent.project_type = staged.project_type
+                    AND staged.response_datetime > respondent.response_datetime
+                """
+            )
+            updated = affected_rows(update_cursor)
+            insert_cursor = self.connection.execute(
+                f"""
+                INSERT INTO respondent ({", ".join(RESPONDENT_COLUMNS)})
+                SELECT {", ".join(RESPONDENT_COLUMNS)}
+                FROM ({latest_staged}) AS staged
+                WHERE NOT EXISTS (
+                    SELECT 1
+                    FROM respondent
+                    WHERE respondent.phone_number = staged.phone_number
+                        AND respondent.project_type = staged.project_type
+                )
+                """
+            )
+            inserted = affected_rows(insert_cursor)
+            self.connection.commit()
+
+        return updated + inserted
+
+
+class InMemoryDocumentBackend(DocumentBackend):
+    def __init__(self, latency_ms: float = 0):
+        self.latency_ms = latency_ms
+        self.collections: dict[str, dict[str, dict]] = defaultdict(dict)
+        self.watchers: dict[tuple[str, str], list[Callable]] = defaultdict(list)
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def _resolve_sentinels(data: dict) -> dict:
+        now = datetime.now(timezone.utc)
+        return {
+            key: now if value is firestore.SERVER_TIMESTAMP else value
+            for key, value in data.items()
+        }
+
+    def get(self, collection: str, document_id: str) -> dict | None:
+        simulate_latency(self.latency_ms)
+        with self.lock:
+            return deepcopy(self.collections[collection].get(document_id))
+
+    def set(
+        self, collection: str, document_id: str, data: dict, merge: bool = False
+    ) -> None:
+        simulate_latency(self.latency_ms)
+        data = self._resolve_sentinels(data)
+        with self.lock:
+            documents = self.collections[collection]
+            if merge and document_id in documents:
+                documents[document_id].update(data)
+            else:
+                documents[document_id] = data
+            self._notify(collection, document_id)
+
+    def delete(self, collection: str, document_id: str) -> None:
+        simulate_latency(self.latency_ms)
+        with self.lock:
+            self.collections[collection].pop(document_id, None)
+            self._notify(collection, document_id)
+
+    def get_many(
+        self, collection: str, document_ids: list[str]
+    ) -> dict[str, dict | None]:
+        simulate_latency(self.latency_ms)
+        with self.lock:
+            return {
+                document_id: deepcopy(self.collections[collection].get(document_id))
+                for document_id in document_ids
+            }
+
+    def delete_many(
+        self,
+        collection: str,
+        document_ids: list[str],
+        must_exist: Iterable[str] = (),
+    ) -> bool:
+        simulate_latency(self.latency_ms)
+        with self.lock:
+            documents = self.collections[collection]
+            if any(document_id not in documents for document_id in must_exist):
+                return False
+
+            for document_id in document_ids:
+                documents.pop(document_id, None)
+                self._notify(collection, document_id)
+        return True
+
+    def transact(
+        self,
+        collection: str,
+        document_id: str,
+        operation: Callable[[dict | None], dict | None],
+    ) -> None:
+        simulate_latency(self.latency_ms)
+        # A single lock serializes transactions, like Firestore does for
+        # contending writers on the same document
+        with self.lock:
+            current = deepcopy(self.collections[collection].get(document_id))
+            data = operation(current)
+            if data is None:
+                return
+            data = self._resolve_sentinels(data)
+            self.collections[collection].setdefault(document_id, {}).update(data)
+            self._notify(collection, document_id)
+
+    def _notify(self, collection: str, document_id: str):
+        for callback in self.watchers[(collection, document_id)]:
+            callback(deepcopy(self.collections[collection].get(document_id)))
+
+    def watch(
+        self,
+        collection: str,
+        document_id: str,
+        callback: Callable[[dict | None], None],
+    ) -> Callable[[], None]:
+        with self.lock:
+            self.watchers[(collection, document_id)].append(callback)
+            callback(deepcopy(self.collections[collection].get(document_id)))
+
+        def unsubscribe():
+            with self.lock:
+                self.watchers[(collection, document_id)].remove(callback)
+
+        return unsubscribe
+
+    def load_fixtures(self, fixtures: dict[str, dict[str, dict]]):
+        for collection, documents in fixtures.items():
+            for document_id, data in documents.items():
+                self.set(collection, document_id, data)
+
+
+class ExpiringVerificationCodeStore(VerificationCodeStore):
+    """
+    In-process expiring map: expired codes are hidden from reads at once and
+    their memory is reclaimed by `delete_expired`, which pops them off a heap
+    ordered by expiry instead of scanning every code.
+    """
+
+    def __init__(self, latency_ms: float = 0):
+        self.latency_ms = latency_ms
+        self.codes: dict[str, dict] = {}
+        # (expires_at, phone_number); entries of codes set again go stale
+        self.expiry_heap: list[tuple[datetime, str]] = []
+        self.lock = threading.Lock()
+
+    def set(self, phone_number: str, document: dict) -> None:
+        simulate_latency(self.latency_ms)
+        document = InMemoryDocumentBackend._resolve_sentinels(document)
+        with self.lock:
+            self.codes[phone_number] = document
+            heapq.heappush(
+                self.expiry_heap,
+                (document[VERIFICATION_CODE_TTL_FIELD], phone_number),
+            )
+
+    def get_many(self, phone_numbers: list[str]) -> dict[str, dict | None]:
+        simulate_latency(self.latency_ms)
+        now = datetime.now(timezone.utc)
+        with self.lock:
+            return {
+                phone_number: (
+                    deepcopy(self.codes[phone_number])
+                    if is_live_code(self.codes.get(phone_number), now)
+                    else None
+                )
+                for phone_number in phone_numbers
+            }
+
+    def delete_many(
+        self, phone_numbers: list[str], must_exist: Iterable[str] = ()
+    ) -> bool:
+        simulate_latency(self.latency_ms)
+        with self.lock:
+            if any(phone_number not in self.codes for phone_number in must_exist):
+                return False
+            for phone_number in phone_numbers:
+                self.codes.pop(phone_number, None)
+        return True
+
+    def delete_expired(self, now: datetime, limit: int) -> int:
+        deleted = 0
+        with self.lock:
+            while (
+                self.expiry_heap
+                and self.expiry_heap[0][0] <= now
+                and deleted < limit
+            ):
+                expires_at, phone_number = heapq.heappop(self.expiry_heap)
+                document = self.codes.get(phone_number)
+                if (
+                    document is not None
+                    and document[VERIFICATION_CODE_TTL_FIELD] == expires_at
+                ):
+                    del self.codes[phone_number]
+                    deleted += 1
+        return deleted
+
+    def count(self, now: datetime) -> tuple[int, int]:
+        with self.lock:
+            live = sum(is_live_code(document, now) for document in self.codes.values())
+            return live, len(self.codes) - live
+
+
+class FakeVerificationSender(VerificationSender):
+    """
+    Accepts `approved_code` for every phone number that was sent a code.
+    """
+
+    def __init__(self, latency_ms: float = 0, approved_code: str = "123456"):
+        self.latency_ms = latency_ms
+        self.approved_code = approved_code
+        self.pending: set[str] = set()
+
+    def send_code(self, phone_number: str):
+        simulate_latency(self.latency_ms)
+        self.pending.add(phone_number)
+        return VerificationResult(status="pending")
+
+    def verify_code(self, phone_number: str, code: str):
+        simulate_latency(self.latency_ms)
+        if phone_number in self.pending and code == self.approved_code:
+            self.pending.discard(phone_number)
+            return VerificationResult(status="approved")
+        return VerificationResult(status="pending")
+
+
+class FakeWhatsAppSender(WhatsAppSender):
+    def __init__(self, latency_ms: float = 0, failure_rate: float = 0):
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate
+        self.sent: dict[str, int] = {}
+
+    def send_template(
+        self, phone_number: str, template_name: str, code: int
+    ) -> tuple[bool, dict]:
+        simulate_latency(self.latency_ms)
+        if random.random() < self.failure_rate:
+            return False, {"error": {"message": "Simulated failure", "code": 131026}}
+
+        self.sent[phone_number] = code
+        return True, {
+            "messaging_product": "whatsapp",
+            "contacts": [{"input": phone_number, "wa_id": phone_number}],
+            "messages": [{"id": f"wamid.local.{random.getrandbits(64):x}"}],
+        }
+
+
+def load_respondent_fixtures(backend: SQLRespondentBackend, fixtures: list[dict]):
+    for row in fixtures:
+        backend.insert_respondent(row)
+
+
+def load_fixture_file(path: str | Path):
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def register_local_backends(registry) -> None:
+    """
+    Registers the stand-ins in a `ClientRegistry`, configured from environment
+    variables:
+
+    - LOCAL_RESPONDENT_DATABASE: DuckDB/SQLite file (default in memory).
+    - LOCAL_RESPONDENT_FIXTURES / LOCAL_DOCUMENT_FIXTURES: JSON seed data
+      (default files in ./fixtures).
+    - LOCAL_STORAGE_LATENCY_MS: latency added to each table/document call.
+    - FAKE_SENDER_LATENCY_MS: latency added to each SMS/WhatsApp send.
+    - FAKE_SENDER_FAILURE_RATE: share of WhatsApp sends that fail.
+    - FAKE_VERIFICATION_CODE: SMS code the fake Twilio Verify approves.
+    """
+    storage_latency_ms = float(os.getenv("LOCAL_STORAGE_LATENCY_MS", "0"))
+    sender_latency_ms = float(os.getenv("FAKE_SENDER_LATENCY_MS", "0"))
+
+    def create_respondent_backend() -> SQLRespondentBackend:
+        respondent_backend = SQLRespondentBackend(
+            connect_respondent_database(
+                os.getenv("LOCAL_RESPONDENT_DATABASE", ":memory:")
+            ),
+            latency_ms=storage_latency_ms,
+        )
+        load_respondent_fixtures(
+            respondent_backend,
+            load_fixture_file(
+                os.getenv(
+                    "LOCAL_RESPONDENT_FIXTURES", FIXTURES_FOLDER / "respondents.json"
+                )
+            ),
+        )
+        return respondent_backend
+
+    def create_document_backend() -> InMemoryDocumentBackend:
+        document_backend = InMemoryDocumentBackend(latency_ms=storage_latency_ms)
+        document_backend.load_fixtures(
+            load_fixture_file(
+                os.getenv(
+                    "LOCAL_DOCUMENT_FIXTURES", FIXTURES_FOLDER / "documents.json"
+                )
+            )
+        )
+        return document_backend
+
+    registry.register("respondent_backend", create_respondent_backend)
+    registry.register("document_backend", create_document_backend)
+    registry.register(
+        "code_store",
+        lambda: ExpiringVerificationCodeStore(latency_ms=storage_latency_ms),
+    )
+    registry.register(
+        "verification_sender",
+        lambda: FakeVerificationSender(
+            latency_ms=sender_latency_ms,
+            approved_code=os.getenv("FAKE_VERIFICATION_CODE", "123456"),
+        ),
+    )
+    registry.register(
+        "whatsapp_sender",
+        lambda: FakeWhatsAppSender(
+            latency_ms=sender_latency_ms,
+            failure_rate=float(os.getenv("FAKE_SENDER_FAILURE_RATE", "0")),
+        ),
+    )
+
+    logger.info("Using local in-process backends.")
@@ -1,7 +1,44 @@
+from datetime import datetime, timezone
+import json
 import logging
+import os
+
+from telemetry import cloud_trace_resource, current_trace
+
+# "json" writes one JSON object per line with the request id of the trace, as
+# Cloud Logging parses them; "text" is easier to read locally
+LOG_FORMAT = os.getenv(
+    "LOG_FORMAT", "text" if os.getenv("ENV", "local") == "local" else "json"
+)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "severity": record.levelname,
+            "logger": record.module,
+            "message": record.getMessage(),
+        }
+        trace = current_trace.get()
+        if trace is not None:
+            entry["request_id"] = trace.request_id
+            cloud_trace = cloud_trace_resource(trace)
+            if cloud_trace is not None:
+                entry["logging.googleapis.com/trace"] = cloud_trace
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
 
 
 def setup_logging():
+    if LOG_FORMAT == "json":
+        handler = logging.StreamHandler()
+        handler.setFormatter(JsonFormatter())
+        logging.basicConfig(level=logging.INFO, handlers=[handler])
+        return
+
     logging.basicConfig(
         level=logging.INFO,
         format='[%(asctime)s] -- %(levelname)s -- %(module)s: %(message)s'
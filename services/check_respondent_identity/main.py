@@ -1,12 +1,15 @@
+import itertools
 import os
-import time
 from datetime import datetime, timezone
 
-from flask import Flask, request
+from flask import Flask, Response, request, stream_with_context
 from flask_cors import CORS
 
+from circuit_breaker import CircuitOpen
 from logger import setup_logging
+from rate_limiter import RateLimitExceeded
 import resources
+import telemetry
 
 ENV = os.getenv("ENV", "local")
 
@@ -20,11 +23,14 @@ setup_logging()
 app = Flask(__name__)
 
 ALLOWED_ORIGIN = "https://connecta.questionpro.com"  # Replace with the allowed origin
-MAX_VERIFICATION_ATTEMPTS = 1
 
 # Configure CORS to allow only specific origin
 CORS(app, resources={r"/*": {"origins": ALLOWED_ORIGIN}})
 
+# Latency histograms, error counts and in-flight gauges per route, and a
+# request id in the logs of each request
+telemetry.instrument_flask(app)
+
 
 @app.route("/check_health")
 def check_health():
@@ -34,6 +40,86 @@ def check_health():
     return {"message": "Service is healthy."}, 200
 
 
+@app.route("/metrics")
+def metrics():
+    """
+    Request and backend call metrics in the Prometheus text format.
+    """
+    return Response(telemetry.render(), content_type=telemetry.PROMETHEUS_CONTENT_TYPE)
+
+
+@app.route("/respondent_index/stats")
+def respondent_index_stats():
+    """
+    Rebuild metrics and sizes of the known-respondent index.
+    """
+    return resources.respondent_index.stats(), 200
+
+
+@app.route("/respondent_writer/stats")
+def respondent_writer_stats():
+    """
+    Queue and flush metrics of the buffered respondent writer.
+    """
+    if resources.respondent_writer is None:
+        return {"message": "Respondent writes are not buffered."}, 404
+    return resources.respondent_writer.stats(), 200
+
+
+@app.route("/supervisor_directory/stats")
+def supervisor_directory_stats():
+    """
+    Load metrics and size of the active supervisor snapshot.
+    """
+    return resources.supervisor_directory.stats(), 200
+
+
+@app.route("/client_registry/stats")
+def client_registry_stats():
+    """
+    Backend clients created so far and their creation times.
+    """
+    return resources.client_registry.stats(), 200
+
+
+@app.route("/single_flight/stats")
+def single_flight_stats():
+    """
+    Coalescing metrics of the eligibility lookups and code verifications.
+    """
+    return {
+        "eligibility": resources.eligibility_lookups.stats(),
+        "wp_code_verification": resources.wp_code_verifications.stats(),
+    }, 200
+
+
+@app.route("/verification_codes/stats")
+def verification_codes_stats():
+    """
+    Live and expired WhatsApp codes in the store, and sweeper metrics.
+    """
+    return resources.verification_code_sweeper.stats(), 200
+
+
+@app.route("/verification_sender/stats")
+def verification_sender_stats():
+    """
+    Call, retry and circuit breaker metrics of the Twilio Verify client.
+    """
+    stats = resources.verification_sender.stats()
+    if stats is None:
+        return {"message": "The verification sender keeps no metrics."}, 404
+    return stats, 200
+
+
+@app.route("/rate_limiter/stats")
+def rate_limiter_stats():
+    """
+    Allowed and rejected WhatsApp code sends of this instance.
+    """
+    return resources.rate_limiter.stats(), 200
+
+
 @app.route(
     "/check_respondent_qualified/<path:country>/<path:phone_number>/<path:project_type>"
 )
@@ -73,12 +159,71 @@ def check_respondent_qualified(country: str, phone_number: str, project_type: st
             "is_qualified": is_qualified,
         }, 200 if is_qualified else 403
 
+    except ValueError as e:
+        # Unknown country or a number without digits
+        message = f"Invalid phone number: {str(e)}"
+        app.logger.error(message)
+        return {"message": message}, 400
+
     except Exception as e:
         message = f"Failed to check respondent qualification: {str(e)}"
         app.logger.error(message)
         return {"message": message}, 500
 
 
+@app.route("/check_respondents_qualified", methods=["POST"])
+def check_respondents_qualified():
+    """
+    Check which respondents of a list are qualified to take the survey.
+    Expects {"project_type": ..., "respondents": [{"country": ...,
+    "phone_number": ...}, ...]}.
+    """
+    body = request.get_json()
+    respondents = body.get("respondents") or []
+    if not respondents or not body.get("project_type"):
+        message = "Respondents and project type are required."
+        app.logger.error(message)
+        return {"message": message}, 400
+
+    if len(respondents) > resources.BULK_ELIGIBILITY_MAX_RESPONDENTS:
+        message = (
+            f"At most {resources.BULK_ELIGIBILITY_MAX_RESPONDENTS} respondents "
+            "can be checked per request."
+        )
+        app.logger.error(message)
+        return {"message": message}, 413
+
+    project_type = body.get("project_type").strip().lower()
+    try:
+        results = resources.check_respondents_qualified(respondents, project_type)
+        # Runs the query, so its errors are reported before any streaming
+        first_result = next(results)
+
+    except ValueError as e:
+        message = f"Invalid respondents: {str(e)}"
+        app.logger.error(message)
+        return {"message": message}, 400
+
+    except Exception as e:
+        message = f"Failed to check respondents qualification: {str(e)}"
+        app.logger.error(message)
+        return {"message": message}, 500
+
+    app.logger.info(
+        f"Checking qualification of {len(respondents)} respondents for "
+        f"project type {project_type}."
+    )
+    results = itertools.chain([first_result], results)
+    if len(respondents) <= resources.BULK_ELIGIBILITY_STREAM_THRESHOLD:
+        return {"project_type": project_type, "results": list(results)}, 200
+
+    return Response(
+        stream_with_context(resources.iter_json_results(project_type, results)),
+        status=200,
+        mimetype="application/json",
+    )
+
+
 @app.route("/send_code/<path:country>/<path:phone_number>")
 def send_code(country: str, phone_number: str):
     """
@@ -99,6 +244,11 @@ def send_code(country: str, phone_number: str):
         app.logger.info(message)
         return {"message": message, "status": _status}, 200
 
+    except CircuitOpen as e:
+        message = f"Failed to send code: {str(e)}"
+        app.logger.error(message)
+        return {"message": message}, 503
+
     except Exception as e:
         message = f"Failed to send code: {str(e)}"
         app.logger.error(message)
@@ -120,23 +270,15 @@ def verify(country: str, phone_number: str, code: str):
         phone_number = f"+{resources.transform_phone_number(country, phone_number)}"
         # Sanitize the code
         code = code.replace(" ", "")
-        # Verify the code using Twilio
-        verification_attempts = 0
-        _status = "failed"
-        while verification_attempts < MAX_VERIFICATION_ATTEMPTS:
-            verification_check = resources.verify_code(phone_number, code)
-            _status = verification_check.status
-            if _status == "approved":
-                break
-            else:
-                message = (
-                    f"Verification code failed with status '{_status}' in "
-                    f"attempt {verification_attempts}. Most likely the code"
-                    " is incorrect and do not match the one sent by Twilio."
-                )
-                app.logger.warning(message)
-                verification_attempts += 1
-                time.sleep(2)
+        # Verify the code using Twilio; the Twilio client retries transient
+        # failures within its deadline, and a wrong code is a final answer
+        verification_check = resources.verify_code(phone_number, code)
+        _status = verification_check.status
+        if _status != "approved":
+            app.logger.warning(
+                f"Verification code failed with status '{_status}'. Most likely the"
+                " code is incorrect and do not match the one sent by Twilio."
+            )
 
         message = f"Verification code made with status '{_status}'."
         app.logger.info(message)
@@ -145,6 +287,11 @@ def verify(country: str, phone_number: str, code: str):
             "status": _status,
         }, 200 if _status == "approved" else 400
 
+    except CircuitOpen as e:
+        message = f"Verification failed: {str(e)}"
+        app.logger.error(message)
+        return {"message": message}, 503
+
     except Exception as e:
         message = f"Verification failed: {str(e)}"
         app.logger.error(message)
@@ -215,12 +362,68 @@ def send_wp_code(country: str, phone_number: str):
         app.logger.info(message)
         return {"message": response}, 200
 
+    except RateLimitExceeded as e:
+        message = f"Failed to send WhatsApp code: {str(e)}"
+        app.logger.warning(message)
+        return {"message": message}, 429
+
     except Exception as e:
         message = f"Failed to send WhatsApp code: {str(e)}"
         app.logger.error(message)
         return {"message": message}, 500
 
 
+@app.route(
+    "/start_verification/<path:country>/<path:phone_number>/<path:project_type>"
+)
+def start_verification(country: str, phone_number: str, project_type: str):
+    """
+    Check that the respondent qualifies and send a verification code in one
+    request, running the checks concurrently.
+    """
+    if not phone_number:
+        message = "Phone number is required."
+        app.logger.error(message)
+        return {"message": message}, 400
+
+    channel = request.args.get("channel", "whatsapp").lower()
+    if channel not in ("whatsapp", "sms"):
+        message = f"Unknown channel '{channel}'."
+        app.logger.error(message)
+        return {"message": message}, 400
+
+    try:
+        result = resources.start_verification(
+            country,
+            phone_number,
+            project_type,
+            channel=channel,
+            supervisor=request.args.get("supervisor", "false").lower() == "true",
+        )
+        content = {
+            "status": result.status,
+            "is_qualified": result.is_qualified,
+            "is_supervisor": result.is_supervisor,
+            "message": result.response,
+            "timings_ms": result.timings_ms,
+        }
+        app.logger.info(
+            f"Verification start for {phone_number}: {result.status} "
+            f"in {result.timings_ms['total']} ms."
+        )
+        return content, resources.START_VERIFICATION_STATUS_CODES[result.status]
+
+    except CircuitOpen as e:
+        message = f"Failed to start verification: {str(e)}"
+        app.logger.error(message)
+        return {"message": message}, 503
+
+    except Exception as e:
+        message = f"Failed to start verification: {str(e)}"
+        app.logger.error(message)
+        return {"message": message}, 500
+
+
 @app.route("/verify_wp_code/<path:country>/<path:phone_number>/<path:code>")
 def verify_wp_code(country: str, phone_number: str, code: str):
     if not phone_number or not code:
@@ -256,4 +459,6 @@ def verify_wp_code(country: str, phone_number: str, code: str):
 
 if __name__ == "__main__":
     debug = ENV == "local"
+    resources.start_supervisor_directory()
+    resources.prewarm()
     app.run(debug=debug, host="0.0.0.0", port=8080)
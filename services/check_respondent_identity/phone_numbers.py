@@ -0,0 +1,200 @@
+"""
+Phone number normalization: the international form stored in BigQuery and
+the WhatsApp variants of a number, computed together and memoized, plus a
+vectorized version for whole columns.
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+import json
+from pathlib import Path
+import re
+
+NON_DIGITS = re.compile(r"\D")
+MEXICO_FULL_NUMBER = re.compile(r"521?\d{10}")
+
+MEXICO_COUNTRY_CODE = "52"
+MEXICO_MOBILE_PREFIX = "1"
+
+NORMALIZATION_CACHE_SIZE = 65536
+
+with open(Path(__file__).parent.joinpath("countries_phone_codes.json"), "r") as file:
+    # Codes like "+1-246" are stored as the digits they are dialed with
+    COUNTRY_PHONE_CODES = {
+        country: NON_DIGITS.sub("", code) for country, code in json.load(file).items()
+    }
+
+
+class CallingCodeTrie:
+    """Digit trie of calling codes, for the longest code a number starts with."""
+
+    def __init__(self, codes):
+        self.root: dict = {}
+        for code in codes:
+            if not code:
+                continue
+            node = self.root
+            for digit in code:
+                node = node.setdefault(digit, {})
+            node[""] = code
+
+    def longest_prefix(self, digits: str) -> str | None:
+        node = self.root
+        match = None
+        for digit in digits:
+            node = node.get(digit)
+            if node is None:
+                break
+            match = node.get("", match)
+        return match
+
+
+calling_codes = CallingCodeTrie(COUNTRY_PHONE_CODES.values())
+
+
+@dataclass(frozen=True)
+class NormalizedPhone:
+    # Number with its country calling code, as stored in BigQuery
+    international: str
+    # Numbers to try on WhatsApp, in order of preference
+    wp_variants: tuple[str, ...]
+
+
+def get_country_phone_code(country: str) -> str:
+    country_phone_code = COUNTRY_PHONE_CODES.get(country)
+    if country_phone_code is None:
+        raise ValueError(f"Unknown country '{country}'.")
+    return country_phone_code
+
+
+def to_international(country: str, digits: str, explicit_code: bool = False) -> str:
+    try:
+        country_phone_code = get_country_phone_code(country)
+    except ValueError:
+        # Without the country, only numbers written with a "+" and a known
+        # calling code are taken as international; most digit strings start
+        # with some calling code by chance
+        if not explicit_code or calling_codes.longest_prefix(digits) is None:
+            raise
+        return digits
+
+    # Check if the phone number already has the country code
+    if digits.startswith(country_phone_code):
+        return digits
+    return f"{country_phone_code}{digits}"
+
+
+def mexico_variants(digits: str, international: str) -> tuple[str, ...]:
+    if MEXICO_FULL_NUMBER.fullmatch(digits):
+        return (digits,)
+
+    if international.startswith(f"{MEXICO_COUNTRY_CODE}{MEXICO_MOBILE_PREFIX}"):
+        local_number = international[
+            len(MEXICO_COUNTRY_CODE) + len(MEXICO_MOBILE_PREFIX) :
+        ]
+    elif international.startswith(MEXICO_COUNTRY_CODE):
+        local_number = international[len(MEXICO_COUNTRY_CODE) :]
+    else:
+        return (international,)
+
+    return (
+        f"{MEXICO_COUNTRY_CODE}{MEXICO_MOBILE_PREFIX}{local_number}",
+        f"{MEXICO_COUNTRY_CODE}{local_number}",
+    )
+
+
+@lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
+def normalize_phone(country: str, phone_number: str) -> NormalizedPhone:
+    digits = NON_DIGITS.sub("", phone_number)
+    international = to_international(
+        country, digits, explicit_code=phone_number.strip().startswith("+")
+    )
+
+    if country.strip().upper() != "MX":
+        return NormalizedPhone(international, (international,))
+
+    return NormalizedPhone(international, mexico_variants(digits, international))
+
+
+def normalize_phone_column(countries, phone_numbers):
+    """
+    Vectorized `normalize_phone` for backfills, on Arrow compute kernels.
+    Takes a country code or a Series of them and a Series of phone numbers;
+    returns a DataFrame on the same index with `international`, `wp_primary`
+    and `wp_alternative` (the landline form of Mexican mobiles, else <NA>).
+    """
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if isinstance(countries, str):
+        countries = pd.Series(countries, index=phone_numbers.index)
+
+    raw_numbers = pa.array(phone_numbers.astype("string[pyarrow]")).cast(pa.string())
+    digits = pc.replace_substring_regex(raw_numbers, NON_DIGITS.pattern, "")
+    country_array = pa.array(countries.astype("string[pyarrow]")).cast(pa.string())
+    codes = pa.array(countries.map(COUNTRY_PHONE_CODES), type=pa.string())
+
+    unknown = pc.is_null(codes)
+    if pc.any(unknown).as_py():
+        # Same rule as `to_international`: only "+" numbers with a known
+        # calling code are accepted without their country
+        explicit_code = pc.fill_null(
+            pc.starts_with(pc.utf8_ltrim_whitespace(raw_numbers), "+"), False
+        )
+        unknown_digits = pc.filter(digits, unknown).to_pylist()
+        if not pc.all(pc.filter(explicit_code, unknown)).as_py() or any(
+            calling_codes.longest_prefix(number) is None for number in unknown_digits
+        ):
+            unknown_countries = set(pc.filter(country_array, unknown).to_pylist())
+            raise ValueError(f"Unknown countries: {sorted(unknown_countries)}")
+
+    # One vectorized prefix check per calling code present in the column
+    has_code = unknown
+    for code in pc.unique(codes).to_pylist():
+        if code is not None:
+            has_code = pc.or_kleene(
+                has_code,
+                pc.and_(pc.equal(codes, code), pc.starts_with(digits, code)),
+            )
+    international = pc.if_else(
+        has_code, digits, pc.binary_join_element_wise(codes, digits, "")
+    )
+
+    mobile_prefix = f"{MEXICO_COUNTRY_CODE}{MEXICO_MOBILE_PREFIX}"
+    is_mexico = pc.fill_null(
+        pc.equal(pc.utf8_upper(pc.utf8_trim_whitespace(country_array)), "MX"), False
+    )
+    full_number = pc.match_substring_regex(digits, f"^{MEXICO_FULL_NUMBER.pattern}$")
+    local_number = pc.if_else(
+        pc.starts_with(international, mobile_prefix),
+        pc.utf8_slice_codeunits(international, len(mobile_prefix)),
+        pc.utf8_slice_codeunits(international, len(MEXICO_COUNTRY_CODE)),
+    )
+    split = pc.and_(
+        pc.and_(is_mexico, pc.invert(full_number)),
+        pc.starts_with(international, MEXICO_COUNTRY_CODE),
+    )
+
+    wp_primary = pc.if_else(pc.and_(is_mexico, full_number), digits, international)
+    wp_primary = pc.if_else(
+        split, pc.binary_join_element_wise(mobile_prefix, local_number, ""), wp_primary
+    )
+    wp_alternative = pc.if_else(
+        split,
+        pc.binary_join_element_wise(MEXICO_COUNTRY_CODE, local_number, ""),
+        pa.scalar(None, pa.string()),
+    )
+
+    return pd.DataFrame(
+        {
+            column: pd.Series(
+                pd.array(values, dtype="string[pyarrow]"), index=phone_numbers.index
+            )
+            for column, values in (
+                ("international", international),
+                ("wp_primary", wp_primary),
+                ("wp_alternative", wp_alternative),
+            )
+        }
+    )
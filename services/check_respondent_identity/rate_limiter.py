@@ -0,0 +1,258 @@
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime, timezone, timedelta
+import logging
+import threading
+import time
+import uuid
+import zlib
+
+from backends import DocumentBackend
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class SharedRateLimitBackend(ABC):
+    """Request log shared by all instances of the service."""
+
+    @abstractmethod
+    def acquire(self, key: str, limit: int, window_seconds: float) -> bool:
+        """
+        Records a request for `key` and returns True when fewer than `limit`
+        requests were recorded in the last `window_seconds`; otherwise records
+        nothing and returns False.
+        """
+
+    @abstractmethod
+    def release(self, key: str) -> None:
+        """Forgets the latest request recorded for `key`."""
+
+
+# Sliding window log in a sorted set, trimmed, counted and appended
+# atomically on the server
+SLIDING_WINDOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", now - window)
+if redis.call("ZCARD", KEYS[1]) >= tonumber(ARGV[3]) then
+    return 0
+end
+redis.call("ZADD", KEYS[1], now, ARGV[4])
+redis.call("PEXPIRE", KEYS[1], math.ceil(window * 1000))
+return 1
+"""
+
+
+class RedisRateLimitBackend(SharedRateLimitBackend):
+    """
+    Works with any Redis-compatible client exposing `register_script`
+    (Memorystore, Valkey, ...).
+    """
+
+    def __init__(self, client, prefix: str = "rate_limit:"):
+        self.client = client
+        self.prefix = prefix
+        self.script = client.register_script(SLIDING_WINDOW_SCRIPT)
+
+    def acquire(self, key: str, limit: int, window_seconds: float) -> bool:
+        return bool(
+            self.script(
+                keys=[f"{self.prefix}{key}"],
+                args=[time.time(), window_seconds, limit, uuid.uuid4().hex],
+            )
+        )
+
+    def release(self, key: str) -> None:
+        self.client.zpopmax(f"{self.prefix}{key}")
+
+
+class DocumentRateLimitBackend(SharedRateLimitBackend):
+    """
+    Sliding window log kept in one document per key through a
+    `DocumentBackend` (Firestore in production), trimmed, counted and
+    appended in a transaction. Documents of keys no longer used are deleted
+    by the TTL policy on `expires_at`, enabled by jobs.enable_rate_limit_ttl.
+    """
+
+    def __init__(self, document_backend: DocumentBackend, collection: str):
+        self.document_backend = document_backend
+        self.collection = collection
+
+    def _document_id(self, key: str) -> str:
+        # Document ids cannot contain "/"
+        return key.replace("/", "_")
+
+    def acquire(self, key: str, limit: int, window_seconds: float) -> bool:
+        allowed = False
+
+        def operation(document: dict | None) -> dict:
+            # Set on every attempt, so the outcome is the one of the
+            # committed transaction
+            nonlocal allowed
+            now = time.time()
+            requests = [
+                requested_at
+                for requested_at in (document or {}).get("requests", [])
+                if requested_at > now - window_seconds
+            ]
+            allowed = len(requests) < limit
+            if allowed:
+                requests.append(now)
+            return {
+                "requests": requests,
+                "expires_at": datetime.now(timezone.utc)
+                + timedelta(seconds=window_seconds),
+            }
+
+        self.document_backend.transact(
+            self.collection, self._document_id(key), operation
+        )
+        return allowed
+
+    def release(self, key: str) -> None:
+        def operation(document: dict | None) -> dict | None:
+            # A missing document has nothing to give back, and writing one
+            # without expires_at would keep it out of the TTL policy
+            if document is None:
+                return None
+            requests = sorted(document.get("requests", []))
+            return {"requests": requests[:-1]}
+
+        self.document_backend.transact(
+            self.collection, self._document_id(key), operation
+        )
+
+
+class RateLimiterShard:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests: dict[str, deque[float]] = {}
+        self.last_sweep = time.monotonic()
+
+
+class RateLimiter:
+    """
+    Sliding window limit of `limit` requests per key every `window_seconds`.
+    Keys are spread over shards with their own lock, so requests for
+    different numbers do not wait on each other.
+
+    The in-process window only sees this instance's requests: it rejects
+    without a round trip when it is already full, and otherwise the shared
+    backend has the final say. Shared backend failures are logged and the
+    request is allowed, like the eligibility cache treats them as misses.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        window_seconds: float,
+        shards: int = 16,
+        shared_backend: SharedRateLimitBackend | None = None,
+    ):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.shards = [RateLimiterShard() for _ in range(shards)]
+        self.shared_backend = shared_backend
+        self.stats_lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+        self.released = 0
+        self.shared_errors = 0
+
+    def _shard(self, key: str) -> RateLimiterShard:
+        return self.shards[zlib.crc32(key.encode()) % len(self.shards)]
+
+    def _sweep(self, shard: RateLimiterShard, now: float):
+        # Drops keys without requests in the window, at most once per window
+        if now - shard.last_sweep < self.window_seconds:
+            return
+        shard.last_sweep = now
+        for key in [
+            key
+            for key, requests in shard.requests.items()
+            if requests[-1] <= now - self.window_seconds
+        ]:
+            del shard.requests[key]
+
+    def _acquire_local(self, key: str) -> float | None:
+        shard = self._shard(key)
+        now = time.monotonic()
+        with shard.lock:
+            self._sweep(shard, now)
+            requests = shard.requests.setdefault(key, deque())
+            while requests and requests[0] <= now - self.window_seconds:
+                requests.popleft()
+            if len(requests) >= self.limit:
+                return None
+            requests.append(now)
+        return now
+
+    def _release_local(self, key: str, acquired_at: float | None = None):
+        shard = self._shard(key)
+        with shard.lock:
+            requests = shard.requests.get(key)
+            if not requests:
+                return
+            if acquired_at is None:
+                requests.pop()
+            elif acquired_at in requests:
+                requests.remove(acquired_at)
+
+    def try_acquire(self, key: str) -> bool:
+        acquired_at = self._acquire_local(key)
+        allowed = acquired_at is not None
+
+        if allowed and self.shared_backend is not None:
+            try:
+                allowed = self.shared_backend.acquire(
+                    key, self.limit, self.window_seconds
+                )
+            except Exception as e:
+                logger.warning(f"Shared rate limit check failed: {str(e)}")
+                with self.stats_lock:
+                    self.shared_errors += 1
+
+            if not allowed:
+                self._release_local(key, acquired_at)
+
+        with self.stats_lock:
+            if allowed:
+                self.allowed += 1
+            else:
+                self.rejected += 1
+        return allowed
+
+    def acquire(self, key: str) -> None:
+        if not self.try_acquire(key):
+            raise RateLimitExceeded("Rate limit exceeded")
+
+    def release(self, key: str) -> None:
+        """Gives back the latest request of `key`, when it was not used."""
+        self._release_local(key)
+        if self.shared_backend is not None:
+            try:
+                self.shared_backend.release(key)
+            except Exception as e:
+                logger.warning(f"Shared rate limit release failed: {str(e)}")
+                with self.stats_lock:
+                    self.shared_errors += 1
+        with self.stats_lock:
+            self.released += 1
+
+    def stats(self) -> dict[str, int]:
+        keys = 0
+        for shard in self.shards:
+            with shard.lock:
+                keys += len(shard.requests)
+        with self.stats_lock:
+            return {
+                "keys": keys,
+                "allowed": self.allowed,
+                "rejected": self.rejected,
+                "released": self.released,
+                "shared_errors": self.shared_errors,
+            }
@@ -1,160 +1,356 @@
+from collections import defaultdict
 from dataclasses import dataclass
+import json
+from concurrent.futures import Future, ThreadPoolExecutor
+import contextvars
 import os
 import random
-import re
-import requests
-from pathlib import Path
 from datetime import datetime, timezone, timedelta
-import json
-
-from twilio.rest import Client as TwilioClient
+import logging
+import time
+from typing import Iterator
+
+import backends
+from client_registry import ClientRegistry
+from code_sweeper import VerificationCodeSweeper
+from eligibility_cache import DocumentCacheTier, EligibilityCache, RedisCacheTier
+from phone_numbers import MEXICO_FULL_NUMBER, normalize_phone, normalize_phone_column
+from rate_limiter import (
+    DocumentRateLimitBackend,
+    RateLimiter,
+    RedisRateLimitBackend,
+)
+from respondent_index import RespondentIndex
+from respondent_writer import BufferedRespondentWriter
+from single_flight import SingleFlight
+from supervisor_directory import SupervisorDirectory
+from telemetry import traced
+from whatsapp_client import SendMetrics
 
-from google.cloud import bigquery
-from google.cloud import firestore
+logger = logging.getLogger(__name__)
 
 
 BQ_DATASET = "survey_history"
 BQ_TABLE = "respondent"
 
+# Days after a response before the respondent qualifies again
+QUALIFICATION_COOLDOWN_DAYS = 180
+
 CODE_EXPIRY_MINUTES = 5
 MAX_REQUESTS_PER_HOUR = 3
 
 FIRESTORE_PHONE_VERIFICATION_COLLECTION = "phone_verification"
 FIRESTORE_SETTINGS_COLLECTION = "settings"
 FIRESTORE_BUSINESS_DATA_DOCUMENT = "business_data"
+FIRESTORE_ELIGIBILITY_CACHE_COLLECTION = "respondent_eligibility_cache"
+FIRESTORE_RATE_LIMIT_COLLECTION = "phone_verification_rate_limit"
+
+ELIGIBILITY_CACHE_TTL_SECONDS = float(os.getenv("ELIGIBILITY_CACHE_TTL_SECONDS", "900"))
+ELIGIBILITY_CACHE_MAX_ENTRIES = int(os.getenv("ELIGIBILITY_CACHE_MAX_ENTRIES", "50000"))
+# "", "firestore" or "redis" (with ELIGIBILITY_CACHE_REDIS_URL)
+ELIGIBILITY_CACHE_SHARED_TIER = os.getenv("ELIGIBILITY_CACHE_SHARED_TIER", "")
+# Off by default without a shared tier: a write only invalidates the entries
+# of its own instance, so the others could qualify a fresh respondent until
+# their entry expires
+ELIGIBILITY_CACHE_ENABLED = (
+    os.getenv(
+        "ELIGIBILITY_CACHE_ENABLED", "true" if ELIGIBILITY_CACHE_SHARED_TIER else "false"
+    )
+    == "true"
+)
 
-WHATSAPP_TEMPLATE_NAME = "survey_verification_code"
-MEXICO_COUNTRY_CODE = "52"
-MEXICO_MOBILE_PREFIX = "1"
+# Off by default: rows written by other instances are only seen after the
+# next refresh, so a fresh respondent could be qualified within that window
+RESPONDENT_INDEX_ENABLED = os.getenv("RESPONDENT_INDEX_ENABLED", "false") == "true"
+RESPONDENT_INDEX_FALSE_POSITIVE_RATE = float(
+    os.getenv("RESPONDENT_INDEX_FALSE_POSITIVE_RATE", "0.01")
+)
+RESPONDENT_INDEX_REFRESH_SECONDS = float(
+    os.getenv("RESPONDENT_INDEX_REFRESH_SECONDS", "60")
+)
+RESPONDENT_INDEX_FULL_REBUILD_EVERY = int(
+    os.getenv("RESPONDENT_INDEX_FULL_REBUILD_EVERY", "60")
+)
 
-twilio_client = TwilioClient(
-    os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN")
+# Concurrent identical eligibility lookups and code verifications share one
+# backend call; callers joining one wait at most these timeouts
+ELIGIBILITY_LOOKUP_TIMEOUT_SECONDS = float(
+    os.getenv("ELIGIBILITY_LOOKUP_TIMEOUT_SECONDS", "30")
+)
+WP_CODE_VERIFICATION_TIMEOUT_SECONDS = float(
+    os.getenv("WP_CODE_VERIFICATION_TIMEOUT_SECONDS", "10")
 )
 
-twilio_service_sid = os.getenv("TWILIO_SERVICE_SID")
-if not twilio_service_sid:
-    raise ValueError("Missing TWILIO_SERVICE_SID environment variable")
+# Threads running the concurrent checks of /start_verification
+START_VERIFICATION_WORKERS = int(os.getenv("START_VERIFICATION_WORKERS", "16"))
 
-verify_service = twilio_client.verify.services(twilio_service_sid)
+# Expired WhatsApp codes are deleted by the Firestore TTL policy and the
+# scheduled jobs.sweep_verification_codes job. A positive interval also sweeps
+# from the service, in batches, in every worker of every instance; Firestore
+# batches take at most 500 writes
+VERIFICATION_CODE_SWEEP_SECONDS = float(
+    os.getenv("VERIFICATION_CODE_SWEEP_SECONDS", "0")
+)
+VERIFICATION_CODE_SWEEP_BATCH_SIZE = int(
+    os.getenv("VERIFICATION_CODE_SWEEP_BATCH_SIZE", "500")
+)
 
-bq_client = bigquery.Client()
-db = firestore.Client()
+# "direct" upserts each row with one MERGE; "buffered" queues rows
+# for batched streaming inserts into a staging table merged periodically
+RESPONDENT_WRITE_MODE = os.getenv("RESPONDENT_WRITE_MODE", "direct")
+RESPONDENT_WRITE_BATCH_SIZE = int(os.getenv("RESPONDENT_WRITE_BATCH_SIZE", "500"))
+RESPONDENT_WRITE_MAX_DELAY_SECONDS = float(
+    os.getenv("RESPONDENT_WRITE_MAX_DELAY_SECONDS", "0.2")
+)
+RESPONDENT_WRITE_MERGE_INTERVAL_SECONDS = float(
+    os.getenv("RESPONDENT_WRITE_MERGE_INTERVAL_SECONDS", "60")
+)
+RESPONDENT_WRITE_TIMEOUT_SECONDS = float(
+    os.getenv("RESPONDENT_WRITE_TIMEOUT_SECONDS", "30")
+)
 
-with open(Path(__file__).parent.joinpath("countries_phone_codes.json"), "r") as file:
-    countries_phone_codes = json.load(file)
+# WhatsApp code sends are limited to MAX_REQUESTS_PER_HOUR per number.
+# "firestore" and "redis" (with RATE_LIMIT_REDIS_URL) enforce the limit across
+# instances; "" only per instance, which a client spreading its requests over
+# instances can get around. "firestore" needs the TTL policy of its collection
+# (python -m jobs.enable_rate_limit_ttl) or the collection grows for good
+RATE_LIMIT_SHARED_BACKEND = os.getenv("RATE_LIMIT_SHARED_BACKEND", "firestore")
+RATE_LIMIT_SHARDS = int(os.getenv("RATE_LIMIT_SHARDS", "16"))
+
+# "ttl" reloads the business data document every
+# SUPERVISOR_DIRECTORY_TTL_SECONDS; "listener" follows it with on_snapshot
+SUPERVISOR_DIRECTORY_MODE = os.getenv("SUPERVISOR_DIRECTORY_MODE", "ttl")
+SUPERVISOR_DIRECTORY_TTL_SECONDS = float(
+    os.getenv("SUPERVISOR_DIRECTORY_TTL_SECONDS", "60")
+)
 
+# Longest respondent list accepted by the bulk eligibility check; longer
+# than BULK_ELIGIBILITY_STREAM_THRESHOLD the response is streamed
+BULK_ELIGIBILITY_MAX_RESPONDENTS = int(
+    os.getenv("BULK_ELIGIBILITY_MAX_RESPONDENTS", "10000")
+)
+BULK_ELIGIBILITY_STREAM_THRESHOLD = int(
+    os.getenv("BULK_ELIGIBILITY_STREAM_THRESHOLD", "1000")
+)
+BULK_ELIGIBILITY_CHUNK_SIZE = 500
+
+WHATSAPP_TEMPLATE_NAME = "survey_verification_code"
+
+# "gcp" uses BigQuery, Firestore, Twilio and the Graph API; "local" uses the
+# in-process stand-ins from local_backends
+IDENTITY_BACKEND = os.getenv("IDENTITY_BACKEND", "gcp")
+# Build every backend client in the background once the worker serves
+BACKEND_PREWARM = os.getenv("BACKEND_PREWARM", "true") == "true"
+
+
+def log_whatsapp_send(metrics: SendMetrics):
+    logger.info(
+        f"WhatsApp send to {metrics.phone_number}: ok={metrics.ok}, "
+        f"status={metrics.status_code}, attempts={metrics.attempts}, "
+        f"latency={metrics.latency_seconds * 1000:.0f} ms"
+    )
+
+
+# Backends are created on first use, or ahead of it by `prewarm`
+client_registry = ClientRegistry()
 
-def get_country_phone_code(country_code: str):
-    return countries_phone_codes.get(country_code)
+if IDENTITY_BACKEND == "local":
+    import local_backends
 
+    local_backends.register_local_backends(client_registry)
+
+else:
+    backends.register_gcp_backends(
+        client_registry,
+        BQ_DATASET,
+        BQ_TABLE,
+        FIRESTORE_PHONE_VERIFICATION_COLLECTION,
+        on_whatsapp_send=log_whatsapp_send,
+    )
+
+respondent_backend = client_registry.lazy("respondent_backend")
+document_backend = client_registry.lazy("document_backend")
+code_store = client_registry.lazy("code_store")
+verification_sender = client_registry.lazy("verification_sender")
+whatsapp_sender = client_registry.lazy("whatsapp_sender")
 
-def transform_phone_number(country: str, phone_number: str):
-    phone_number = re.sub(r"\D", "", phone_number)
-    country_phone_code = get_country_phone_code(country)
-    # Check if the phone number already has the country code
-    if country_phone_code in phone_number[: len(country_phone_code)]:
-        country_phone_code = ""
 
-    return f"{country_phone_code}{phone_number}"
+def prewarm():
+    if BACKEND_PREWARM:
+        client_registry.prewarm()
 
 
+if ELIGIBILITY_CACHE_SHARED_TIER == "firestore":
+    eligibility_shared_tier = DocumentCacheTier(
+        document_backend, FIRESTORE_ELIGIBILITY_CACHE_COLLECTION
+    )
+elif ELIGIBILITY_CACHE_SHARED_TIER == "redis":
+    import redis
+
+    eligibility_shared_tier = RedisCacheTier(
+        redis.Redis.from_url(os.getenv("ELIGIBILITY_CACHE_REDIS_URL"))
+    )
+else:
+    eligibility_shared_tier = None
+
+eligibility_cache = EligibilityCache(
+    ELIGIBILITY_CACHE_TTL_SECONDS,
+    ELIGIBILITY_CACHE_MAX_ENTRIES,
+    shared_tier=eligibility_shared_tier,
+)
+
+if RATE_LIMIT_SHARED_BACKEND == "firestore":
+    rate_limit_shared_backend = DocumentRateLimitBackend(
+        document_backend, FIRESTORE_RATE_LIMIT_COLLECTION
+    )
+elif RATE_LIMIT_SHARED_BACKEND == "redis":
+    import redis
+
+    rate_limit_shared_backend = RedisRateLimitBackend(
+        redis.Redis.from_url(os.getenv("RATE_LIMIT_REDIS_URL"))
+    )
+else:
+    rate_limit_shared_backend = None
+
+rate_limiter = RateLimiter(
+    MAX_REQUESTS_PER_HOUR,
+    3600,
+    shards=RATE_LIMIT_SHARDS,
+    shared_backend=rate_limit_shared_backend,
+)
+
+start_verification_executor = ThreadPoolExecutor(
+    max_workers=START_VERIFICATION_WORKERS, thread_name_prefix="start-verification"
+)
+
+eligibility_lookups = SingleFlight()
+wp_code_verifications = SingleFlight()
+
+respondent_index = RespondentIndex(
+    respondent_backend, false_positive_rate=RESPONDENT_INDEX_FALSE_POSITIVE_RATE
+)
+if RESPONDENT_INDEX_ENABLED:
+    respondent_index.start(
+        RESPONDENT_INDEX_REFRESH_SECONDS, RESPONDENT_INDEX_FULL_REBUILD_EVERY
+    )
+
+verification_code_sweeper = VerificationCodeSweeper(
+    code_store, batch_size=VERIFICATION_CODE_SWEEP_BATCH_SIZE
+)
+if VERIFICATION_CODE_SWEEP_SECONDS > 0:
+    verification_code_sweeper.start(VERIFICATION_CODE_SWEEP_SECONDS)
+
+respondent_writer = None
+if RESPONDENT_WRITE_MODE == "buffered":
+    respondent_writer = BufferedRespondentWriter(
+        respondent_backend,
+        max_batch_size=RESPONDENT_WRITE_BATCH_SIZE,
+        max_delay_seconds=RESPONDENT_WRITE_MAX_DELAY_SECONDS,
+        merge_interval_seconds=RESPONDENT_WRITE_MERGE_INTERVAL_SECONDS,
+    )
+    respondent_writer.start()
+
+
+@traced("phone_numbers")
+def transform_phone_number(country: str, phone_number: str) -> str:
+    return normalize_phone(country, phone_number).international
+
+
+@traced("phone_numbers")
 def get_wp_phone_variants(country: str, phone_number: str) -> list[str]:
-    digits_only_phone = re.sub(r"\D", "", phone_number)
-    transformed_phone = transform_phone_number(country, phone_number)
+    return list(normalize_phone(country, phone_number).wp_variants)
 
-    if country.strip().upper() != "MX":
-        return [transformed_phone]
 
-    if re.fullmatch(r"521\d{10}", digits_only_phone):
-        return [digits_only_phone]
+@traced("phone_numbers")
+def get_supervisor_number_variants(phone_number: str) -> list[str]:
+    # Supervisors stored with the Mexican country code are reachable with and
+    # without the mobile prefix
+    if MEXICO_FULL_NUMBER.fullmatch(phone_number):
+        return get_wp_phone_variants("MX", phone_number[-10:])
 
-    if re.fullmatch(r"52\d{10}", digits_only_phone):
-        return [digits_only_phone]
+    return [phone_number]
 
-    variants = []
 
-    if transformed_phone.startswith(f"{MEXICO_COUNTRY_CODE}{MEXICO_MOBILE_PREFIX}"):
-        local_number = transformed_phone[
-            len(MEXICO_COUNTRY_CODE) + len(MEXICO_MOBILE_PREFIX) :
-        ]
-        variants.extend(
-            [
-                f"{MEXICO_COUNTRY_CODE}{MEXICO_MOBILE_PREFIX}{local_number}",
-                f"{MEXICO_COUNTRY_CODE}{local_number}",
-            ]
-        )
-    elif transformed_phone.startswith(MEXICO_COUNTRY_CODE):
-        local_number = transformed_phone[len(MEXICO_COUNTRY_CODE) :]
-        variants.extend(
-            [
-                f"{MEXICO_COUNTRY_CODE}{MEXICO_MOBILE_PREFIX}{local_number}",
-                f"{MEXICO_COUNTRY_CODE}{local_number}",
-            ]
-        )
-    else:
-        variants.append(transformed_phone)
+supervisor_directory = SupervisorDirectory(
+    document_backend,
+    FIRESTORE_SETTINGS_COLLECTION,
+    FIRESTORE_BUSINESS_DATA_DOCUMENT,
+    expand_number=get_supervisor_number_variants,
+)
 
-    unique_variants = []
-    for variant in variants:
-        if variant not in unique_variants:
-            unique_variants.append(variant)
 
-    return unique_variants
+def start_supervisor_directory():
+    # Started in each worker, never on import: the listener would build the
+    # Firestore client and open its stream in the gunicorn master before the
+    # fork
+    supervisor_directory.start(
+        SUPERVISOR_DIRECTORY_MODE, SUPERVISOR_DIRECTORY_TTL_SECONDS
+    )
 
 
+@traced("supervisor_directory")
 def is_active_supervisor(country: str, phone_number: str) -> bool:
-    business_data = (
-        db.collection(FIRESTORE_SETTINGS_COLLECTION)
-        .document(FIRESTORE_BUSINESS_DATA_DOCUMENT)
-        .get()
-        .to_dict()
-        or {}
+    # Entry points without a startup hook start it on first use
+    start_supervisor_directory()
+    return supervisor_directory.contains_any(
+        get_wp_phone_variants(country, phone_number)
     )
-    supervisor_numbers = {
-        re.sub(r"\D", "", str(supervisor.get("phone_number", "")))
-        for supervisor in business_data.get("field_supervisors", [])
-        if supervisor.get("active") is True
-    }
 
-    return any(
-        number in supervisor_numbers
-        for number in get_wp_phone_variants(country, phone_number)
+
+@traced("respondents")
+def get_respondent_data(phone_number: int, project_type: str):
+    # Buffered writes are only in the respondent table after the next merge.
+    # Responses older than the cooldown only matter by count, so the lookup
+    # reads the cooldown window plus a few sentinel rows
+    return respondent_backend.get_respondent_data(
+        phone_number,
+        project_type,
+        include_staged=respondent_writer is not None,
+        lookback_days=QUALIFICATION_COOLDOWN_DAYS,
     )
 
 
-def get_respondent_data(phone_number: int, project_type: str):
-    # Define your query to check for existing records
-    query = """
-        SELECT
-            response_datetime
-        FROM `{project_id}.{dataset}.{table}`
-        WHERE phone_number = @phone_number
-            AND project_type = @project_type
+def get_response_datetimes(phone_number: int, project_type: str):
+    """
+    Response datetimes of the respondent for the project type, served from the
+    eligibility cache when possible.
     """
+    if respondent_index.is_known_absent(phone_number, project_type):
+        return ()
 
-    # Define the query parameters
-    job_config = bigquery.QueryJobConfig(
-        query_parameters=[
-            bigquery.ScalarQueryParameter("phone_number", "INT64", phone_number),
-            bigquery.ScalarQueryParameter("project_type", "STRING", project_type),
-        ]
+    key = (phone_number, project_type)
+    response_datetimes = (
+        eligibility_cache.get(key) if ELIGIBILITY_CACHE_ENABLED else None
     )
+    if response_datetimes is None:
+        response_datetimes = eligibility_lookups.do(
+            key,
+            lambda: load_response_datetimes(phone_number, project_type),
+            ELIGIBILITY_LOOKUP_TIMEOUT_SECONDS,
+        )
 
-    # Execute the query
-    formatted_query = query.format(
-        project_id=os.getenv("GCP_PROJECT_ID"),
-        dataset=BQ_DATASET,
-        table=BQ_TABLE,
-    )
-    query_job = bq_client.query(formatted_query, job_config=job_config)
+    return response_datetimes
 
-    # Fetch results
-    return list(query_job.result())
 
+def load_response_datetimes(phone_number: int, project_type: str):
+    # Taken first, so a write landing during the query keeps the result out
+    # of the cache
+    token = eligibility_cache.begin_load()
+    response_datetimes = tuple(
+        result.response_datetime
+        for result in get_respondent_data(phone_number, project_type)
+    )
+    if ELIGIBILITY_CACHE_ENABLED:
+        eligibility_cache.set(
+            (phone_number, project_type), response_datetimes, token
+        )
+    return response_datetimes
 
+
+@traced("eligibility")
 def is_respondent_qualified(phone_number: int, project_type: str):
     # Fetch results
-    results = get_respondent_data(phone_number, project_type)
+    results = get_response_datetimes(phone_number, project_type)
 
     if len(results) > 1:
         return False
@@ -162,168 +358,155 @@ def is_respondent_qualified(phone_number: int, project_type: str):
     if not results:
         return True
 
-    result = results[0].response_datetime.replace(tzinfo=timezone.utc)
+    result = results[0].replace(tzinfo=timezone.utc)
 
-    if (datetime.now(timezone.utc) - result).days < 180:
+    if (datetime.now(timezone.utc) - result).days < QUALIFICATION_COOLDOWN_DAYS:
         return False
 
     return True
 
 
+def iter_qualifications(
+    phone_numbers: list[int], project_type: str
+) -> Iterator[tuple[int, bool]]:
+    candidates = []
+    for phone_number in phone_numbers:
+        if respondent_index.is_known_absent(phone_number, project_type):
+            yield phone_number, True
+        else:
+            candidates.append(phone_number)
+
+    if candidates:
+        yield from respondent_backend.iter_qualifications(
+            candidates,
+            project_type,
+            QUALIFICATION_COOLDOWN_DAYS,
+            include_staged=respondent_writer is not None,
+        )
+
+
+def check_respondents_qualified(
+    respondents: list[dict], project_type: str
+) -> Iterator[dict]:
+    """
+    Qualification of each {"country", "phone_number"} in `respondents`,
+    yielded as the query results arrive. Raises ValueError on missing phone
+    numbers or unknown countries.
+    """
+    import pandas as pd
+
+    frame = pd.DataFrame(respondents, columns=["country", "phone_number"])
+    if (
+        frame["country"].isna().any()
+        or frame["phone_number"].isna().any()
+        or frame["phone_number"].astype(str).str.strip().eq("").any()
+    ):
+        raise ValueError("Country and phone number are required for every respondent.")
+
+    normalized = normalize_phone_column(
+        frame["country"].astype(str), frame["phone_number"].astype(str)
+    )
+    transformed_phone_numbers = normalized["international"].astype("int64").tolist()
+
+    # Repeated numbers are resolved once and reported for every occurrence
+    positions = defaultdict(list)
+    for position, phone_number in enumerate(transformed_phone_numbers):
+        positions[phone_number].append(position)
+
+    for phone_number, is_qualified in iter_qualifications(
+        list(positions), project_type
+    ):
+        for position in positions[phone_number]:
+            yield {
+                "country": respondents[position]["country"],
+                "phone_number": respondents[position]["phone_number"],
+                "transformed_phone_number": phone_number,
+                "is_qualified": is_qualified,
+            }
+
+
+def iter_json_results(project_type: str, results: Iterator[dict]) -> Iterator[str]:
+    """
+    Serializes {"project_type": ..., "results": [...]} piece by piece, so a
+    large response is sent while the query results are still being read.
+    """
+    yield f'{{"project_type": {json.dumps(project_type)}, "results": ['
+    separator = ""
+    chunk = []
+    for result in results:
+        chunk.append(json.dumps(result))
+        if len(chunk) == BULK_ELIGIBILITY_CHUNK_SIZE:
+            yield separator + ", ".join(chunk)
+            separator = ", "
+            chunk = []
+    if chunk:
+        yield separator + ", ".join(chunk)
+    yield "]}"
+
+
+@traced("twilio")
 def send_code(phone_number: str):
-    return verify_service.verifications.create(to=phone_number, channel="sms")
+    return verification_sender.send_code(phone_number)
 
 
+@traced("twilio")
 def verify_code(phone_number: str, code: str):
-    return verify_service.verification_checks.create(to=phone_number, code=code)
+    return verification_sender.verify_code(phone_number, code)
 
 
+@traced("respondents")
 def write_to_bq(data: dict):
-    # Fetch results
-    results = get_respondent_data(data["phone_number"], data["project_type"])
-
-    if len(results) == 0:
-        # No record found, insert new data
-        job = bq_client.load_table_from_json(
-            [data], (f"{os.getenv('GCP_PROJECT_ID')}.{BQ_DATASET}.{BQ_TABLE}")
-        )
-        job.result()  # Wait for the job to complete
-
-    elif len(results) == 1:
-        # One record found, update the response_datetime
-        update_query = """
-            UPDATE `{project_id}.{dataset}.{table}`
-            SET response_datetime = @response_datetime
-            WHERE phone_number = @phone_number
-                AND project_type = @project_type
-        """
-        update_job_config = bigquery.QueryJobConfig(
-            query_parameters=[
-                bigquery.ScalarQueryParameter(
-                    "response_datetime", "DATETIME", datetime.now(timezone.utc)
-                ),
-                bigquery.ScalarQueryParameter(
-                    "phone_number", "INT64", data["phone_number"]
-                ),
-                bigquery.ScalarQueryParameter(
-                    "project_type", "STRING", data["project_type"]
-                ),
-            ]
-        )
-        formatted_update_query = update_query.format(
-            project_id=os.getenv("GCP_PROJECT_ID"),
-            dataset=BQ_DATASET,
-            table=BQ_TABLE,
-        )
-        update_query_job = bq_client.query(
-            formatted_update_query, job_config=update_job_config
-        )
-        update_query_job.result()  # Wait for the job to complete
+    if respondent_writer is not None:
+        # Returns once the row is stored in the staging table; the merge
+        # inserts it or updates the response_datetime
+        respondent_writer.write(data, timeout=RESPONDENT_WRITE_TIMEOUT_SECONDS)
 
     else:
-        raise ValueError(
-            "Multiple records found for the given phone number and project type"
-        )
-
-
-def store_wp_code(phone_number: str, code: int):
-    now = datetime.now(timezone.utc)
-    expires_at = now + timedelta(minutes=CODE_EXPIRY_MINUTES)
-    doc_ref = db.collection(FIRESTORE_PHONE_VERIFICATION_COLLECTION).document(
-        phone_number
-    )
+        respondent_backend.upsert_respondent(data)
 
-    @firestore.transactional
-    def transaction_operation(transaction, doc_ref):
-        snapshot = doc_ref.get(transaction=transaction)
+    eligibility_cache.invalidate((data["phone_number"], data["project_type"]))
+    respondent_index.add(data["phone_number"], data["project_type"])
 
-        if snapshot.exists:
-            data = snapshot.to_dict()
-            last_request = data.get("last_request")
-            request_count = data.get("request_count", 0)
 
-            # Reset count if more than an hour passed
-            if last_request and (now - last_request).total_seconds() > 3600:
-                request_count = 0
+def wp_code_document(code: int, now: datetime) -> dict:
+    from google.cloud import firestore
 
-            if request_count >= MAX_REQUESTS_PER_HOUR:
-                raise Exception("Rate limit exceeded")
+    return {
+        "code": code,
+        "created_at": firestore.SERVER_TIMESTAMP,
+        backends.VERIFICATION_CODE_TTL_FIELD: now
+        + timedelta(minutes=CODE_EXPIRY_MINUTES),
+    }
 
-            request_count += 1
 
-            transaction.update(
-                doc_ref,
-                {
-                    "code": code,
-                    "expires_at": expires_at,
-                    "last_request": firestore.SERVER_TIMESTAMP,
-                    "request_count": request_count,
-                },
-            )
+@traced("documents")
+def store_wp_code(phone_number: str, code: int):
+    # Rate limiting is done by `rate_limiter` before sending, so the code is
+    # a blind write that never contends with other sends to the number
+    code_store.set(phone_number, wp_code_document(code, datetime.now(timezone.utc)))
 
-        else:
-            # First time: create document
-            transaction.set(
-                doc_ref,
-                {
-                    "code": code,
-                    "created_at": firestore.SERVER_TIMESTAMP,
-                    "last_request": firestore.SERVER_TIMESTAMP,
-                    "expires_at": expires_at,
-                    "request_count": 1,
-                },
-            )
 
-    transaction = db.transaction()
+def send_wp_code(country: str, phone_number: str) -> dict:
+    key = transform_phone_number(country, phone_number)
+    rate_limiter.acquire(key)
     try:
-        transaction_operation(transaction, doc_ref)
-    except Exception as e:
-        raise e
-
+        return deliver_wp_code(get_wp_phone_variants(country, phone_number))
+    except Exception:
+        # Only delivered codes count against the limit
+        rate_limiter.release(key)
+        raise
 
-def delete_wp_codes(phone_variants: list[str]):
-    collection = db.collection(FIRESTORE_PHONE_VERIFICATION_COLLECTION)
-    for phone_number in phone_variants:
-        collection.document(phone_number).delete()
 
-
-def send_wp_code(country: str, phone_number: str) -> dict:
-    phone_variants = get_wp_phone_variants(country, phone_number)
+@traced("whatsapp")
+def deliver_wp_code(phone_variants: list[str]) -> dict:
     random_code = random.randint(1000, 9999)
     last_error = None
 
     for candidate_number in phone_variants:
-        response = requests.post(
-            f"https://graph.facebook.com/v23.0/{os.getenv('WHATSAPP_PHONE_NUMBER_ID')}/messages",
-            headers={
-                "Authorization": f"Bearer {os.getenv('WHATSAPP_ACCESS_TOKEN')}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "messaging_product": "whatsapp",
-                "to": candidate_number,
-                "type": "template",
-                "template": {
-                    "name": WHATSAPP_TEMPLATE_NAME,
-                    "language": {"code": "es_CO"},
-                    "components": [
-                        {
-                            "type": "body",
-                            "parameters": [{"type": "text", "text": str(random_code)}],
-                        },
-                        {
-                            "type": "button",
-                            "sub_type": "url",
-                            "index": "0",
-                            "parameters": [{"type": "text", "text": str(random_code)}],
-                        },
-                    ],
-                },
-            },
+        sent, response_payload = whatsapp_sender.send_template(
+            candidate_number, WHATSAPP_TEMPLATE_NAME, random_code
         )
-
-        response_payload = response.json()
-        if response.ok and "error" not in response_payload:
+        if sent:
             store_wp_code(candidate_number, random_code)
             return {
                 "response": response_payload,
@@ -339,39 +522,185 @@ def send_wp_code(country: str, phone_number: str) -> dict:
     )
 
 
+# HTTP status of each /start_verification outcome
+START_VERIFICATION_STATUS_CODES = {
+    "sent": 200,
+    "not_qualified": 403,
+    "not_supervisor": 403,
+    "rate_limited": 429,
+}
+
+
 @dataclass
-class WPCodeVerification:
-    verified: bool
+class VerificationStart:
+    # One of START_VERIFICATION_STATUS_CODES
     status: str
+    is_qualified: bool
+    is_supervisor: bool | None
+    response: dict | None
+    timings_ms: dict[str, float]
+
+
+def verification_start_status(
+    is_qualified: bool, is_supervisor: bool | None, send_allowed: bool
+) -> str:
+    if not is_qualified:
+        return "not_qualified"
+    if is_supervisor is False:
+        return "not_supervisor"
+    if not send_allowed:
+        return "rate_limited"
+    return "sent"
+
+
+def submit_in_context(function, *args) -> Future:
+    # Runs in a copy of the request context, so the call is part of its trace
+    return start_verification_executor.submit(
+        contextvars.copy_context().run, function, *args
+    )
 
 
-def verify_wp_code(country: str, phone_number: str, code: str) -> WPCodeVerification:
-    phone_variants = get_wp_phone_variants(country, phone_number)
-    now = datetime.now(timezone.utc)
-
-    for candidate_number in phone_variants:
-        doc = (
-            db.collection(FIRESTORE_PHONE_VERIFICATION_COLLECTION)
-            .document(candidate_number)
-            .get()
+def timed(timings_ms: dict[str, float], step: str, function, *args):
+    start = time.perf_counter()
+    try:
+        return function(*args)
+    finally:
+        timings_ms[step] = round((time.perf_counter() - start) * 1000, 1)
+
+
+def start_verification(
+    country: str,
+    phone_number: str,
+    project_type: str,
+    channel: str = "whatsapp",
+    supervisor: bool = False,
+) -> VerificationStart:
+    """
+    Runs the qualification check, the supervisor check and the send rate
+    limit concurrently, then sends the code over `channel` ("whatsapp" or
+    "sms") only when they all pass.
+    """
+    start = time.perf_counter()
+    timings_ms = {}
+    # Same normalization as /check_respondent_qualified, which the
+    # eligibility cache and index keys rely on
+    project_type = project_type.strip().lower()
+    international = normalize_phone(country, phone_number).international
+
+    qualification = submit_in_context(
+        timed,
+        timings_ms,
+        "qualification",
+        is_respondent_qualified,
+        int(international),
+        project_type,
+    )
+    supervisor_check = (
+        submit_in_context(
+            timed,
+            timings_ms,
+            "supervisor_check",
+            is_active_supervisor,
+            country,
+            phone_number,
+        )
+        if supervisor
+        else None
+    )
+    # Only WhatsApp sends are rate limited here; Twilio Verify limits SMS
+    rate_limit = (
+        submit_in_context(
+            timed, timings_ms, "rate_limit", rate_limiter.try_acquire, international
         )
+        if channel == "whatsapp"
+        else None
+    )
 
-        if not doc.exists:
-            continue
+    send_allowed = rate_limit.result() if rate_limit else True
+    # The slot taken concurrently is given back unless a code is delivered:
+    # when a check fails or raises, or the delivery fails
+    slot_taken = rate_limit is not None and send_allowed
+    try:
+        is_qualified = qualification.result()
+        is_supervisor = supervisor_check.result() if supervisor_check else None
+
+        status = verification_start_status(is_qualified, is_supervisor, send_allowed)
+
+        response = None
+        if status == "sent" and channel == "whatsapp":
+            response = timed(
+                timings_ms,
+                "send",
+                deliver_wp_code,
+                get_wp_phone_variants(country, phone_number),
+            )
+            slot_taken = False
+        elif status == "sent":
+            verification = timed(timings_ms, "send", send_code, f"+{international}")
+            response = {"status": verification.status}
+    finally:
+        if slot_taken:
+            rate_limiter.release(international)
+
+    timings_ms["total"] = round((time.perf_counter() - start) * 1000, 1)
+    return VerificationStart(
+        status=status,
+        is_qualified=is_qualified,
+        is_supervisor=is_supervisor,
+        response=response,
+        timings_ms=timings_ms,
+    )
+
+
+@dataclass
+class WPCodeVerification:
+    verified: bool
+    status: str
 
-        info = doc.to_dict()
-        if not info:
-            continue
 
-        if info["expires_at"] < now:
-            doc.reference.delete()
+def match_wp_code(
+    phone_variants: list[str], documents: dict[str, dict | None], code: str
+) -> str | None:
+    """
+    Returns the variant whose live code equals `code`, or None when the first
+    live code differs or there is none. The code store leaves out expired
+    codes, which the TTL policy and the sweep job delete.
+    """
+    for candidate_number in phone_variants:
+        info = documents[candidate_number]
+        if not info:
             continue
 
         if str(info["code"]) != str(code):
-            return WPCodeVerification(verified=False, status="invalid_code")
+            return None
+
+        return candidate_number
+
+    return None
+
+
+def verify_wp_code(country: str, phone_number: str, code: str) -> WPCodeVerification:
+    phone_variants = get_wp_phone_variants(country, phone_number)
+    # Double-taps and retries of the same code share one verification
+    return wp_code_verifications.do(
+        (phone_variants[0], code),
+        lambda: check_wp_code(phone_variants, code),
+        WP_CODE_VERIFICATION_TIMEOUT_SECONDS,
+    )
+
+
+@traced("documents")
+def check_wp_code(phone_variants: list[str], code: str) -> WPCodeVerification:
+    # One batch read for every variant instead of a read per variant
+    documents = code_store.get_many(phone_variants)
+    matched_number = match_wp_code(phone_variants, documents, code)
 
-        # Remove all variants so legacy phone formats cannot leave stale codes.
-        delete_wp_codes(phone_variants)
+    # Remove all variants so legacy phone formats cannot leave stale codes.
+    # The matched code must still exist, so a concurrent verification cannot
+    # use it twice.
+    if matched_number and code_store.delete_many(
+        phone_variants, must_exist=[matched_number]
+    ):
         return WPCodeVerification(verified=True, status="success")
 
     return WPCodeVerification(verified=False, status="invalid_code")
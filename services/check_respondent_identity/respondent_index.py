@@ -0,0 +1,206 @@
+"""
+Negative index of known respondents: one Bloom filter of phone numbers per
+project type. A phone number the filter has never seen definitely has no
+respondent row, so it can be answered as qualified without a query.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timezone, timedelta
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from backends import RespondentBackend
+
+logger = logging.getLogger(__name__)
+
+# Rows answered shortly before the previous refresh are read again, covering
+# writes that were still in flight when it ran
+REFRESH_OVERLAP = timedelta(minutes=5)
+# Filters are never sized below this, so project types first seen through
+# inserts do not saturate before the next full rebuild
+MIN_FILTER_ITEMS = 1024
+
+
+class BloomFilter:
+    def __init__(self, expected_items: int, false_positive_rate: float):
+        expected_items = max(expected_items, 1)
+        self.size = max(
+            int(-expected_items * math.log(false_positive_rate) / math.log(2) ** 2), 8
+        )
+        self.hash_count = max(round(self.size / expected_items * math.log(2)), 1)
+        self.bits = bytearray(self.size // 8 + 1)
+        self.count = 0
+
+    def _positions(self, item: int):
+        digest = hashlib.blake2b(item.to_bytes(8, "big", signed=True), digest_size=16)
+        value = digest.digest()
+        h1 = int.from_bytes(value[:8], "big")
+        h2 = int.from_bytes(value[8:], "big") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: int):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: int) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class RespondentIndex:
+    """
+    Bloom filters sized from the respondent table on each full rebuild and
+    kept up to date by incremental refreshes and local inserts. Until the
+    first rebuild finishes every lookup reports "maybe present".
+    """
+
+    def __init__(
+        self,
+        respondent_backend: RespondentBackend,
+        false_positive_rate: float = 0.01,
+        growth_headroom: float = 1.5,
+    ):
+        self.respondent_backend = respondent_backend
+        self.false_positive_rate = false_positive_rate
+        self.growth_headroom = growth_headroom
+        self.filters: dict[str, BloomFilter] = {}
+        self.ready = False
+        self.lock = threading.Lock()
+        # Inserts seen while a rebuild is reading the table
+        self.pending: list[tuple[str, int]] | None = None
+        self.watermark: datetime | None = None
+        self.metrics = {
+            "rebuilds": 0,
+            "rebuild_failures": 0,
+            "refreshes": 0,
+            "last_rebuild_seconds": None,
+            "last_rebuild_at": None,
+            "last_refresh_at": None,
+            "definite_misses": 0,
+            "maybe_present": 0,
+        }
+
+    def _new_filter(self, expected_items: int) -> BloomFilter:
+        return BloomFilter(
+            max(int(expected_items * self.growth_headroom), MIN_FILTER_ITEMS),
+            self.false_positive_rate,
+        )
+
+    def rebuild(self):
+        start = time.perf_counter()
+        started_at = datetime.now(timezone.utc)
+        with self.lock:
+            self.pending = []
+
+        try:
+            phone_numbers = defaultdict(list)
+            rows = self.respondent_backend.iter_phone_numbers()
+            for project_type, phone_number in rows:
+                phone_numbers[project_type].append(phone_number)
+
+            filters = {}
+            for project_type, numbers in phone_numbers.items():
+                filters[project_type] = self._new_filter(len(numbers))
+                for phone_number in numbers:
+                    filters[project_type].add(phone_number)
+
+        except Exception:
+            with self.lock:
+                self.pending = None
+                self.metrics["rebuild_failures"] += 1
+            raise
+
+        with self.lock:
+            for project_type, phone_number in self.pending:
+                if project_type not in filters:
+                    filters[project_type] = self._new_filter(1)
+                filters[project_type].add(phone_number)
+            self.pending = None
+            self.filters = filters
+            self.watermark = started_at
+            self.ready = True
+            self.metrics["rebuilds"] += 1
+            self.metrics["last_rebuild_seconds"] = round(time.perf_counter() - start, 3)
+            self.metrics["last_rebuild_at"] = started_at.isoformat()
+
+        logger.info(f"Respondent index rebuilt: {self.stats()}")
+
+    def refresh(self):
+        """Adds the rows answered since the last rebuild or refresh."""
+        if not self.ready:
+            return self.rebuild()
+
+        started_at = datetime.now(timezone.utc)
+        rows = self.respondent_backend.iter_phone_numbers(
+            since=self.watermark - REFRESH_OVERLAP
+        )
+        for project_type, phone_number in rows:
+            self.add(phone_number, project_type)
+
+        with self.lock:
+            self.watermark = started_at
+            self.metrics["refreshes"] += 1
+            self.metrics["last_refresh_at"] = started_at.isoformat()
+
+    def add(self, phone_number: int, project_type: str):
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append((project_type, phone_number))
+            if project_type not in self.filters:
+                self.filters[project_type] = self._new_filter(1)
+            self.filters[project_type].add(phone_number)
+
+    def is_known_absent(self, phone_number: int, project_type: str) -> bool:
+        """True only when the phone number definitely has no respondent row."""
+        with self.lock:
+            if not self.ready:
+                return False
+
+            bloom_filter = self.filters.get(project_type)
+            absent = bloom_filter is None or phone_number not in bloom_filter
+            self.metrics["definite_misses" if absent else "maybe_present"] += 1
+            return absent
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                **self.metrics,
+                "ready": self.ready,
+                "false_positive_rate": self.false_positive_rate,
+                "project_types": {
+                    project_type: {
+                        "items": bloom_filter.count,
+                        "bytes": len(bloom_filter.bits),
+                        "hash_count": bloom_filter.hash_count,
+                    }
+                    for project_type, bloom_filter in self.filters.items()
+                },
+            }
+
+    def start(self, refresh_seconds: float, full_rebuild_every: int):
+        """
+        Builds the index and keeps refreshing it in a daemon thread. Every
+        `full_rebuild_every` refreshes the filters are rebuilt from scratch so
+        they are resized to the table.
+        """
+
+        def run():
+            cycle = 0
+            while True:
+                try:
+                    if cycle % full_rebuild_every == 0:
+                        self.rebuild()
+                    else:
+                        self.refresh()
+                except Exception as e:
+                    logger.error(f"Respondent index refresh failed: {str(e)}")
+                cycle += 1
+                time.sleep(refresh_seconds)
+
+        threading.Thread(target=run, name="respondent-index", daemon=True).start()
@@ -0,0 +1,140 @@
+"""
+Buffered respondent writes. Rows are queued in memory and flushed in batches
+to a staging table through streaming inserts; a periodic MERGE folds the
+staging table into the respondent table.
+"""
+
+from concurrent.futures import Future
+import logging
+import random
+import threading
+import time
+import uuid
+
+from backends import RespondentBackend
+
+logger = logging.getLogger(__name__)
+
+MAX_INSERT_ATTEMPTS = 3
+
+
+class BufferedRespondentWriter:
+    """
+    `write` returns once the row's batch is stored in the staging table, so
+    an accepted row survives the instance going away. Concurrent writes share
+    one streaming insert (group commit).
+    """
+
+    def __init__(
+        self,
+        respondent_backend: RespondentBackend,
+        max_batch_size: int = 500,
+        max_delay_seconds: float = 0.2,
+        merge_interval_seconds: float = 60,
+    ):
+        self.respondent_backend = respondent_backend
+        self.max_batch_size = max_batch_size
+        self.max_delay_seconds = max_delay_seconds
+        self.merge_interval_seconds = merge_interval_seconds
+        self.queue: list[tuple[dict, str, Future, float]] = []
+        self.condition = threading.Condition()
+        self.metrics = {
+            "queued": 0,
+            "flushed_rows": 0,
+            "flushes": 0,
+            "flush_failures": 0,
+            "merges": 0,
+            "merge_failures": 0,
+            "merged_rows": 0,
+        }
+
+    def start(self):
+        self.respondent_backend.create_staging_table()
+        threading.Thread(
+            target=self._flush_loop, name="respondent-writer-flush", daemon=True
+        ).start()
+        threading.Thread(
+            target=self._merge_loop, name="respondent-writer-merge", daemon=True
+        ).start()
+
+    def submit(self, row: dict) -> Future:
+        future = Future()
+        with self.condition:
+            self.queue.append((row, str(uuid.uuid4()), future, time.monotonic()))
+            self.metrics["queued"] += 1
+            # Wake the flusher to start the batch deadline or flush a full batch
+            if len(self.queue) == 1 or len(self.queue) >= self.max_batch_size:
+                self.condition.notify()
+        return future
+
+    def write(self, row: dict, timeout: float = 30) -> None:
+        self.submit(row).result(timeout=timeout)
+
+    def _next_batch(self) -> list[tuple[dict, str, Future, float]]:
+        with self.condition:
+            while True:
+                if self.queue:
+                    oldest_age = time.monotonic() - self.queue[0][3]
+                    if (
+                        len(self.queue) >= self.max_batch_size
+                        or oldest_age >= self.max_delay_seconds
+                    ):
+                        batch = self.queue[: self.max_batch_size]
+                        del self.queue[: self.max_batch_size]
+                        return batch
+                    self.condition.wait(self.max_delay_seconds - oldest_age)
+                else:
+                    self.condition.wait()
+
+    def _insert_with_retries(self, rows: list[dict], row_ids: list[str]):
+        for attempt in range(1, MAX_INSERT_ATTEMPTS + 1):
+            try:
+                return self.respondent_backend.insert_staged_rows(rows, row_ids)
+            except Exception:
+                if attempt == MAX_INSERT_ATTEMPTS:
+                    raise
+                # Same row ids on retry, so a partially applied insert is
+                # deduplicated
+                time.sleep(0.1 * 2**attempt + random.uniform(0, 0.1))
+
+    def _flush_loop(self):
+        while True:
+            batch = self._next_batch()
+            rows = [row for row, _, _, _ in batch]
+            row_ids = [row_id for _, row_id, _, _ in batch]
+            try:
+                self._insert_with_retries(rows, row_ids)
+            except Exception as e:
+                logger.error(f"Failed to flush {len(batch)} respondent rows: {str(e)}")
+                self.metrics["flush_failures"] += 1
+                for _, _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            self.metrics["flushes"] += 1
+            self.metrics["flushed_rows"] += len(batch)
+            for _, _, future, _ in batch:
+                future.set_result(None)
+
+    def merge(self) -> int:
+        try:
+            merged_rows = self.respondent_backend.merge_staged_rows()
+        except Exception:
+            self.metrics["merge_failures"] += 1
+            raise
+
+        self.metrics["merges"] += 1
+        self.metrics["merged_rows"] += merged_rows
+        return merged_rows
+
+    def _merge_loop(self):
+        while True:
+            time.sleep(self.merge_interval_seconds)
+            try:
+                self.merge()
+            except Exception as e:
+                logger.error(f"Failed to merge staged respondent rows: {str(e)}")
+
+    def stats(self) -> dict:
+        with self.condition:
+            return {**self.metrics, "pending": len(self.queue)}
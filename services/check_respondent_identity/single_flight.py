@@ -0,0 +1,131 @@
+"""
+Request coalescing: concurrent calls for the same key share one in-flight
+backend call and its result (or exception) instead of each starting their own.
+Callers that join an in-flight call wait at most `timeout_seconds` for it.
+"""
+
+import asyncio
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import threading
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlightTimeout(Exception):
+    pass
+
+
+class SingleFlightStats:
+    def __init__(self):
+        self.requests = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def _stats(self, in_flight: int) -> dict:
+        return {
+            "requests": self.requests,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "timeouts": self.timeouts,
+            "in_flight": in_flight,
+            # Share of requests served by another request's backend call
+            "coalescing_ratio": (
+                self.coalesced / self.requests if self.requests else 0.0
+            ),
+        }
+
+
+class SingleFlight(SingleFlightStats):
+    """For request threads; the first caller of a key runs the call."""
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.calls: dict[Hashable, Future] = {}
+
+    def do(
+        self, key: Hashable, function: Callable[[], Any], timeout_seconds: float
+    ) -> Any:
+        with self.lock:
+            self.requests += 1
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = Future()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if leader:
+            try:
+                result = function()
+            except BaseException as e:
+                self._forget(key)
+                future.set_exception(e)
+                raise
+            self._forget(key)
+            future.set_result(result)
+            return result
+
+        try:
+            return future.result(timeout=timeout_seconds)
+        except FutureTimeoutError:
+            with self.lock:
+                self.timeouts += 1
+            raise SingleFlightTimeout(
+                f"Timed out after {timeout_seconds} s waiting for lookup {key}."
+            )
+
+    def _forget(self, key: Hashable):
+        # Callers arriving from now on start a new call
+        with self.lock:
+            del self.calls[key]
+
+    def stats(self) -> dict:
+        with self.lock:
+            return self._stats(len(self.calls))
+
+
+class AsyncSingleFlight(SingleFlightStats):
+    """For coroutines on one event loop; the first caller of a key awaits the call."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls: dict[Hashable, asyncio.Future] = {}
+
+    async def do(
+        self,
+        key: Hashable,
+        function: Callable[[], Awaitable[Any]],
+        timeout_seconds: float,
+    ) -> Any:
+        self.requests += 1
+        future = self.calls.get(key)
+
+        if future is None:
+            future = self.calls[key] = asyncio.get_running_loop().create_future()
+            self.executions += 1
+            try:
+                result = await function()
+            except BaseException as e:
+                del self.calls[key]
+                future.set_exception(e)
+                # Retrieved here so an unawaited failure is not logged
+                future.exception()
+                raise
+            del self.calls[key]
+            future.set_result(result)
+            return result
+
+        self.coalesced += 1
+        try:
+            # Shielded so a timed out caller does not cancel the shared call
+            return await asyncio.wait_for(asyncio.shield(future), timeout_seconds)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise SingleFlightTimeout(
+                f"Timed out after {timeout_seconds} s waiting for lookup {key}."
+            )
+
+    def stats(self) -> dict:
+        return self._stats(len(self.calls))
@@ -0,0 +1,109 @@
+"""
+In-process snapshot of the active field supervisors in the business data
+document, stored as the set of every phone number variant they can be
+reached at. Supervisor checks become set lookups without a network call.
+"""
+
+from datetime import datetime, timezone
+import logging
+import re
+import threading
+import time
+from typing import Callable, Iterable
+
+from backends import DocumentBackend
+
+logger = logging.getLogger(__name__)
+
+
+class SupervisorDirectory:
+    """
+    Kept fresh either by a document listener (Firestore `on_snapshot`) or by
+    reloading every `ttl_seconds` in a daemon thread. Until the first load the
+    document is read on demand.
+    """
+
+    def __init__(
+        self,
+        document_backend: DocumentBackend,
+        collection: str,
+        document_id: str,
+        expand_number: Callable[[str], Iterable[str]],
+    ):
+        self.document_backend = document_backend
+        self.collection = collection
+        self.document_id = document_id
+        # Maps a stored supervisor number to the variants it matches
+        self.expand_number = expand_number
+        self.numbers: frozenset[str] | None = None
+        self.lock = threading.Lock()
+        self.started = False
+        self.metrics = {
+            "loads": 0,
+            "load_failures": 0,
+            "last_loaded_at": None,
+        }
+
+    def update(self, business_data: dict | None):
+        numbers = set()
+        for supervisor in (business_data or {}).get("field_supervisors", []):
+            if supervisor.get("active") is not True:
+                continue
+            phone_number = re.sub(r"\D", "", str(supervisor.get("phone_number", "")))
+            if phone_number:
+                numbers.add(phone_number)
+                numbers.update(self.expand_number(phone_number))
+
+        with self.lock:
+            self.numbers = frozenset(numbers)
+            self.metrics["loads"] += 1
+            self.metrics["last_loaded_at"] = datetime.now(timezone.utc).isoformat()
+
+    def load(self):
+        try:
+            business_data = self.document_backend.get(
+                self.collection, self.document_id
+            )
+        except Exception:
+            with self.lock:
+                self.metrics["load_failures"] += 1
+            raise
+
+        self.update(business_data)
+
+    def contains_any(self, phone_numbers: Iterable[str]) -> bool:
+        numbers = self.numbers
+        if numbers is None:
+            self.load()
+            numbers = self.numbers
+
+        return any(phone_number in numbers for phone_number in phone_numbers)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                **self.metrics,
+                "numbers": len(self.numbers) if self.numbers is not None else None,
+            }
+
+    def start(self, mode: str, ttl_seconds: float):
+        """`mode` is "listener" or "ttl". Only the first call starts anything."""
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+
+        if mode == "listener":
+            self.document_backend.watch(self.collection, self.document_id, self.update)
+            return
+
+        def run():
+            while True:
+                try:
+                    self.load()
+                except Exception as e:
+                    # The previous snapshot keeps being served
+                    logger.error(f"Supervisor directory refresh failed: {str(e)}")
+                time.sleep(ttl_seconds)
+
+        threading.Thread(target=run, name="supervisor-directory", daemon=True).start()
@@ -0,0 +1,395 @@
+"""
+Request telemetry: latency histograms, error counters and in-flight gauges per
+route and per backend call, rendered in the Prometheus text format for
+/metrics, plus a trace per request. The trace carries the request id into the
+log lines of the request and collects its backend calls, which are logged
+with the request once it finishes.
+
+Metrics live in the process; with several gunicorn workers each one exposes
+its own.
+"""
+
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from typing import Callable
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, from memoized phone normalization to Twilio retries
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# Routes measured but not logged on every request
+UNLOGGED_ROUTES = {"/check_health", "/metrics"}
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.lock = threading.Lock()
+        self.values: dict[tuple[str, ...], float] = {}
+        METRICS.append(self)
+
+    def label_text(self, labels: tuple[str, ...], *extra: tuple[str, str]) -> str:
+        pairs = list(zip(self.label_names, labels)) + list(extra)
+        if not pairs:
+            return ""
+        return (
+            "{"
+            + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in pairs)
+            + "}"
+        )
+
+    def samples(self) -> list[str]:
+        with self.lock:
+            values = dict(self.values)
+        return [
+            f"{self.name}{self.label_text(labels)} {value}"
+            for labels, value in values.items()
+        ]
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self.samples(),
+        ]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, labels: tuple[str, ...], amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, labels: tuple[str, ...]):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + 1
+
+    def dec(self, labels: tuple[str, ...]):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) - 1
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...],
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = buckets
+        # Per label set: observations per bucket (the last one is +Inf) and sum
+        self.counts: dict[tuple[str, ...], list[int]] = {}
+        self.sums: dict[tuple[str, ...], float] = {}
+
+    def observe(self, labels: tuple[str, ...], value: float):
+        index = len(self.buckets)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = position
+                break
+        with self.lock:
+            counts = self.counts.get(labels)
+            if counts is None:
+                counts = self.counts[labels] = [0] * (len(self.buckets) + 1)
+                self.sums[labels] = 0.0
+            counts[index] += 1
+            self.sums[labels] += value
+
+    def samples(self) -> list[str]:
+        with self.lock:
+            counts = {labels: list(values) for labels, values in self.counts.items()}
+            sums = dict(self.sums)
+
+        lines = []
+        for labels, bucket_counts in counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(
+                    f"{self.name}_bucket{self.label_text(labels, ('le', le))} "
+                    f"{cumulative}"
+                )
+            lines.append(f"{self.name}_sum{self.label_text(labels)} {sums[labels]}")
+            lines.append(f"{self.name}_count{self.label_text(labels)} {cumulative}")
+        return lines
+
+
+METRICS: list[Metric] = []
+
+request_latency = Histogram(
+    "http_request_duration_seconds",
+    "Time to answer a request, by route template.",
+    ("method", "route", "status"),
+)
+request_errors = Counter(
+    "http_request_errors_total",
+    "Requests answered with a 5xx status or an unhandled exception.",
+    ("method", "route", "status"),
+)
+requests_in_flight = Gauge(
+    "http_requests_in_flight",
+    "Requests being answered.",
+    ("method", "route"),
+)
+backend_latency = Histogram(
+    "backend_call_duration_seconds",
+    "Time spent in a traced backend call.",
+    ("backend", "operation"),
+)
+backend_errors = Counter(
+    "backend_call_errors_total",
+    "Traced backend calls that raised, by exception type.",
+    ("backend", "operation", "error"),
+)
+backend_in_flight = Gauge(
+    "backend_calls_in_flight",
+    "Traced backend calls running.",
+    ("backend", "operation"),
+)
+
+
+def render() -> str:
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+
+@dataclass
+class Trace:
+    request_id: str
+    # Cloud Trace id from X-Cloud-Trace-Context, to group the request logs
+    cloud_trace_id: str | None = None
+    spans: list[dict] = field(default_factory=list)
+
+
+# Contexts are copied into executor threads and asyncio tasks, so the backend
+# calls made on behalf of a request find its trace
+current_trace: ContextVar[Trace | None] = ContextVar("current_trace", default=None)
+
+
+def start_trace(headers) -> Trace:
+    cloud_trace_id = None
+    cloud_trace_context = headers.get("X-Cloud-Trace-Context")
+    if cloud_trace_context:
+        cloud_trace_id = cloud_trace_context.split("/", 1)[0]
+
+    request_id = headers.get("X-Request-Id", "")
+    if not request_id or len(request_id) > 128 or not request_id.isprintable():
+        request_id = cloud_trace_id or uuid.uuid4().hex
+
+    trace = Trace(request_id=request_id, cloud_trace_id=cloud_trace_id)
+    current_trace.set(trace)
+    return trace
+
+
+def cloud_trace_resource(trace: Trace) -> str | None:
+    project_id = os.getenv("GCP_PROJECT_ID")
+    if trace.cloud_trace_id is None or not project_id:
+        return None
+    return f"projects/{project_id}/traces/{trace.cloud_trace_id}"
+
+
+class BackendCall:
+    """Measures a backend call and records it as a span of the current trace."""
+
+    def __init__(self, backend: str, operation: str):
+        self.labels = (backend, operation)
+
+    def __enter__(self):
+        backend_in_flight.inc(self.labels)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = time.perf_counter() - self.start
+        backend_in_flight.dec(self.labels)
+        backend_latency.observe(self.labels, duration)
+        if exc_type is not None:
+            backend_errors.inc(self.labels + (exc_type.__name__,))
+
+        trace = current_trace.get()
+        if trace is not None:
+            span = {
+                "backend": self.labels[0],
+                "operation": self.labels[1],
+                "duration_ms": round(duration * 1000, 3),
+            }
+            if exc_type is not None:
+                span["error"] = exc_type.__name__
+            trace.spans.append(span)
+        return False
+
+
+def traced(backend: str, operation: str | None = None) -> Callable:
+    """Decorator recording each call of the function as a `backend` call."""
+
+    def decorator(function: Callable) -> Callable:
+        name = operation or function.__name__
+
+        if inspect.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with BackendCall(backend, name):
+                    return await function(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with BackendCall(backend, name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def finish_request(
+    trace: Trace,
+    method: str,
+    route: str,
+    path: str,
+    status: int,
+    duration: float,
+    error: BaseException | None = None,
+):
+    labels = (method, route, str(status))
+    request_latency.observe(labels, duration)
+    if status >= 500 or error is not None:
+        request_errors.inc(labels)
+
+    if route in UNLOGGED_ROUTES:
+        return
+    logger.info(
+        f"{method} {path} {status} in {duration * 1000:.1f} ms",
+        extra={
+            "fields": {
+                "http": {
+                    "method": method,
+                    "route": route,
+                    "path": path,
+                    "status": status,
+                    "duration_ms": round(duration * 1000, 3),
+                },
+                "spans": trace.spans,
+                **({"error": repr(error)} if error is not None else {}),
+            }
+        },
+    )
+
+
+def instrument_flask(app):
+    from flask import g, request
+
+    @app.before_request
+    def start_request_trace():
+        g.trace = start_trace(request.headers)
+        g.route = request.url_rule.rule if request.url_rule else "unmatched"
+        g.status = 500
+        g.start = time.perf_counter()
+        requests_in_flight.inc((request.method, g.route))
+
+    @app.after_request
+    def add_request_id(response):
+        if "trace" in g:
+            response.headers["X-Request-Id"] = g.trace.request_id
+            g.status = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_request_trace(error):
+        if "trace" not in g:
+            return
+        requests_in_flight.dec((request.method, g.route))
+        finish_request(
+            g.trace,
+            request.method,
+            g.route,
+            request.path,
+            g.status,
+            time.perf_counter() - g.start,
+            error,
+        )
+        current_trace.set(None)
+
+
+def instrument_asgi(app):
+    from starlette.routing import Match
+
+    def route_template(scope) -> str:
+        for route in app.router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "unmatched"
+
+    @app.middleware("http")
+    async def trace_requests(request, call_next):
+        trace = start_trace(request.headers)
+        route = route_template(request.scope)
+        labels = (request.method, route)
+        requests_in_flight.inc(labels)
+        start = time.perf_counter()
+        status = 500
+        error = None
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            response.headers["X-Request-Id"] = trace.request_id
+            return response
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            requests_in_flight.dec(labels)
+            finish_request(
+                trace,
+                request.method,
+                route,
+                request.url.path,
+                status,
+                time.perf_counter() - start,
+                error,
+            )
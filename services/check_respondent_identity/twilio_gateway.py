@@ -0,0 +1,344 @@
+"""
+Twilio Verify clients. One keep-alive session is shared by all requests, so
+sends and checks reuse pooled TLS connections, and every call has explicit
+timeouts and a deadline for its retries.
+
+A circuit breaker counts failed attempts (connection errors, timeouts and
+retryable statuses, but not Verify rate limits on a number); once it opens,
+calls fail with CircuitOpen without reaching Twilio, so a degraded Twilio
+cannot tie up every request thread.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+from circuit_breaker import CircuitBreaker
+
+VERIFY_API_URL = "https://verify.twilio.com/v2"
+# Responses worth retrying; any other error is Twilio's final answer
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Time for a whole send or check, retries included; read timeouts of later
+# attempts are cut to what is left of it
+TWILIO_DEADLINE_SECONDS = float(os.getenv("TWILIO_DEADLINE_SECONDS", "8"))
+TWILIO_CONNECT_TIMEOUT_SECONDS = float(
+    os.getenv("TWILIO_CONNECT_TIMEOUT_SECONDS", "3.05")
+)
+TWILIO_READ_TIMEOUT_SECONDS = float(os.getenv("TWILIO_READ_TIMEOUT_SECONDS", "5"))
+# Consecutive failed attempts that open the circuit, and how long it stays
+# open before a trial call
+TWILIO_CIRCUIT_FAILURE_THRESHOLD = int(
+    os.getenv("TWILIO_CIRCUIT_FAILURE_THRESHOLD", "5")
+)
+TWILIO_CIRCUIT_RESET_SECONDS = float(os.getenv("TWILIO_CIRCUIT_RESET_SECONDS", "30"))
+
+
+class TwilioRequestError(Exception):
+    def __init__(self, status_code: int, payload: dict):
+        self.status_code = status_code
+        self.code = payload.get("code")
+        super().__init__(
+            f"HTTP {status_code} error: {payload.get('message', 'Unknown error')}"
+        )
+
+
+def parse_response(status_code: int, text: str, json_loader) -> dict:
+    try:
+        payload = json_loader()
+    except ValueError:
+        payload = {"message": text}
+    if not 200 <= status_code < 300:
+        raise TwilioRequestError(status_code, payload)
+    return payload
+
+
+def is_retryable(status_code: int, json_loader) -> bool:
+    if status_code not in RETRYABLE_STATUS_CODES:
+        return False
+    if status_code != 429:
+        return True
+    # 602xx codes (60202 max check attempts, 60203 max send attempts, ...)
+    # are Verify limits on the number, not Twilio being overloaded
+    try:
+        code = json_loader().get("code")
+    except (ValueError, AttributeError):
+        return True
+    return not (isinstance(code, int) and 60200 <= code < 60300)
+
+
+def failed_to_connect(error: requests.ConnectionError) -> bool:
+    """
+    True when the connection could not be opened, so the request never
+    reached Twilio. Resets and aborts after sending are ConnectionErrors too.
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, (ConnectTimeoutError, NewConnectionError))
+
+
+def retry_after_seconds(headers) -> float:
+    try:
+        return float(headers.get("Retry-After", 0))
+    except ValueError:
+        return 0
+
+
+def client_settings_from_env() -> dict:
+    """Keyword arguments of the Verify clients, read from the environment."""
+    service_sid = os.getenv("TWILIO_SERVICE_SID")
+    if not service_sid:
+        raise ValueError("Missing TWILIO_SERVICE_SID environment variable")
+
+    return {
+        "account_sid": os.getenv("TWILIO_ACCOUNT_SID"),
+        "auth_token": os.getenv("TWILIO_AUTH_TOKEN"),
+        "service_sid": service_sid,
+        "connect_timeout": TWILIO_CONNECT_TIMEOUT_SECONDS,
+        "read_timeout": TWILIO_READ_TIMEOUT_SECONDS,
+        "deadline_seconds": TWILIO_DEADLINE_SECONDS,
+        "breaker": CircuitBreaker(
+            "Twilio Verify",
+            failure_threshold=TWILIO_CIRCUIT_FAILURE_THRESHOLD,
+            reset_seconds=TWILIO_CIRCUIT_RESET_SECONDS,
+        ),
+    }
+
+
+class BaseTwilioVerifyClient:
+    """
+    Connection errors and retryable statuses are retried with jittered
+    exponential backoff while the next attempt can start before
+    `deadline_seconds` have passed since the call started. Read timeouts are
+    not retried: the SMS may already have been sent or the check counted.
+    """
+
+    def __init__(
+        self,
+        account_sid: str,
+        auth_token: str,
+        service_sid: str,
+        pool_size: int = 10,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 5,
+        deadline_seconds: float = 8,
+        backoff_seconds: float = 0.25,
+        breaker: CircuitBreaker | None = None,
+    ):
+        self.auth = (account_sid, auth_token)
+        self.service_url = f"{VERIFY_API_URL}/Services/{service_sid}"
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.deadline_seconds = deadline_seconds
+        self.backoff_seconds = backoff_seconds
+        self.breaker = breaker or CircuitBreaker("Twilio Verify")
+
+        self.lock = threading.Lock()
+        self.metrics = {
+            "calls": 0,
+            "failed_calls": 0,
+            "retries": 0,
+            "total_latency_seconds": 0.0,
+            "max_latency_seconds": 0.0,
+        }
+
+    def _read_timeout(self, deadline: float) -> float:
+        return max(min(self.read_timeout, deadline - time.monotonic()), 0.1)
+
+    def _retry_delay(
+        self, attempt: int, deadline: float, retry_after: float = 0
+    ) -> float | None:
+        """Seconds to wait before the next attempt, or None past the deadline."""
+        delay = max(
+            random.uniform(0, self.backoff_seconds * 2 ** (attempt - 1)), retry_after
+        )
+        if time.monotonic() + delay + self.connect_timeout >= deadline:
+            return None
+        with self.lock:
+            self.metrics["retries"] += 1
+        return delay
+
+    def _record(self, ok: bool, latency_seconds: float):
+        with self.lock:
+            self.metrics["calls"] += 1
+            self.metrics["failed_calls"] += not ok
+            self.metrics["total_latency_seconds"] += latency_seconds
+            self.metrics["max_latency_seconds"] = max(
+                self.metrics["max_latency_seconds"], latency_seconds
+            )
+
+    def stats(self) -> dict:
+        with self.lock:
+            metrics = dict(self.metrics)
+        return {**metrics, "circuit": self.breaker.stats()}
+
+
+class TwilioVerifyClient(BaseTwilioVerifyClient):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.session = requests.Session()
+        self.session.auth = self.auth
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        self.session.mount("https://", adapter)
+
+    def _post_until_deadline(self, path: str, data: dict, deadline: float) -> dict:
+        attempt = 1
+        while True:
+            self.breaker.before_call()
+            try:
+                response = self.session.post(
+                    f"{self.service_url}/{path}",
+                    data=data,
+                    timeout=(self.connect_timeout, self._read_timeout(deadline)),
+                )
+            # Only failures to connect are retried, like the async client: the
+            # code may already have been sent or the check counted otherwise
+            except requests.ConnectionError as e:
+                self.breaker.record_failure()
+                delay = (
+                    self._retry_delay(attempt, deadline)
+                    if failed_to_connect(e)
+                    else None
+                )
+                if delay is None:
+                    raise
+            except requests.RequestException:
+                self.breaker.record_failure()
+                raise
+            except BaseException:
+                # Cancelled or interrupted: no verdict on Twilio's health
+                self.breaker.release_trial()
+                raise
+            else:
+                if not is_retryable(response.status_code, response.json):
+                    self.breaker.record_success()
+                    return parse_response(
+                        response.status_code, response.text, response.json
+                    )
+                self.breaker.record_failure()
+                delay = self._retry_delay(
+                    attempt, deadline, retry_after_seconds(response.headers)
+                )
+                if delay is None:
+                    return parse_response(
+                        response.status_code, response.text, response.json
+                    )
+
+            time.sleep(delay)
+            attempt += 1
+
+    def _post(self, path: str, data: dict) -> dict:
+        start = time.monotonic()
+        ok = False
+        try:
+            payload = self._post_until_deadline(
+                path, data, start + self.deadline_seconds
+            )
+            ok = True
+            return payload
+        finally:
+            self._record(ok, time.monotonic() - start)
+
+    def send_code(self, phone_number: str, channel: str = "sms") -> dict:
+        return self._post("Verifications", {"To": phone_number, "Channel": channel})
+
+    def verify_code(self, phone_number: str, code: str) -> dict:
+        return self._post("VerificationCheck", {"To": phone_number, "Code": code})
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncTwilioVerifyClient(BaseTwilioVerifyClient):
+    """
+    httpx counterpart of `TwilioVerifyClient` for the ASGI service; waits
+    between attempts free the event loop instead of a thread.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.client = httpx.AsyncClient(
+            auth=self.auth,
+            limits=httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_size,
+            ),
+        )
+
+    async def _post_until_deadline(
+        self, path: str, data: dict, deadline: float
+    ) -> dict:
+        attempt = 1
+        while True:
+            self.breaker.before_call()
+            try:
+                response = await self.client.post(
+                    f"{self.service_url}/{path}",
+                    data=data,
+                    timeout=httpx.Timeout(
+                        self._read_timeout(deadline), connect=self.connect_timeout
+                    ),
+                )
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                self.breaker.record_failure()
+                delay = self._retry_delay(attempt, deadline)
+                if delay is None:
+                    raise
+            except httpx.HTTPError:
+                self.breaker.record_failure()
+                raise
+            except BaseException:
+                # Cancelled or interrupted: no verdict on Twilio's health
+                self.breaker.release_trial()
+                raise
+            else:
+                if not is_retryable(response.status_code, response.json):
+                    self.breaker.record_success()
+                    return parse_response(
+                        response.status_code, response.text, response.json
+                    )
+                self.breaker.record_failure()
+                delay = self._retry_delay(
+                    attempt, deadline, retry_after_seconds(response.headers)
+                )
+                if delay is None:
+                    return parse_response(
+                        response.status_code, response.text, response.json
+                    )
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _post(self, path: str, data: dict) -> dict:
+        start = time.monotonic()
+        ok = False
+        try:
+            payload = await self._post_until_deadline(
+                path, data, start + self.deadline_seconds
+            )
+            ok = True
+            return payload
+        finally:
+            self._record(ok, time.monotonic() - start)
+
+    async def send_code(self, phone_number: str, channel: str = "sms") -> dict:
+        return await self._post(
+            "Verifications", {"To": phone_number, "Channel": channel}
+        )
+
+    async def verify_code(self, phone_number: str, code: str) -> dict:
+        return await self._post(
+            "VerificationCheck", {"To": phone_number, "Code": code}
+        )
+
+    async def close(self):
+        await self.client.aclose()
@@ -0,0 +1,262 @@
+"""
+Graph API clients for WhatsApp template messages. One keep-alive session is
+shared by all requests, so sends reuse pooled TLS connections instead of
+opening one per code.
+"""
+
+from dataclasses import dataclass
+import logging
+import random
+import threading
+import time
+from typing import Callable
+
+import asyncio
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+logger = logging.getLogger(__name__)
+
+GRAPH_API_URL = "https://graph.facebook.com/v23.0"
+# Responses worth retrying; any other error is the Graph API's final answer
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+@dataclass
+class SendMetrics:
+    phone_number: str
+    ok: bool
+    status_code: int | None
+    attempts: int
+    latency_seconds: float
+
+
+def failed_to_connect(error: requests.ConnectionError) -> bool:
+    """
+    True when the connection could not be opened, so the request never
+    reached the Graph API. Resets and aborts after sending are
+    ConnectionErrors too.
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, (ConnectTimeoutError, NewConnectionError))
+
+
+def template_message(template_name: str, code: int) -> dict:
+    return {
+        "messaging_product": "whatsapp",
+        "type": "template",
+        "template": {
+            "name": template_name,
+            "language": {"code": "es_CO"},
+            "components": [
+                {
+                    "type": "body",
+                    "parameters": [{"type": "text", "text": str(code)}],
+                },
+                {
+                    "type": "button",
+                    "sub_type": "url",
+                    "index": "0",
+                    "parameters": [{"type": "text", "text": str(code)}],
+                },
+            ],
+        },
+    }
+
+
+def parse_response(status_code: int, text: str, json_loader) -> tuple[bool, dict]:
+    try:
+        response_payload = json_loader()
+    except ValueError:
+        response_payload = {"error": {"message": text}}
+    ok = 200 <= status_code < 300 and "error" not in response_payload
+    return ok, response_payload
+
+
+class BaseWhatsAppClient:
+    """
+    Connection errors and retryable statuses are retried with jittered
+    exponential backoff. Read timeouts are not retried: the message may
+    already have been delivered.
+    """
+
+    def __init__(
+        self,
+        phone_number_id: str,
+        access_token: str,
+        pool_size: int = 10,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 10,
+        max_attempts: int = 3,
+        backoff_seconds: float = 0.25,
+        on_send: Callable[[SendMetrics], None] | None = None,
+    ):
+        self.url = f"{GRAPH_API_URL}/{phone_number_id}/messages"
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.on_send = on_send
+        self.pool_size = pool_size
+        self.headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json",
+        }
+
+        self.lock = threading.Lock()
+        self.metrics = {
+            "sends": 0,
+            "failed_sends": 0,
+            "retries": 0,
+            "total_latency_seconds": 0.0,
+            "max_latency_seconds": 0.0,
+        }
+
+    def _backoff_delay(self, attempt: int) -> float:
+        with self.lock:
+            self.metrics["retries"] += 1
+        return random.uniform(0, self.backoff_seconds * 2 ** (attempt - 1))
+
+    def _record(self, metrics: SendMetrics):
+        with self.lock:
+            self.metrics["sends"] += 1
+            self.metrics["failed_sends"] += not metrics.ok
+            self.metrics["total_latency_seconds"] += metrics.latency_seconds
+            self.metrics["max_latency_seconds"] = max(
+                self.metrics["max_latency_seconds"], metrics.latency_seconds
+            )
+
+        if self.on_send is not None:
+            try:
+                self.on_send(metrics)
+            except Exception as e:
+                logger.warning(f"WhatsApp send metrics hook failed: {str(e)}")
+
+    def stats(self) -> dict:
+        with self.lock:
+            return dict(self.metrics)
+
+
+class WhatsAppClient(BaseWhatsAppClient):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        self.session.mount("https://", adapter)
+
+    def _post(self, payload: dict) -> tuple[requests.Response, int]:
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                response = self.session.post(
+                    self.url, json=payload, timeout=self.timeout
+                )
+            # Only failures to connect are retried, like the async client: the
+            # message may already have been sent otherwise
+            except requests.ConnectionError as e:
+                if not failed_to_connect(e) or attempt == self.max_attempts:
+                    raise
+            else:
+                if (
+                    response.status_code not in RETRYABLE_STATUS_CODES
+                    or attempt == self.max_attempts
+                ):
+                    return response, attempt
+
+            time.sleep(self._backoff_delay(attempt))
+
+    def send_message(self, phone_number: str, payload: dict) -> tuple[bool, dict]:
+        start = time.perf_counter()
+        response = None
+        attempts = self.max_attempts
+        ok = False
+        try:
+            response, attempts = self._post({**payload, "to": phone_number})
+            ok, response_payload = parse_response(
+                response.status_code, response.text, response.json
+            )
+            return ok, response_payload
+
+        except requests.RequestException as e:
+            return False, {"error": {"message": str(e)}}
+
+        finally:
+            self._record(
+                SendMetrics(
+                    phone_number=phone_number,
+                    ok=ok,
+                    status_code=response.status_code if response is not None else None,
+                    attempts=attempts,
+                    latency_seconds=time.perf_counter() - start,
+                )
+            )
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncWhatsAppClient(BaseWhatsAppClient):
+    """httpx counterpart of `WhatsAppClient` for the ASGI service."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        connect_timeout, read_timeout = self.timeout
+        self.client = httpx.AsyncClient(
+            headers=self.headers,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_size,
+            ),
+        )
+
+    async def _post(self, payload: dict) -> tuple[httpx.Response, int]:
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                response = await self.client.post(self.url, json=payload)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                if attempt == self.max_attempts:
+                    raise
+            else:
+                if (
+                    response.status_code not in RETRYABLE_STATUS_CODES
+                    or attempt == self.max_attempts
+                ):
+                    return response, attempt
+
+            await asyncio.sleep(self._backoff_delay(attempt))
+
+    async def send_message(
+        self, phone_number: str, payload: dict
+    ) -> tuple[bool, dict]:
+        start = time.perf_counter()
+        response = None
+        attempts = self.max_attempts
+        ok = False
+        try:
+            response, attempts = await self._post({**payload, "to": phone_number})
+            ok, response_payload = parse_response(
+                response.status_code, response.text, response.json
+            )
+            return ok, response_payload
+
+        except httpx.HTTPError as e:
+            return False, {"error": {"message": str(e)}}
+
+        finally:
+            self._record(
+                SendMetrics(
+                    phone_number=phone_number,
+                    ok=ok,
+                    status_code=response.status_code if response is not None else None,
+                    attempts=attempts,
+                    latency_seconds=time.perf_counter() - start,
+                )
+            )
+
+    async def close(self):
+        await self.client.aclose()
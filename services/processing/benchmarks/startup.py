@@ -0,0 +1,98 @@
+"""
+Measures the cold start of the processing service: time until `/check_health`
+answers and time until the first file is processed by `/statistical_processing`.
+
+Usage (from services/processing):
+    python benchmarks/startup.py path/to/sample.xlsx
+    python benchmarks/startup.py path/to/sample.xlsx --command "python main.py"
+"""
+
+import argparse
+import os
+import shlex
+import subprocess
+import sys
+import time
+import uuid
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+SERVICE_FOLDER = Path(__file__).parent.parent
+DEFAULT_COMMAND = "gunicorn main:app --config gunicorn.conf.py"
+
+
+def wait_until_healthy(
+    base_url: str, process: subprocess.Popen, timeout: float
+) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Service exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(f"{base_url}/check_health", timeout=1) as r:
+                if r.status == 200:
+                    return
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.05)
+
+    raise TimeoutError(f"Service did not become healthy in {timeout} seconds")
+
+
+def post_file(base_url: str, xlsx_file: Path) -> int:
+    boundary = uuid.uuid4().hex
+    body = (
+        (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{xlsx_file.name}"'
+            "\r\nContent-Type: application/vnd.openxmlformats-officedocument."
+            "spreadsheetml.sheet\r\n\r\n"
+        ).encode()
+        + xlsx_file.read_bytes()
+        + f"\r\n--{boundary}--\r\n".encode()
+    )
+    request = urllib.request.Request(
+        f"{base_url}/statistical_processing",
+        data=body,
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=600) as response:
+        response.read()
+        return response.status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("xlsx_file", type=Path)
+    parser.add_argument("--command", default=DEFAULT_COMMAND)
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    env = {**os.environ, "PORT": str(args.port)}
+
+    start = time.perf_counter()
+    process = subprocess.Popen(shlex.split(args.command), cwd=SERVICE_FOLDER, env=env)
+    try:
+        wait_until_healthy(base_url, process, args.timeout)
+        healthy_at = time.perf_counter() - start
+
+        status_code = post_file(base_url, args.xlsx_file.resolve())
+        processed_at = time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    print(f"command: {args.command}")
+    print(f"time to first healthy /check_health: {healthy_at:.3f}s")
+    print(
+        f"time to first processed file: {processed_at:.3f}s "
+        f"(status {status_code}, {processed_at - healthy_at:.3f}s after healthy)"
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
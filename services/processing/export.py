@@ -0,0 +1,96 @@
+from typing import IO
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+SIGNIFICANCE_RESULTS_SCHEMA = pa.schema(
+    [
+        pa.field("sheet", pa.string(), nullable=False),
+        pa.field("kind", pa.string(), nullable=False),
+        pa.field("question", pa.string()),
+        pa.field("answer", pa.string()),
+        pa.field("banner_column", pa.string(), nullable=False),
+        pa.field("banner_letter", pa.string()),
+        pa.field("count", pa.float64()),
+        pa.field("base", pa.float64()),
+        pa.field("percent", pa.float64()),
+        pa.field("significant_over", pa.list_(pa.string())),
+        pa.field("value", pa.float64()),
+    ]
+)
+
+SIGNIFICANCE_KIND = "significance"
+PENALTY_KIND = "penalty"
+
+
+def _to_float(value) -> float | None:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if np.isnan(value) else value
+
+
+def _to_label(value) -> str | None:
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def significance_rows(sheet_name: str, records: list[dict]) -> list[dict]:
+    """
+    Turns the records collected by `DataProcessor.process_statistical_significance`
+    into rows matching `SIGNIFICANCE_RESULTS_SCHEMA`.
+    """
+    return [
+        {
+            "sheet": sheet_name,
+            "kind": SIGNIFICANCE_KIND,
+            "question": _to_label(record["question"]),
+            "answer": _to_label(record["answer"]),
+            "banner_column": str(record["banner_column"]),
+            "banner_letter": record["banner_letter"],
+            "count": _to_float(record["count"]),
+            "base": _to_float(record["base"]),
+            "percent": _to_float(record["percent"]),
+            "significant_over": [
+                letter for letter in record["significant_over"].split(",") if letter
+            ],
+            "value": None,
+        }
+        for record in records
+    ]
+
+
+def penalty_rows(sheet_name: str, result_df: pd.DataFrame) -> list[dict]:
+    """
+    Melts the output of `DataProcessor.process_penalty_data` into one row per
+    (question, grouped variable metric, sample).
+    """
+    samples = result_df.columns[2:]
+    return [
+        {
+            "sheet": sheet_name,
+            "kind": PENALTY_KIND,
+            "question": _to_label(row["question"]),
+            "answer": _to_label(row["grouped_variable"]),
+            "banner_column": str(sample),
+            "banner_letter": None,
+            "count": None,
+            "base": None,
+            "percent": None,
+            "significant_over": [],
+            "value": _to_float(row[sample]),
+        }
+        for _, row in result_df.iterrows()
+        for sample in samples
+    ]
+
+
+def write_parquet(rows: list[dict], destination: str | IO[bytes]):
+    table = pa.Table.from_pylist(rows, schema=SIGNIFICANCE_RESULTS_SCHEMA)
+    pq.write_table(table, destination, compression="snappy")
@@ -0,0 +1,22 @@
+import os
+import multiprocessing
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "300"))
+
+# Import the app (pandas, numpy, openpyxl) once in the parent process so the
+# forked workers share those pages instead of importing them again.
+preload_app = True
+
+PRELOAD_ZTEST_ENGINE = os.getenv("PRELOAD_ZTEST_ENGINE", "false").lower() == "true"
+
+
+def when_ready(server):
+    # Runs in the parent after the app is preloaded and before workers fork.
+    if PRELOAD_ZTEST_ENGINE:
+        import resources
+
+        resources.load_ztest_engine()
+        server.log.info("Preloaded statsmodels z-test engine.")
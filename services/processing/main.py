@@ -1,11 +1,11 @@
 import os
-import shutil
 import logging
-import tempfile
+from typing import Literal
 
 import uvicorn
-from fastapi import FastAPI, status, Request
+from fastapi import FastAPI, UploadFile, File, status, Request
 from fastapi.exceptions import HTTPException
+from fastapi.responses import StreamingResponse
 
 from logger import setup_logging
 from event import eventarc_file_downloader
@@ -16,6 +16,12 @@ setup_logging()
 
 logger = logging.getLogger(__name__)
 
+STREAM_CHUNK_SIZE = 64 * 1024
+OUTPUT_MEDIA_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+}
+
 # Initialize API
 app = FastAPI()
 
@@ -47,7 +53,10 @@ def get_from_storage(
 
 
 @app.post("/statistical_processing", tags=["Processing"])
-def statistical_processing(file):
+def statistical_processing(
+    file: UploadFile = File(...),
+    output_format: Literal["xlsx", "parquet"] = "xlsx",
+):
     # NOTE: This should receive the fileid of the file loaded to cloud storage
     # landingzone by the storage_proxy service
 
@@ -58,23 +67,16 @@ def statistical_processing(file):
             detail="Invalid file type. Only .xlsx files are allowed.",
         )
 
-    # Create a temporary file path
-    temp_dir = tempfile.gettempdir()
-    temp_filename = f"temp_{os.getpid()}_{file.filename}"  # Avoid filename collisions
-    temp_input_path = os.path.join(temp_dir, temp_filename)
-
     try:
-        # Save the uploaded file temporarily
-        with open(temp_input_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        temp_output_path = resources.calculate_statistical_significance(temp_input_path)
+        # The upload is read straight from the request file object, nothing
+        # is copied to the temp dir
+        output_file = resources.calculate_statistical_significance(
+            file.file, output_format
+        )
         logger.info(
             f"Statistical significance for file '{file.filename}' "
             "calculated successfully."
         )
-        # TODO: Load file to cloud storage
-        return {"message": "File uploaded successfully", "path": temp_input_path}
 
     except Exception as e:
         message = f"Error calculating statistical significance: {str(e)}"
@@ -86,12 +88,19 @@ def statistical_processing(file):
 
     finally:
         file.file.close()
-        os.remove(temp_input_path)
-        # Clean up temporary files
-        if os.path.exists(temp_input_path):
-            os.remove(temp_input_path)
-        if os.path.exists(temp_output_path):
-            os.remove(temp_output_path)
+
+    base_name = file.filename.removesuffix(".xlsx")
+    if output_format == "parquet":
+        output_name = f"{base_name}_results.parquet"
+    else:
+        output_name = f"{base_name}_processed.xlsx"
+
+    # TODO: Load file to cloud storage
+    return StreamingResponse(
+        iter(lambda: output_file.read(STREAM_CHUNK_SIZE), b""),
+        media_type=OUTPUT_MEDIA_TYPES[output_format],
+        headers={"Content-Disposition": f'attachment; filename="{output_name}"'},
+    )
 
 
 if __name__ == "__main__":
@@ -103,4 +112,5 @@ if __name__ == "__main__":
         load_dotenv(".env")
 
     debug = ENV == "local"
-    uvicorn.run("main:app", host="0.0.0.0", port=8080, reload=debug)
+    port = int(os.getenv("PORT", "8080"))
+    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=debug)
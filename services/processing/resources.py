@@ -1,10 +1,13 @@
 import warnings
 import string
+from io import BytesIO
+from typing import IO, Literal
+from dataclasses import dataclass
+from functools import cache, lru_cache
 from itertools import product
 
 import numpy as np
 import pandas as pd
-from statsmodels.stats.proportion import proportions_ztest
 
 from openpyxl import Workbook, load_workbook
 from openpyxl.worksheet.worksheet import Worksheet
@@ -15,16 +18,39 @@ from openpyxl.utils.cell import range_boundaries
 from openpyxl.utils.dataframe import dataframe_to_rows
 from openpyxl.styles import PatternFill, Border, Side, Alignment, Protection, Font
 
+import export
+
 
 letters_list = list(string.ascii_uppercase)
 
+# Number of distinct banner layouts kept per worker
+SHEET_LAYOUT_CACHE_SIZE = 256
+
 red_fill = PatternFill(start_color="C80000", end_color="C80000", fill_type="solid")
 yellow_fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
 blue_fill = PatternFill(start_color="C5D9F1", end_color="C5D9F1", fill_type="solid")
 
 
+@cache
+def load_ztest_engine():
+    """
+    Imports statsmodels on first use. It is the slowest import of the service
+    and only the significance calculation needs it.
+    """
+    from statsmodels.stats.proportion import proportions_ztest
+
+    return proportions_ztest
+
+
+@dataclass(frozen=True)
+class SheetLayout:
+    category_indexes: list[tuple[int, int]]
+    category_columns: dict[tuple[int, int], list[str]]
+    letters: dict[tuple[int, int], dict[str, str]]
+
+
 class ExcelWriter:
-    def __init__(self, xlsx_file: str):
+    def __init__(self, xlsx_file: str | IO[bytes]):
         self.xlsx_file = xlsx_file
         self.workbook = load_workbook(xlsx_file)
         self.index_totals = 1
@@ -310,13 +336,17 @@ class ExcelWriter:
             if not wstemp["D" + str(rowi)].value and not wstemp["C" + str(rowi)].value:
                 self.delete_row_with_merged_ranges(wstemp, rowi)
 
-    def preformat_sheets(self):
+    def preformat_sheets(self) -> BytesIO:
         # Preformat the existing sheets
         for sheet in self.workbook:
             if not sheet.title.lower().startswith("penal"):
                 self.process_netos(self.workbook[sheet.title])
 
-        self.workbook.save(self.xlsx_file)
+        # Keep the preformatted copy in memory instead of overwriting the input
+        preformatted_file = BytesIO()
+        self.workbook.save(preformatted_file)
+        preformatted_file.seek(0)
+        return preformatted_file
 
     def format_columns(self, ws_totals: Worksheet):
         separators = []
@@ -451,7 +481,7 @@ class DataProcessor:
 
         with warnings.catch_warnings():
             warnings.simplefilter("ignore", category=RuntimeWarning)
-            _, p_value = proportions_ztest(counts, nobs)
+            _, p_value = load_ztest_engine()(counts, nobs)
 
         return p_value < sigma
 
@@ -536,26 +566,33 @@ class DataProcessor:
         return combined_df
 
     @staticmethod
-    def extract_statistical_significance_metadata(data: pd.DataFrame):
-        float_types = data["Unnamed: 2"].apply(lambda x: isinstance(x, float))
-        float_types = float_types[float_types]
-
-        index_list = list(float_types.index)
+    def letters_map(columns) -> dict[str, str]:
+        if len(columns) > len(letters_list):
+            letters = DataProcessor.composite_columns(len(columns))
+        else:
+            letters = letters_list[: len(columns)]
 
-        question_groups = DataProcessor.group_consecutive_indexes(index_list)
+        return dict(zip(columns, letters))
 
-        partial_df = data[
-            data.index.isin([question_groups[0][0] - 1] + question_groups[0])
-        ]
-        initial_category_group = partial_df.loc[partial_df.index[0], "TOTAL"]  # (A)
-        category_groups_columns = (
-            partial_df.loc[partial_df.index[0], :].to_frame().reset_index()
+    @staticmethod
+    @lru_cache(maxsize=SHEET_LAYOUT_CACHE_SIZE)
+    def sheet_layout(
+        columns: tuple[str, ...], header_index: int, header_row: tuple
+    ) -> "SheetLayout":
+        """
+        Computes the banner layout of a sheet from its column labels and the
+        category header row. Sheets (and requests) sharing the same banner
+        reuse the cached result.
+        """
+        category_groups_columns = pd.DataFrame(
+            {"index": list(columns), header_index: list(header_row)}
         )
+        initial_category_group = header_row[columns.index("TOTAL")]  # (A)
 
         initial_category_indexes = DataProcessor.group_consecutive_indexes(
             list(
                 category_groups_columns[
-                    category_groups_columns[1] == initial_category_group
+                    category_groups_columns[header_index] == initial_category_group
                 ][1:].index
             )
         )
@@ -574,11 +611,60 @@ class DataProcessor:
                     if cat1 != cat[-1]:
                         category_indexes += [(cat1, cat1)]
 
-        return question_groups, category_indexes, category_groups_columns
+        category_columns = {
+            category_group: list(columns[category_group[0] : category_group[1] + 1])
+            for category_group in category_indexes
+        }
+
+        return SheetLayout(
+            category_indexes=category_indexes,
+            category_columns=category_columns,
+            letters={
+                category_group: DataProcessor.letters_map(columns_category_group)
+                for category_group, columns_category_group in category_columns.items()
+            },
+        )
+
+    @staticmethod
+    def extract_statistical_significance_metadata(data: pd.DataFrame):
+        float_types = data["Unnamed: 2"].apply(lambda x: isinstance(x, float))
+        float_types = float_types[float_types]
+
+        index_list = list(float_types.index)
+
+        question_groups = DataProcessor.group_consecutive_indexes(index_list)
+
+        # Layout fingerprint: column labels plus the category header row, with
+        # empty cells normalized so NaN does not defeat the cache lookup
+        header_index = question_groups[0][0] - 1
+        header_row = tuple(
+            None if pd.isna(value) else value
+            for value in data.loc[header_index, :].tolist()
+        )
+        layout = DataProcessor.sheet_layout(
+            tuple(data.columns), header_index, header_row
+        )
+
+        return question_groups, layout
+
+    @staticmethod
+    def question_label(data: pd.DataFrame, question_group: list[int]):
+        labels = data.iloc[: question_group[0] + 1, 0].replace("", np.nan).dropna()
+        return labels.iloc[-1] if not labels.empty else None
+
+    @staticmethod
+    def answer_label(data: pd.DataFrame, index: int):
+        answer = data.at[index, "Unnamed: 1"] if "Unnamed: 1" in data else None
+        if pd.isna(answer) or answer == "":
+            answer = data.at[index, "Unnamed: 2"]
+        return answer
 
     @staticmethod
     def process_statistical_significance(
-        data: pd.DataFrame, question_groups, category_indexes, category_groups_columns
+        data: pd.DataFrame,
+        question_groups,
+        layout: "SheetLayout",
+        records: list[dict] | None = None,
     ):
         data = DataProcessor.column_to_numeric("Unnamed: 2", data)
 
@@ -610,10 +696,8 @@ class DataProcessor:
                 )
             )
 
-            for category_group in category_indexes:
-                columns_category_groups = category_groups_columns.loc[
-                    category_group[0] : category_group[1]
-                ]["index"].to_list()
+            for category_group in layout.category_indexes:
+                columns_category_groups = layout.category_columns[category_group]
 
                 inner_df = (
                     data.loc[question_group, columns_category_groups]
@@ -638,21 +722,11 @@ class DataProcessor:
                     )
                 )
 
-                if len(inner_df.columns) > len(letters_list):
-                    letters_inner_dict = {
-                        column: letter
-                        for column, letter in zip(
-                            inner_df.columns,
-                            DataProcessor.composite_columns(len(inner_df.columns)),
-                        )
-                    }
+                # Columns with no data at all are dropped, which shifts letters
+                if len(inner_df.columns) == len(columns_category_groups):
+                    letters_inner_dict = layout.letters[category_group]
                 else:
-                    letters_inner_dict = {
-                        column: letter
-                        for column, letter in zip(
-                            inner_df.columns, letters_list[: len(inner_df.columns)]
-                        )
-                    }
+                    letters_inner_dict = DataProcessor.letters_map(inner_df.columns)
 
                 inner_differences_df = DataProcessor.statistical_significance(
                     inner_df,
@@ -663,6 +737,29 @@ class DataProcessor:
 
                 total_statistical_significance_df.update(inner_differences_df)
 
+                if records is not None:
+                    question = DataProcessor.question_label(data, question_group)
+                    for index in inner_df.index:
+                        for column in inner_df.columns:
+                            count = inner_df.at[index, column]
+                            base = data_statistical_significance.at[
+                                total_index, column
+                            ]
+                            records.append(
+                                {
+                                    "question": question,
+                                    "answer": DataProcessor.answer_label(data, index),
+                                    "banner_column": column,
+                                    "banner_letter": letters_inner_dict[column],
+                                    "count": count,
+                                    "base": base,
+                                    "percent": (count / base) * 100 if base else None,
+                                    "significant_over": inner_differences_df.at[
+                                        index, column
+                                    ],
+                                }
+                            )
+
         combined_differences_df = DataProcessor.combine_dataframes(
             data_statistical_significance, total_statistical_significance_df, 0
         )
@@ -831,10 +928,19 @@ class DataProcessor:
         return result_df
 
 
-def calculate_statistical_significance(xlsx_file: str):
+def calculate_statistical_significance(
+    xlsx_file: str | IO[bytes],
+    output_format: Literal["xlsx", "parquet"] = "xlsx",
+) -> BytesIO:
+    """
+    Builds the formatted significance workbook, or a tidy Parquet dataset with
+    the same results. Everything is kept in memory; the output is returned as
+    a buffer positioned at the start.
+    """
+    export_parquet = output_format == "parquet"
     # Load the existing Excel file
     excel_writer = ExcelWriter(xlsx_file)
-    excel_writer.preformat_sheets()
+    preformatted_file = excel_writer.preformat_sheets()
 
     # Create a new Workbook
     new_workbook = Workbook()
@@ -843,10 +949,13 @@ def calculate_statistical_significance(xlsx_file: str):
     default_sheet = new_workbook.active
     new_workbook.remove(default_sheet)
 
-    sheets_dfs = pd.read_excel(xlsx_file, sheet_name=None)
+    sheets_dfs = pd.read_excel(preformatted_file, sheet_name=None)
+    del preformatted_file
 
     totals_worksheet = new_workbook.create_sheet(title="TOTALES")
 
+    results_rows = []
+
     # Iterate over all sheets
     for sheet_name, data in sheets_dfs.items():
         if data.empty:
@@ -858,6 +967,8 @@ def calculate_statistical_significance(xlsx_file: str):
         if sheet_name.lower().startswith("penal"):
             result_df = DataProcessor.process_penalty_data(data)
             excel_writer.write_penalty_sheet(result_df, new_worksheet)
+            if export_parquet:
+                results_rows += export.penalty_rows(sheet_name, result_df)
 
         else:
             existing_worksheet = excel_writer.workbook[sheet_name]
@@ -868,15 +979,23 @@ def calculate_statistical_significance(xlsx_file: str):
 
             data = DataProcessor.column_to_numeric("Unnamed: 2", data)
 
-            question_groups, category_indexes, category_groups_columns = (
+            question_groups, layout = (
                 DataProcessor.extract_statistical_significance_metadata(data)
             )
 
+            significance_records = [] if export_parquet else None
             combined_statistical_significance_df = (
                 DataProcessor.process_statistical_significance(
-                    data, question_groups, category_indexes, category_groups_columns
+                    data,
+                    question_groups,
+                    layout,
+                    records=significance_records,
                 )
             )
+            if export_parquet:
+                results_rows += export.significance_rows(
+                    sheet_name, significance_records
+                )
 
             nan_df = combined_statistical_significance_df[
                 combined_statistical_significance_df.isna().all(axis=1)
@@ -895,7 +1014,7 @@ def calculate_statistical_significance(xlsx_file: str):
                 first_all_nan_index,
                 combined_statistical_significance_df,
                 question_groups,
-                category_indexes,
+                layout.category_indexes,
             )
 
             totals_worksheet.cell(
@@ -906,7 +1025,11 @@ def calculate_statistical_significance(xlsx_file: str):
 
     excel_writer.format_columns(totals_worksheet)
 
-    output_xlsx_file = xlsx_file.replace(".xlsx", "_processed.xlsx")
-    new_workbook.save(output_xlsx_file)
+    output_file = BytesIO()
+    if export_parquet:
+        export.write_parquet(results_rows, output_file)
+    else:
+        new_workbook.save(output_file)
+    output_file.seek(0)
 
-    return output_xlsx_file
+    return output_file
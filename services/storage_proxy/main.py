@@ -1,13 +1,15 @@
+import asyncio
 import os
 import uuid
 import logging
 
 import uvicorn
-from fastapi import FastAPI, UploadFile, Form, File, status
+from fastapi import FastAPI, Request, UploadFile, Form, File, status
 from fastapi.exceptions import HTTPException
 
 from logger import setup_logging
 import resources
+import streaming_upload
 
 setup_logging()
 
@@ -58,12 +60,41 @@ async def upload_file(
         )
 
     try:
-        bucket = resources.get_service_bucket(service_name)
+        async with resources.upload_slot():
+            bucket = resources.get_service_bucket(service_name)
 
-        file_uuid = str(uuid.uuid4())
-        file_blob = resources.generate_blob(
-            file_uuid, file.filename, file, bucket, bucket_folder
-        )
+            file_uuid = str(uuid.uuid4())
+            parsed_metadata = resources.parse_metadata(file_uuid, metadata)
+
+            # Upload the file and its metadata file (if provided or parsed
+            # correctly) at the same time, outside of the event loop
+            uploads = [
+                resources.upload_blob(
+                    file_uuid, file.filename, file, bucket, bucket_folder
+                )
+            ]
+            if parsed_metadata:
+                uploads.append(
+                    resources.upload_blob(
+                        file_uuid,
+                        file.filename,
+                        parsed_metadata,
+                        bucket,
+                        bucket_folder,
+                        suffix="_metadata",
+                        new_file_extension="json",
+                    )
+                )
+            file_blob, *metadata_results = await asyncio.gather(
+                *uploads, return_exceptions=True
+            )
+
+            if isinstance(file_blob, Exception):
+                # Do not leave the metadata of a file that was not stored
+                for metadata_blob in metadata_results:
+                    if not isinstance(metadata_blob, Exception):
+                        await resources.delete_blob(metadata_blob)
+                raise file_blob
 
         response_data = {
             "message": "File uploaded successfully",
@@ -72,27 +103,25 @@ async def upload_file(
             "file_url": file_blob.public_url,
         }
 
-        try:
-            metadata = resources.parse_metadata(file_uuid, metadata)
-            # Upload metadata file (if provided or parsed correctly)
-            if metadata:
-                metadata_blob = resources.generate_blob(
-                    file_uuid,
-                    file.filename,
-                    metadata,
-                    bucket,
-                    bucket_folder,
-                    suffix="_metadata",
-                    new_file_extension="json",
+        for metadata_blob in metadata_results:
+            if isinstance(metadata_blob, Exception):
+                logger.warning(
+                    f"Invalid metadata format for file uuid '{file_uuid}': "
+                    f"{str(metadata_blob)}"
                 )
+            else:
                 response_data["metadata_url"] = metadata_blob.public_url
-        except Exception as e:
-            logger.warning(
-                f"Invalid metadata format for file uuid '{file_uuid}': {str(e)}"
-            )
 
         return response_data
 
+    except resources.UploadSlotUnavailable as e:
+        logger.warning(f"Upload rejected: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "5"},
+        )
+
     except Exception as e:
         logger.error(f"An error uploading the blob occurred: {str(e)}")
         raise HTTPException(
@@ -100,6 +129,59 @@ async def upload_file(
         )
 
 
+@app.post("/upload_file_stream", tags=["File management"])
+async def upload_file_stream(
+    request: Request,
+    service_name: str,
+    bucket_folder: str = "landingzone",
+):
+    """
+    Same form and response as /upload_file, but the body is parsed as it
+    arrives and the file streamed to Google Cloud Storage without spooling
+    it to memory or disk. The response also has the size and CRC32C of the
+    stored file.
+    """
+    allowed_file_types = resources.get_service_allowed_file_types(service_name)
+
+    if not allowed_file_types:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=(
+                "The service do not exist or currently do not support any type of file."
+            ),
+        )
+
+    try:
+        multipart = streaming_upload.MultipartStream(
+            request.headers.get("content-type", "")
+        )
+        async with resources.upload_slot():
+            return await streaming_upload.ingest(
+                request.stream(),
+                multipart,
+                resources.get_service_bucket(service_name),
+                bucket_folder,
+                allowed_file_types,
+            )
+
+    except streaming_upload.InvalidUpload as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    except resources.UploadSlotUnavailable as e:
+        logger.warning(f"Upload rejected: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "5"},
+        )
+
+    except Exception as e:
+        logger.error(f"An error streaming the blob occurred: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
 if __name__ == "__main__":
     ENV = os.getenv("ENV", "local")
 
@@ -1,4 +1,8 @@
 from typing import TYPE_CHECKING
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import functools
 import os
 import logging
 from pathlib import Path
@@ -18,6 +22,11 @@ logger = logging.getLogger(__name__)
 ENV = os.getenv("ENV", "local")
 GCP_PROJECT_ID = os.getenv("GCP_PROJECT_ID")
 
+# Upload requests handled at once by an instance; the rest wait up to
+# UPLOAD_SLOT_TIMEOUT_SECONDS for a slot and are then rejected with a 503
+MAX_CONCURRENT_UPLOADS = int(os.getenv("MAX_CONCURRENT_UPLOADS", "8"))
+UPLOAD_SLOT_TIMEOUT_SECONDS = float(os.getenv("UPLOAD_SLOT_TIMEOUT_SECONDS", "30"))
+
 parent_folder = Path(__file__).parent
 
 with open(f"{parent_folder}/allowed_file_types.yaml", "r") as file:
@@ -26,6 +35,31 @@ with open(f"{parent_folder}/allowed_file_types.yaml", "r") as file:
 # Initialize Google Cloud Storage client
 storage_client = storage.Client()
 
+# The storage client is synchronous, so uploads run in these threads instead
+# of the event loop; two per request, for the file and its metadata
+upload_executor = ThreadPoolExecutor(
+    max_workers=2 * MAX_CONCURRENT_UPLOADS, thread_name_prefix="gcs-upload"
+)
+upload_slots = asyncio.Semaphore(MAX_CONCURRENT_UPLOADS)
+
+
+class UploadSlotUnavailable(Exception):
+    pass
+
+
+@asynccontextmanager
+async def upload_slot():
+    try:
+        await asyncio.wait_for(upload_slots.acquire(), UPLOAD_SLOT_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise UploadSlotUnavailable(
+            f"{MAX_CONCURRENT_UPLOADS} uploads are already in progress."
+        )
+    try:
+        yield
+    finally:
+        upload_slots.release()
+
 
 def get_service_bucket(service_name: str):
     BUCKET_NAME = f"{GCP_PROJECT_ID}-service-{service_name}"
@@ -47,6 +81,22 @@ def parse_metadata(file_uuid: str, metadata: str):
         return None
 
 
+def new_blob(
+    file_uuid: str,
+    original_file_name: str,
+    file_extension: str,
+    bucket: "Bucket",
+    bucket_folder: str,
+    suffix: str | None = "",
+):
+    blob = bucket.blob(f"{bucket_folder}/{file_uuid}{suffix}.{file_extension}")
+
+    # Set metadata (original file name)
+    blob.metadata = {"original_file_name": original_file_name}
+
+    return blob
+
+
 def generate_blob(
     file_uuid: str,
     original_file_name: str,
@@ -61,16 +111,15 @@ def generate_blob(
     else:
         file_extension = "json"
 
-    new_file_name = (
-        f"{file_uuid}{suffix}."
-        f"{file_extension if not new_file_extension else new_file_extension}"
-    )
-
     # Upload main file
-    blob = bucket.blob(f"{bucket_folder}/{new_file_name}")
-
-    # Set metadata (original file name)
-    blob.metadata = {"original_file_name": original_file_name}
+    blob = new_blob(
+        file_uuid,
+        original_file_name,
+        new_file_extension or file_extension,
+        bucket,
+        bucket_folder,
+        suffix,
+    )
 
     if isinstance(data, UploadFile):
         blob.upload_from_file(data.file, content_type=data.content_type)
@@ -78,3 +127,22 @@ def generate_blob(
         blob.upload_from_string(json.dumps(data), content_type="application/json")
 
     return blob
+
+
+async def run_in_upload_executor(function, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        upload_executor, functools.partial(function, *args, **kwargs)
+    )
+
+
+async def upload_blob(*args, **kwargs):
+    """Runs `generate_blob` in the upload executor."""
+    return await run_in_upload_executor(generate_blob, *args, **kwargs)
+
+
+async def delete_blob(blob):
+    try:
+        await run_in_upload_executor(blob.delete)
+    except Exception as e:
+        logger.warning(f"Blob '{blob.name}' could not be deleted: {str(e)}")
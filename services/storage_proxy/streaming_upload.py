@@ -0,0 +1,294 @@
+"""
+Streaming ingestion of multipart/form-data uploads. The request body is parsed
+as it arrives and the file part is written straight into a GCS resumable
+upload while its CRC32C is computed, so an upload holds at most one chunk in
+memory and nothing on disk, whatever the size of the file.
+"""
+
+import asyncio
+import base64
+import logging
+import os
+import uuid
+from typing import TYPE_CHECKING, AsyncIterator
+
+import google_crc32c
+from python_multipart.multipart import (
+    MultipartParseError,
+    MultipartParser,
+    parse_options_header,
+)
+
+import resources
+
+if TYPE_CHECKING:
+    from google.cloud.storage import Blob, Bucket
+
+logger = logging.getLogger(__name__)
+
+# Size of the resumable upload requests, and so the memory held per upload;
+# GCS needs a multiple of 256 KiB
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE_MB", "8")) * 1024 * 1024
+# File data gathered from the body before handing it to the upload thread
+STREAM_WRITE_SIZE = 1024 * 1024
+# Largest metadata form field accepted, as it is kept in memory
+MAX_METADATA_BYTES = 64 * 1024
+
+
+class InvalidUpload(Exception):
+    pass
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+class MultipartStream:
+    """
+    Incremental multipart/form-data parser. `feed` takes the next chunk of
+    the body and returns the events completed by it, in order:
+    ("part", name, filename, content_type), ("data", bytes) and ("part_end",).
+    """
+
+    def __init__(self, content_type: str):
+        mime_type, options = parse_options_header(content_type)
+        boundary = options.get(b"boundary")
+        if mime_type != b"multipart/form-data" or not boundary:
+            raise InvalidUpload("The request body must be multipart/form-data.")
+
+        self.events: list[tuple] = []
+        self.headers: dict[bytes, bytes] = {}
+        self.header_field = bytearray()
+        self.header_value = bytearray()
+        self.finished = False
+        self.parser = MultipartParser(
+            boundary,
+            callbacks={
+                "on_part_begin": self._on_part_begin,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+                "on_end": self._on_end,
+            },
+        )
+
+    def _on_part_begin(self):
+        self.headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self.header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self.header_value += data[start:end]
+
+    def _on_header_end(self):
+        self.headers[bytes(self.header_field).lower()] = bytes(self.header_value)
+        self.header_field.clear()
+        self.header_value.clear()
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self.headers.get(b"content-disposition"))
+        filename = options.get(b"filename")
+        self.events.append(
+            (
+                "part",
+                options.get(b"name", b"").decode(),
+                filename.decode() if filename is not None else None,
+                self.headers.get(b"content-type", b"").decode() or None,
+            )
+        )
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        self.events.append(("data", bytes(data[start:end])))
+
+    def _on_part_end(self):
+        self.events.append(("part_end",))
+
+    def _on_end(self):
+        self.finished = True
+
+    def feed(self, chunk: bytes) -> list[tuple]:
+        try:
+            self.parser.write(chunk)
+        except MultipartParseError as e:
+            raise InvalidUpload(f"Malformed multipart body: {str(e)}")
+        events, self.events = self.events, []
+        return events
+
+    def finish(self):
+        if not self.finished:
+            raise InvalidUpload("The multipart body ended before its last part.")
+
+
+class StreamedFile:
+    """
+    Resumable upload of a blob fed chunk by chunk, with the CRC32C of the
+    data received computed along and compared with the one of the stored
+    object.
+    """
+
+    def __init__(self, blob: "Blob", content_type: str | None):
+        self.blob = blob
+        # Nothing is sent until the first chunk is full or the writer closes
+        self.writer = blob.open(
+            "wb",
+            chunk_size=UPLOAD_CHUNK_SIZE,
+            ignore_flush=True,
+            content_type=content_type,
+        )
+        self.checksum = google_crc32c.Checksum()
+        self.size = 0
+        self.pending = bytearray()
+
+    async def write(self, data: bytes):
+        self.checksum.update(data)
+        self.size += len(data)
+        self.pending += data
+        if len(self.pending) >= STREAM_WRITE_SIZE:
+            await self._flush()
+
+    async def _flush(self):
+        data, self.pending = bytes(self.pending), bytearray()
+        # Sends a chunk whenever the writer buffer fills
+        await resources.run_in_upload_executor(self.writer.write, data)
+
+    async def close(self) -> str:
+        """Finalizes the upload and returns the base64 CRC32C of the object."""
+        await self._flush()
+        await resources.run_in_upload_executor(self.writer.close)
+        await resources.run_in_upload_executor(self.blob.reload)
+
+        crc32c = base64.b64encode(self.checksum.digest()).decode()
+        if self.blob.crc32c != crc32c:
+            await resources.delete_blob(self.blob)
+            raise ChecksumMismatch(
+                f"The stored file CRC32C {self.blob.crc32c} does not match the "
+                f"received {crc32c}."
+            )
+        return crc32c
+
+
+async def ingest(
+    chunks: AsyncIterator[bytes],
+    multipart: MultipartStream,
+    bucket: "Bucket",
+    bucket_folder: str,
+    allowed_file_types: tuple[str, ...],
+) -> dict:
+    """
+    Streams the "file" part of the body to the bucket and uploads the
+    "metadata" part, when it is valid JSON, next to it.
+    """
+    file_uuid = str(uuid.uuid4())
+    streamed_file: StreamedFile | None = None
+    file_name = None
+    metadata = bytearray()
+    metadata_received = False
+    metadata_upload: asyncio.Task | None = None
+    current_part = None
+
+    def start_metadata_upload():
+        # Runs alongside the file upload once its name and the metadata are
+        # both known
+        nonlocal metadata_upload
+        parsed_metadata = resources.parse_metadata(
+            file_uuid, metadata.decode(errors="replace")
+        )
+        if parsed_metadata:
+            metadata_upload = asyncio.create_task(
+                resources.upload_blob(
+                    file_uuid,
+                    file_name,
+                    parsed_metadata,
+                    bucket,
+                    bucket_folder,
+                    suffix="_metadata",
+                    new_file_extension="json",
+                )
+            )
+
+    try:
+        async for chunk in chunks:
+            for event in multipart.feed(chunk):
+                if event[0] == "part":
+                    _, current_part, filename, content_type = event
+                    if current_part != "file":
+                        continue
+                    if streamed_file is not None:
+                        raise InvalidUpload("Only one file can be uploaded at a time.")
+                    # Checked before any of the file is read
+                    if not filename or not filename.endswith(allowed_file_types):
+                        raise InvalidUpload(
+                            f"Invalid file type. Only {', '.join(allowed_file_types)} "
+                            "file types are allowed."
+                        )
+                    file_name = filename
+                    streamed_file = StreamedFile(
+                        resources.new_blob(
+                            file_uuid,
+                            file_name,
+                            file_name.split(".")[-1],
+                            bucket,
+                            bucket_folder,
+                        ),
+                        content_type,
+                    )
+                    if metadata_received:
+                        start_metadata_upload()
+
+                elif event[0] == "data" and current_part == "file":
+                    await streamed_file.write(event[1])
+
+                elif event[0] == "data" and current_part == "metadata":
+                    metadata += event[1]
+                    if len(metadata) > MAX_METADATA_BYTES:
+                        raise InvalidUpload(
+                            f"Metadata can be at most {MAX_METADATA_BYTES} bytes."
+                        )
+
+                elif event[0] == "part_end":
+                    if current_part == "metadata":
+                        metadata_received = True
+                        if file_name is not None:
+                            start_metadata_upload()
+                    current_part = None
+
+        multipart.finish()
+        if streamed_file is None:
+            raise InvalidUpload("The request has no file.")
+
+        crc32c = await streamed_file.close()
+
+    except Exception:
+        # An unfinished resumable upload creates no object and GCS discards
+        # it after a week; only the metadata file is deleted
+        if metadata_upload is not None:
+            try:
+                metadata_blob = await metadata_upload
+            except Exception:
+                pass
+            else:
+                await resources.delete_blob(metadata_blob)
+        raise
+
+    response_data = {
+        "message": "File uploaded successfully",
+        "file_name": file_name,
+        "file_uuid": file_uuid,
+        "file_url": streamed_file.blob.public_url,
+        "size_bytes": streamed_file.size,
+        "crc32c": crc32c,
+    }
+
+    if metadata_upload is not None:
+        try:
+            response_data["metadata_url"] = (await metadata_upload).public_url
+        except Exception as e:
+            logger.warning(
+                f"Invalid metadata format for file uuid '{file_uuid}': {str(e)}"
+            )
+
+    return response_data